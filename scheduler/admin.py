@@ -1,5 +1,10 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django import forms
+from django.core.exceptions import PermissionDenied
+from django.forms.models import BaseInlineFormSet
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
 
 from .models import (
     UserProfile,
@@ -11,7 +16,13 @@ from .models import (
     Period,
     Constraint,
     TimetableEntry,
+    TimetableVersion,
+    GenerationJob,
+    active_version,
 )
+from . import versions
+from .importer import ImportFailed, SchoolImport, describe, read_source
+from .validation import validate_entries
 
 # ==========================
 # CUSTOM FORMS
@@ -29,15 +40,142 @@ class SubjectAdminForm(forms.ModelForm):
         }
 
 
+def _lazy_active_version():
+    """Active version, fetched on the first call only (shared by a formset's rows)."""
+    found = []
+
+    def get():
+        if not found:
+            found.append(active_version())
+        return found[0]
+    return get
+
+
+class TimetableEntryForm(forms.ModelForm):
+    """
+    Naye lesson ka ``version`` (hidden, khaali) clean() me active version
+    ban jaata hai - sirf save (POST) pe, form kholne pe koi query nahi.
+
+    Saare rules (clashes samet) ek validate_entries() call me check hote
+    hain, form ke laaye teacher / subject / period objects ke saath; model
+    ke per-row clean / unique / constraint lookups skip (``_validated_in_batch``).
+    """
+    def __init__(self, *args, active_version=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._active_version = active_version or _lazy_active_version()
+        self.instance._validated_in_batch = True
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if "version" in self.fields and not cleaned_data.get("version") and "version" not in self.errors:
+            cleaned_data["version"] = self._active_version()
+        return cleaned_data
+
+    def _post_clean(self):
+        super()._post_clean()
+        self.validate_batch()
+
+    def validate_batch(self):
+        if self.errors:
+            return
+        for field, messages in validate_entries([self.instance], check_clashes=True)[0].items():
+            for message in messages:
+                self.add_error(field if field in self.fields else None, message)
+
+
+class TimetableEntryInlineForm(TimetableEntryForm):
+    """
+    Inline row: rules aur clash checks formset.clean() me poore batch ke
+    liye ek saath chalte hain, har row ke clean() / unique checks me nahi
+    (see TimetableEntry._validated_in_batch).
+    """
+    def validate_batch(self):
+        pass
+
+
+class TimetableEntryInlineFormSet(BaseInlineFormSet):
+    """
+    Saari rows ek saath validate_entries() se check hoti hain, clashes
+    (DB aur same formset ki rows ke beech) samet: fixed number of
+    queries, rows kitni bhi hon.
+    """
+    def get_form_kwargs(self, index):
+        kwargs = super().get_form_kwargs(index)
+        if not hasattr(self, "_active_version"):
+            self._active_version = _lazy_active_version()
+        kwargs["active_version"] = self._active_version
+        return kwargs
+
+    def validate_unique(self):
+        # Rows ke beech ke clashes bhi validate_entries() pakadta hai
+        pass
+
+    def clean(self):
+        super().clean()
+        rows, deleted = [], []
+        for form in self.forms:
+            if not hasattr(form, "cleaned_data"):
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                if form.instance.pk:
+                    deleted.append(form.instance.pk)
+                continue
+            if form.errors or not (form.instance.pk or form.has_changed()):
+                continue
+            rows.append(form)
+
+        results = validate_entries(
+            [form.instance for form in rows], deleted=deleted, check_clashes=True
+        )
+        for form, errors in zip(rows, results):
+            for field, messages in errors.items():
+                # inline ka FK field (e.g. teacher under TeacherAdmin) form me nahi hota
+                target = field if field in form.fields else None
+                for message in messages:
+                    form.add_error(target, message)
+
+
+class SchoolImportForm(forms.Form):
+    """
+    Master data upload: <kind>.csv, ek JSON ya sab files ek .zip me.
+    """
+    file = forms.FileField(
+        help_text="teachers.csv, subjects.csv, ... / school.json / a .zip of them",
+    )
+    dry_run = forms.BooleanField(required=False, help_text="Only check the file, save nothing.")
+
+    def clean_file(self):
+        upload = self.cleaned_data["file"]
+        if not upload.name.lower().endswith((".csv", ".json", ".zip")):
+            raise forms.ValidationError("Upload a .csv, .json or .zip file.")
+        return upload
+
+
+class HiddenVersionMixin:
+    """
+    Entry ka ``version`` form me hidden rehta hai (naye lesson ke liye
+    khaali - TimetableEntryForm.clean() active version bharta hai). Form
+    me hona zaroori hai, warna (version, ...) UniqueConstraints ka clash
+    check validation se bahar ho jaata hai.
+    """
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "version":
+            kwargs["widget"] = forms.HiddenInput()
+            kwargs["required"] = False
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
 # ==========================
 # INLINES
 # ==========================
 
-class TimetableEntryInline(admin.TabularInline):
+class TimetableEntryInline(HiddenVersionMixin, admin.TabularInline):
     """
     Timetable entries ko SchoolClass / Teacher / Period ke andar inline dikhaane ke liye.
     """
     model = TimetableEntry
+    form = TimetableEntryInlineForm
+    formset = TimetableEntryInlineFormSet
     extra = 0
     autocomplete_fields = ["subject", "teacher", "room", "period"]
     readonly_fields = ("created_at",)
@@ -82,6 +220,50 @@ class TeacherAdmin(admin.ModelAdmin):
         return obj.user.get_full_name() or obj.user.username
     get_name.short_description = "Name"
 
+    def get_urls(self):
+        return [
+            path(
+                "import/",
+                self.admin_site.admin_view(self.import_view),
+                name="scheduler_teacher_import",
+            ),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        """
+        Teachers, subjects, rooms, classes, periods ... ek upload me
+        (importer.SchoolImport). Koi bhi error ho to kuch save nahi hota.
+        """
+        if not self.has_add_permission(request):
+            raise PermissionDenied
+
+        form = SchoolImportForm(request.POST or None, request.FILES or None)
+        errors = []
+        if request.method == "POST" and form.is_valid():
+            upload = form.cleaned_data["file"]
+            dry_run = form.cleaned_data["dry_run"]
+            try:
+                rows = read_source(upload.name, upload.read())
+                summary = SchoolImport(rows).run(dry_run=dry_run)
+            except ImportFailed as exc:
+                errors = exc.errors
+            else:
+                if dry_run:
+                    messages.info(request, f"File is valid: {describe(summary)}. Nothing was saved.")
+                else:
+                    messages.success(request, f"Imported: {describe(summary)}.")
+                return redirect("admin:scheduler_teacher_changelist")
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Import school data",
+            "opts": self.model._meta,
+            "form": form,
+            "errors": errors[:100],
+            "more_errors": max(0, len(errors) - 100),
+        }
+        return TemplateResponse(request, "admin/scheduler/import_school.html", context)
+
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
@@ -152,7 +334,8 @@ class ConstraintAdmin(admin.ModelAdmin):
 # ==========================
 
 @admin.register(TimetableEntry)
-class TimetableEntryAdmin(admin.ModelAdmin):
+class TimetableEntryAdmin(HiddenVersionMixin, admin.ModelAdmin):
+    form = TimetableEntryForm
     list_display = (
         "school_class",
         "period",
@@ -179,3 +362,69 @@ class TimetableEntryAdmin(admin.ModelAdmin):
     )
     autocomplete_fields = ["school_class", "period", "subject", "teacher", "room"]
     readonly_fields = ("created_at",)
+
+
+# ==========================
+# TIMETABLE VERSIONS
+# ==========================
+
+@admin.register(TimetableVersion)
+class TimetableVersionAdmin(admin.ModelAdmin):
+    """
+    Har generation ek naya version banata hai; purane rollback ke liye
+    rehte hain (settings.TIMETABLE_VERSIONS_KEEP). Entries sirf active
+    version ki dikhti / edit hoti hain.
+    """
+    list_display = ("id", "status", "lessons", "note", "job", "created_at", "activated_at")
+    list_filter = ("status",)
+    readonly_fields = [f.name for f in TimetableVersion._meta.fields]
+    actions = ["make_active"]
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_lessons()
+
+    @admin.display(ordering="lessons")
+    def lessons(self, obj):
+        return obj.lessons
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Active version delete = poora timetable gaya
+        if obj is not None and obj.status == TimetableVersion.ACTIVE:
+            return False
+        return super().has_delete_permission(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset.exclude(status=TimetableVersion.ACTIVE))
+
+    @admin.action(description="Make active (rollback to this timetable)")
+    def make_active(self, request, queryset):
+        if queryset.count() != 1:
+            self.message_user(request, "Select exactly one version.", messages.WARNING)
+            return
+        try:
+            version = versions.restore(queryset.get().pk)
+        except versions.VersionError as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+            return
+        self.message_user(request, f"Timetable version #{version.pk} is now active.", messages.SUCCESS)
+
+
+# ==========================
+# GENERATION JOBS
+# ==========================
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    """
+    Background generation runs - sirf dekhne ke liye; start / cancel
+    /generation/ page se hota hai.
+    """
+    list_display = ("id", "status", "phase", "placed", "total", "requested_by", "created_at", "finished_at")
+    list_filter = ("status",)
+    readonly_fields = [f.name for f in GenerationJob._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
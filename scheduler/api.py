@@ -0,0 +1,212 @@
+"""
+Read-only JSON API for timetable display clients (hallway screens, the
+mobile app) - see ``api_urls.py`` for the endpoints.
+
+Payloads are built from ``values_list`` rows (the whole-school one from
+the active version's array snapshot when it is fresh), never from model
+instances. Each response body is serialised and compressed once per
+timetable stamp and kept in the cache, so a screen polling every minute
+costs a stamp query and, usually, a 304.
+
+* ``grid_payload`` - one class / teacher / room: its week as day rows,
+  names inline, ready to draw.
+* ``school_payload`` - every class in one compact document: lookup lists
+  (periods, classes, subjects, teachers, rooms) and per class one cell per
+  period, ``[subject, teacher, room]`` indexes into those lists or
+  ``null`` when free. Teacher / room grids follow from the same cells.
+"""
+
+import gzip
+import json
+
+from django.core.cache import cache
+
+from . import snapshots, versions
+from .grids import DAY_LABELS
+from .models import Period, Room, SchoolClass, Subject, Teacher, TimetableEntry
+
+try:
+    import brotli
+except ImportError:  # gzip still works without it
+    brotli = None
+
+# Bumped when the JSON layout changes, so old ETags / cached bodies die
+FORMAT = 1
+
+BODY_CACHE_SECONDS = 7 * 24 * 60 * 60
+
+# JSON is small and compressed once per stamp - the slow, tight settings pay off
+BROTLI_QUALITY = 11
+GZIP_LEVEL = 9
+
+# Grid endpoints: kind -> TimetableEntry field it filters on
+GRID_FIELDS = {
+    "class": "school_class_id",
+    "teacher": "teacher_id",
+    "room": "room_id",
+}
+
+
+def _time(value):
+    return value.strftime("%H:%M") if value else None
+
+
+def _periods():
+    """(id, day, order, start, end) of every period, in week order."""
+    return [
+        (pk, day, order, _time(start), _time(end))
+        for pk, day, order, start, end in Period.objects.values_list(
+            "pk", "day", "order", "start_time", "end_time"
+        )
+    ]
+
+
+def owner(kind, pk):
+    """Name (and code) of the class / teacher / room, or None if there is no such one."""
+    if kind == "class":
+        row = SchoolClass.objects.filter(pk=pk).values_list("name").first()
+        return row and {"id": pk, "name": row[0]}
+    if kind == "room":
+        row = Room.objects.filter(pk=pk).values_list("name", "capacity").first()
+        return row and {"id": pk, "name": row[0], "capacity": row[1]}
+    row = Teacher.objects.filter(pk=pk).values_list(
+        "code", "user__first_name", "user__last_name", "user__username"
+    ).first()
+    if row is None:
+        return None
+    code, first, last, username = row
+    return {"id": pk, "code": code, "name": f"{first} {last}".strip() or username}
+
+
+# -------------------------------------------------
+# Payloads
+# -------------------------------------------------
+def grid_payload(kind, who):
+    """Week of one class / teacher / room (``who`` from ``owner``)."""
+    periods = _periods()
+    rows = TimetableEntry.objects.filter(**{GRID_FIELDS[kind]: who["id"]}).values_list(
+        "period__day", "period__order",
+        "school_class__name", "subject__name", "subject__code", "subject__color_code",
+        "teacher__code", "room__name",
+    )
+    cells = {
+        (day, order): {
+            "class": class_name,
+            "subject": subject,
+            "subject_code": code,
+            "color": color or None,
+            "teacher": teacher,
+            "room": room,
+        }
+        for day, order, class_name, subject, code, color, teacher, room in rows
+    }
+    orders = sorted({order for _, _, order, _, _ in periods})
+    days = sorted({day for _, day, _, _, _ in periods})
+    return {
+        "format": FORMAT,
+        "version": versions.active_id(),
+        kind: who,
+        "period_orders": orders,
+        "days": [
+            {
+                "day": day,
+                "label": DAY_LABELS.get(day, f"Day {day}"),
+                "cells": [cells.get((day, order)) for order in orders],
+            }
+            for day in days
+        ],
+    }
+
+
+def school_payload(stamp_key):
+    """Whole school, compact (see the module docstring)."""
+    version_id = versions.active_id()
+    snapshot = snapshots.current(stamp_key) if version_id else None
+    if snapshot is None:
+        # Ek query - ids hi, naam neeche alag lookups se
+        snapshot = snapshots.build(version_id) if version_id else snapshots.from_rows(None, [], stamp_key)
+
+    def lookup(ids, rows):
+        by_pk = {row[0]: list(row) for row in rows}
+        return [by_pk.get(pk, [pk]) for pk in ids.tolist()]
+
+    periods = {row[0]: row for row in _periods()}
+    teachers = [
+        (pk, code, f"{first} {last}".strip() or username)
+        for pk, code, first, last, username in Teacher.objects.filter(pk__in=snapshot.teachers.tolist())
+        .values_list("pk", "code", "user__first_name", "user__last_name", "user__username")
+    ]
+    free = snapshots.FREE
+    return {
+        "format": FORMAT,
+        "version": version_id,
+        "fields": {
+            "periods": ["id", "day", "order", "start", "end"],
+            "classes": ["id", "name"],
+            "subjects": ["id", "name", "code", "color"],
+            "teachers": ["id", "code", "name"],
+            "rooms": ["id", "name"],
+            "cell": ["subject", "teacher", "room"],
+        },
+        "periods": lookup(snapshot.periods, periods.values()),
+        "classes": lookup(snapshot.classes, SchoolClass.objects.values_list("pk", "name")),
+        "subjects": lookup(snapshot.subjects, Subject.objects.filter(
+            pk__in=snapshot.subjects.tolist()).values_list("pk", "name", "code", "color_code")),
+        "teachers": lookup(snapshot.teachers, teachers),
+        "rooms": lookup(snapshot.rooms, Room.objects.filter(
+            pk__in=snapshot.rooms.tolist()).values_list("pk", "name")),
+        # timetable[class][period] - same order as "classes" / "periods"
+        "timetable": [
+            [cell if cell[0] != free else None for cell in row]
+            for row in snapshot.cells.tolist()
+        ],
+    }
+
+
+# -------------------------------------------------
+# Encoded bodies
+# -------------------------------------------------
+def negotiate(accept_encoding):
+    """Best encoding the client accepts: "br", "gzip" or "" (none)."""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    for encoding in ("br", "gzip"):
+        if encoding == "br" and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get("*", 0)) > 0:
+            return encoding
+    return ""
+
+
+def _encode(body, encoding):
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return body
+
+
+def body(key, build_payload, encoding):
+    """
+    JSON bytes of ``build_payload()`` in ``encoding``, cached under ``key``
+    (which carries the stamp) - built and compressed once per change.
+    """
+    encoded = cache.get(f"{key}:{encoding}")
+    if encoded is not None:
+        return encoded
+    raw = cache.get(f"{key}:")
+    if raw is None:
+        raw = json.dumps(build_payload(), separators=(",", ":")).encode()
+        cache.set(f"{key}:", raw, BODY_CACHE_SECONDS)
+    encoded = _encode(raw, encoding)
+    if encoding:
+        cache.set(f"{key}:{encoding}", encoded, BODY_CACHE_SECONDS)
+    return encoded
@@ -0,0 +1,14 @@
+from django.urls import path
+from . import views
+
+app_name = "api"
+
+urlpatterns = [
+    # Whole school in one payload (bulk)
+    path("school/", views.api_school, name="school"),
+
+    # One grid each
+    path("classes/<int:pk>/", views.api_grid, {"kind": "class"}, name="class"),
+    path("teachers/<int:pk>/", views.api_grid, {"kind": "teacher"}, name="teacher"),
+    path("rooms/<int:pk>/", views.api_grid, {"kind": "room"}, name="room"),
+]
@@ -0,0 +1,229 @@
+"""
+Benchmarks of the slow paths on synthetic schools (manage.py benchmark).
+
+For each school size (see synthetic.py) the runner measures:
+
+* ``generate``      generate_timetable, one seed per repeat; also the
+                    solve rate (lessons placed / lessons wanted) and the
+                    share of runs that placed everything
+* ``entry_clean``   TimetableEntry.clean() on 100 saved lessons (with
+                    their teacher / subject / period, as a form has them)
+* ``class_page`` / ``teacher_page`` / ``room_page`` / ``timetable_list``
+                    grid views with every cache cold
+* ``class_page_cached``  the same class page with warm caches
+
+Every case reports median / best wall time of ``repeat`` runs, and the
+query count and peak Python memory (tracemalloc) of one extra run - it is
+kept apart because tracing slows the code down.
+
+Results are JSON; ``compare`` checks a run against a saved baseline.
+"""
+
+import platform
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict
+from io import StringIO
+
+import django
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import grids
+from .models import Room, SchoolClass, Teacher, TimetableEntry
+from .solver.db import load_problem
+from .synthetic import build_school
+
+CLEAN_SAMPLE = 100
+
+# (metric, higher is better) - time is judged on the best run, the least noisy
+METRICS = [
+    ("best_ms", False),
+    ("queries", False),
+    ("peak_kb", False),
+    ("solve_rate", True),
+    ("solved", True),
+]
+
+# Wall time differences below this are noise, whatever the percentage
+NOISE_MS = 2.0
+
+
+def measure(fn, repeat=3, setup=None):
+    """
+    Call ``fn(run)`` ``repeat`` times for wall time, then once more with
+    query capture and tracemalloc. ``setup()`` runs before every call,
+    outside the timing. Returns (metrics, what the timed calls returned).
+    """
+    times, returned = [], []
+    for run in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        returned.append(fn(run))
+        times.append(time.perf_counter() - start)
+
+    if setup:
+        setup()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            fn(repeat)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "wall_ms": round(statistics.median(times) * 1000, 2),
+        "best_ms": round(min(times) * 1000, 2),
+        "queries": len(queries),
+        "peak_kb": peak // 1024,
+    }, returned
+
+
+def _cold():
+    cache.clear()
+    grids.clear_cache()
+
+
+# -------------------------------------------------
+# Cases
+# -------------------------------------------------
+def bench_generate(repeat, time_limit):
+    problem = load_problem()
+    wanted = sum(problem.required_for_class(c) for c in range(problem.n_classes))
+
+    def run(i):
+        call_command(
+            "generate_timetable",
+            seed=i + 1,
+            time_limit=time_limit,
+            no_pdfs=True,
+            stdout=StringIO(),
+        )
+        return TimetableEntry.objects.count()
+
+    metrics, placed = measure(run, repeat)
+    metrics["solve_rate"] = round(sum(placed) / (wanted * len(placed)), 4) if wanted else 1.0
+    metrics["solved"] = round(sum(p >= wanted for p in placed) / len(placed), 2)
+    return metrics
+
+
+def bench_entry_clean(repeat):
+    # Teacher / subject / period loaded, jaise admin form ke instance me hote hain
+    entries = list(
+        TimetableEntry.objects.select_related("teacher", "subject", "period").order_by("pk")[:CLEAN_SAMPLE]
+    )
+
+    def run(i):
+        for entry in entries:
+            entry.clean()
+
+    metrics, _ = measure(run, repeat)
+    metrics["entries"] = len(entries)
+    return metrics
+
+
+def bench_pages(repeat):
+    teacher = Teacher.objects.select_related("user").order_by("pk").first()
+    user = teacher.user
+    user.is_staff = True
+    user.save(update_fields=["is_staff"])
+    client = Client()
+    client.force_login(user)
+
+    pages = {
+        "class_page": reverse("scheduler:timetable_detail", args=[SchoolClass.objects.order_by("pk").first().pk]),
+        "teacher_page": reverse("scheduler:my_timetable"),
+        "room_page": reverse("scheduler:room_timetable", args=[Room.objects.order_by("pk").first().pk]),
+        "timetable_list": reverse("scheduler:timetable_list"),
+    }
+
+    def get(url):
+        def run(i):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return run
+
+    results = {}
+    for name, url in pages.items():
+        results[name], _ = measure(get(url), repeat, setup=_cold)
+    results["class_page_cached"], _ = measure(get(pages["class_page"]), repeat)
+    return results
+
+
+def run_size(size, repeat=3, time_limit=10.0):
+    """All cases on a fresh school of ``size`` in the current (empty) database."""
+    start = time.perf_counter()
+    build_school(size)
+    build_ms = round((time.perf_counter() - start) * 1000, 2)
+
+    cases = {"generate": bench_generate(repeat, time_limit)}
+    cases["entry_clean"] = bench_entry_clean(repeat)
+    cases.update(bench_pages(repeat))
+    return {"size": asdict(size), "build_ms": build_ms, "cases": cases}
+
+
+def environment():
+    return {
+        "when": timezone.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+    }
+
+
+# -------------------------------------------------
+# Baseline comparison
+# -------------------------------------------------
+def compare(results, baseline, tolerance=0.2):
+    """
+    Lines for every metric of ``results`` that moved against ``baseline``
+    (both as saved by the runner), and the regressions among them. Wall time and memory
+    may grow by ``tolerance`` before it counts; queries and solve rate
+    must not get worse at all.
+    """
+    lines, regressions = [], []
+    for name, run in results["sizes"].items():
+        base = baseline.get("sizes", {}).get(name)
+        if base is None:
+            lines.append(f"{name}: not in baseline")
+            continue
+        if base["size"] != run["size"]:
+            lines.append(f"{name}: school size differs from baseline, not compared")
+            continue
+        for case, metrics in run["cases"].items():
+            old = base["cases"].get(case)
+            if old is None:
+                continue
+            for metric, higher_is_better in METRICS:
+                if metric not in metrics or metric not in old:
+                    continue
+                new_value, old_value = metrics[metric], old[metric]
+                if new_value == old_value:
+                    continue
+                line = f"{name}/{case} {metric}: {old_value} -> {new_value}"
+                if old_value:
+                    line += f" ({(new_value - old_value) / old_value:+.0%})"
+                lines.append(line)
+                if _worse(metric, higher_is_better, old_value, new_value, tolerance):
+                    regressions.append(line)
+    return lines, regressions
+
+
+def _worse(metric, higher_is_better, old, new, tolerance):
+    if higher_is_better:
+        return new < old
+    if metric == "queries":
+        return new > old
+    if metric == "best_ms" and new - old < NOISE_MS:
+        return False
+    return new > old * (1 + tolerance)
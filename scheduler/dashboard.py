@@ -0,0 +1,143 @@
+"""
+Dashboard statistics.
+
+Counts, per-teacher load, room utilisation and unfilled periods per
+class come from one grouped query over TimetableEntry (lessons per
+class x teacher x room), summed up in Python. The result is cached under
+the school stamp, which every signal bump and every generate_timetable
+run moves - so a dashboard hit costs one stamp query plus a cache read,
+and the stats are recomputed once after each change.
+"""
+
+from collections import Counter, namedtuple
+from dataclasses import dataclass, field
+
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .grids import DAY_LABELS
+from .models import Constraint, Period, Room, SchoolClass, Teacher, TimetableEntry
+from .stamps import school_stamp
+
+# Key carries the stamp, old entries just age out
+STATS_CACHE_SECONDS = 24 * 60 * 60
+
+RECENT_ENTRIES = 6
+
+TeacherLoad = namedtuple("TeacherLoad", "pk code name lessons capacity percent")
+RoomUsage = namedtuple("RoomUsage", "pk name capacity used percent")
+ClassGap = namedtuple("ClassGap", "pk name lessons unfilled")
+RecentEntry = namedtuple("RecentEntry", "class_name subject day order created_at")
+
+
+@dataclass
+class SchoolStats:
+    classes: int = 0
+    teachers: int = 0
+    rooms: int = 0
+    lessons: int = 0
+    timetabled_classes: int = 0   # classes with at least one lesson
+    open_periods: int = 0         # per week, not blocked for everybody
+    unfilled: int = 0             # open class periods without a lesson
+    teacher_load: list = field(default_factory=list)   # busiest first
+    room_usage: list = field(default_factory=list)     # busiest first
+    class_gaps: list = field(default_factory=list)     # classes with unfilled periods
+    recent: list = field(default_factory=list)
+    computed_at: object = None
+
+    @property
+    def slots(self):
+        return self.classes * self.open_periods
+
+    @property
+    def fill_percent(self):
+        return round(100 * (self.slots - self.unfilled) / self.slots) if self.slots else 0
+
+    @property
+    def overloaded_teachers(self):
+        return sum(1 for t in self.teacher_load if t.lessons > t.capacity)
+
+
+def _percent(part, whole):
+    return round(100 * part / whole) if whole else 0
+
+
+def compute_stats():
+    """Fresh ``SchoolStats``; one grouped query over the timetable."""
+    periods = list(Period.objects.values_list("id", "day"))
+    blocked = set(
+        Constraint.objects.filter(teacher__isnull=True, blocked=True).values_list("period_id", flat=True)
+    )
+    open_periods = sum(1 for pk, _ in periods if pk not in blocked)
+    days = len({day for _, day in periods})
+
+    per_class, per_teacher, per_room = Counter(), Counter(), Counter()
+    grouped = (
+        TimetableEntry.objects
+        .values_list("school_class_id", "teacher_id", "room_id")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    for class_id, teacher_id, room_id, n in grouped:
+        per_class[class_id] += n
+        per_teacher[teacher_id] += n
+        per_room[room_id] += n
+
+    stats = SchoolStats(
+        lessons=sum(per_class.values()),
+        timetabled_classes=len(per_class),
+        open_periods=open_periods,
+        computed_at=timezone.now(),
+    )
+
+    classes = list(SchoolClass.objects.order_by("name").values_list("id", "name"))
+    stats.classes = len(classes)
+    for pk, name in classes:
+        unfilled = max(open_periods - per_class[pk], 0)
+        stats.unfilled += unfilled
+        if unfilled:
+            stats.class_gaps.append(ClassGap(pk, name, per_class[pk], unfilled))
+    stats.class_gaps.sort(key=lambda g: (-g.unfilled, g.name))
+
+    teachers = Teacher.objects.values_list(
+        "id", "code", "user__first_name", "user__last_name", "user__username", "max_periods_per_day"
+    )
+    for pk, code, first, last, username, per_day in teachers:
+        capacity = min(per_day * days, open_periods)
+        name = f"{first} {last}".strip() or username
+        stats.teacher_load.append(
+            TeacherLoad(pk, code, name, per_teacher[pk], capacity, _percent(per_teacher[pk], capacity))
+        )
+    stats.teachers = len(stats.teacher_load)
+    stats.teacher_load.sort(key=lambda t: (-t.percent, t.code))
+
+    for pk, name, capacity in Room.objects.values_list("id", "name", "capacity"):
+        stats.room_usage.append(
+            RoomUsage(pk, name, capacity, per_room[pk], _percent(per_room[pk], open_periods))
+        )
+    stats.rooms = len(stats.room_usage)
+    stats.room_usage.sort(key=lambda r: (-r.percent, r.name))
+
+    recent = (
+        TimetableEntry.objects
+        .order_by("-created_at", "-id")
+        .values_list("school_class__name", "subject__name", "period__day", "period__order", "created_at")
+        [:RECENT_ENTRIES]
+    )
+    stats.recent = [
+        RecentEntry(class_name, subject, DAY_LABELS.get(day, day), order, created)
+        for class_name, subject, day, order, created in recent
+    ]
+    return stats
+
+
+def school_stats():
+    """Current ``SchoolStats``, recomputed only after a change."""
+    # Stamp read before computing, so cached stats are never older than their key
+    key = f"school-stats:{school_stamp().key}"
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats()
+        cache.set(key, stats, STATS_CACHE_SECONDS)
+    return stats
@@ -0,0 +1,292 @@
+"""
+What changed between two timetables.
+
+Both sides are array snapshots (snapshots.py): a saved version, the DB
+state of a version, or a snapshot directory. They are laid on the same
+[class, period] axes and compared as whole matrices; every differing
+cell becomes one of:
+
+* ``teacher_swapped`` - same subject, another teacher (room may change too);
+* ``room_swapped``    - same subject and teacher, another room;
+* ``moved``           - a class's lesson left one period and the same
+  subject arrived in another (same teacher preferred when pairing);
+* ``removed`` / ``added`` - whatever is left unpaired.
+
+Only numpy runs per cell, so even a full regeneration of a large school
+diffs in milliseconds; names are loaded just for the lines shown.
+"""
+
+from collections import Counter, defaultdict, namedtuple
+
+import numpy as np
+
+from . import snapshots, versions
+from .grids import DAY_LABELS
+from .models import Period, Room, SchoolClass, Subject, Teacher, TimetableVersion
+from .snapshots import FREE, ROOM, SUBJECT, TEACHER
+
+MOVED = "moved"
+ADDED = "added"
+REMOVED = "removed"
+TEACHER_SWAPPED = "teacher_swapped"
+ROOM_SWAPPED = "room_swapped"
+KINDS = (MOVED, ADDED, REMOVED, TEACHER_SWAPPED, ROOM_SWAPPED)
+
+# Database ids; old_* is None for an added lesson, new_* for a removed one
+Change = namedtuple(
+    "Change",
+    "kind school_class subject old_period new_period old_teacher new_teacher old_room new_room",
+)
+
+
+class DiffError(Exception):
+    """A side of the diff could not be loaded."""
+
+
+class TimetableDiff:
+    """Changes from ``old`` to ``new`` (see the module docstring)."""
+
+    def __init__(self, old_label, new_label, changes):
+        self.old_label = old_label
+        self.new_label = new_label
+        self.changes = changes
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    def counts(self):
+        found = Counter(change.kind for change in self.changes)
+        return {kind: found[kind] for kind in KINDS}
+
+    def summary(self):
+        parts = [f"{n} {kind.replace('_', ' ')}" for kind, n in self.counts().items() if n]
+        return ", ".join(parts) if parts else "no changes"
+
+    def by_class(self):
+        grouped = defaultdict(list)
+        for change in self.changes:
+            grouped[change.school_class].append(change)
+        return dict(grouped)
+
+    def by_teacher(self):
+        """Every change a teacher has to hear about: lessons they lose or gain."""
+        grouped = defaultdict(list)
+        for change in self.changes:
+            for teacher in {change.old_teacher, change.new_teacher} - {None}:
+                grouped[teacher].append(change)
+        return dict(grouped)
+
+
+# -------------------------------------------------
+# Loading the two sides
+# -------------------------------------------------
+def resolve(spec):
+    """
+    ``spec``: a version id, "db" (the active version as it is in the DB
+    right now) or a snapshot directory. Returns (label, Snapshot).
+    """
+    spec = str(spec)
+    if spec == "db":
+        version_id = versions.active_id()
+        if version_id is None:
+            raise DiffError("There is no active timetable.")
+        return "current timetable", snapshots.current() or snapshots.build(version_id)
+    if spec.isdigit():
+        version_id = int(spec)
+        status = TimetableVersion.objects.filter(pk=version_id).values_list("status", flat=True).first()
+        if status is None:
+            raise DiffError(f"Timetable version #{version_id} does not exist.")
+        if status == TimetableVersion.ACTIVE:
+            # Active version edit ho sakta hai - snapshot sirf tab jab fresh ho
+            snapshot = snapshots.current()
+        else:
+            snapshot = snapshots.load(version_id)
+        return f"version #{version_id}", snapshot or snapshots.build(version_id)
+    snapshot = snapshots.load_dir(spec)
+    if snapshot is None:
+        raise DiffError(f"No timetable snapshot in {spec}.")
+    return f"snapshot {spec}", snapshot
+
+
+def previous_version_id():
+    """Newest archived version - the one the last generation replaced."""
+    return (
+        TimetableVersion.objects.filter(status=TimetableVersion.ARCHIVED)
+        .order_by("-activated_at", "-id").values_list("pk", flat=True).first()
+    )
+
+
+# -------------------------------------------------
+# The diff itself
+# -------------------------------------------------
+def _id_cells(snapshot, classes, periods):
+    """int64 [classes, periods, 3] database ids on shared axes, FREE where no lesson."""
+    out = np.full((len(classes), len(periods), 3), FREE, dtype=np.int64)
+    cells = np.asarray(snapshot.cells)
+    c, p = np.nonzero(cells[:, :, SUBJECT] != FREE)
+    if not len(c):
+        return out
+    lesson = cells[c, p]
+    out[np.searchsorted(classes, snapshot.classes[c]), np.searchsorted(periods, snapshot.periods[p])] = (
+        np.column_stack([
+            snapshot.subjects[lesson[:, SUBJECT]],
+            snapshot.teachers[lesson[:, TEACHER]],
+            snapshot.rooms[lesson[:, ROOM]],
+        ])
+    )
+    return out
+
+
+def _rank(groups):
+    """Occurrence number of every element within its group: 0, 1, 2 ..."""
+    order = np.argsort(groups, kind="stable")
+    ordered = groups[order]
+    starts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    sizes = np.diff(np.r_[starts, len(groups)])
+    rank = np.empty(len(groups), dtype=np.int64)
+    rank[order] = np.arange(len(groups)) - np.repeat(starts, sizes)
+    return rank
+
+
+def _pair(left, right):
+    """One-to-one matches between equal rows of two int64 [n, k] key arrays."""
+    if not len(left) or not len(right):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    _, groups = np.unique(np.concatenate([left, right]), axis=0, return_inverse=True)
+    groups = groups.ravel()
+    l_groups, r_groups = groups[:len(left)], groups[len(left):]
+    base = max(len(left), len(right))
+    # k-th lesson of a key on the left pairs with the k-th one on the right
+    _, l_idx, r_idx = np.intersect1d(
+        l_groups * base + _rank(l_groups), r_groups * base + _rank(r_groups),
+        assume_unique=True, return_indices=True,
+    )
+    return l_idx, r_idx
+
+
+def diff(old, new, old_label="old", new_label="new"):
+    """``TimetableDiff`` from Snapshot ``old`` to Snapshot ``new``."""
+    classes = np.union1d(old.classes, new.classes)
+    periods = np.union1d(old.periods, new.periods)
+    a = _id_cells(old, classes, periods)
+    b = _id_cells(new, classes, periods)
+
+    c, p = np.nonzero((a != b).any(axis=2))
+    before, after = a[c, p], b[c, p]
+    had = before[:, SUBJECT] != FREE
+    has = after[:, SUBJECT] != FREE
+    same_subject = had & has & (before[:, SUBJECT] == after[:, SUBJECT])
+    teacher_swap = same_subject & (before[:, TEACHER] != after[:, TEACHER])
+    room_swap = same_subject & ~teacher_swap
+
+    # Baaki cells: ek lesson gaya (leaving) aur/ya doosra aaya (arriving)
+    leaving = np.flatnonzero(had & ~same_subject)
+    arriving = np.flatnonzero(has & ~same_subject)
+    moved = []
+    for key in ((SUBJECT, TEACHER), (SUBJECT,)):   # same teacher first, then any
+        columns = list(key)
+        l_idx, r_idx = _pair(
+            np.column_stack([c[leaving], before[leaving][:, columns]]),
+            np.column_stack([c[arriving], after[arriving][:, columns]]),
+        )
+        moved.append((leaving[l_idx], arriving[r_idx]))
+        leaving = np.delete(leaving, l_idx)
+        arriving = np.delete(arriving, r_idx)
+
+    # (kind, cell before, cell after) per change; -1 = no such side
+    swaps_t = np.flatnonzero(teacher_swap)
+    swaps_r = np.flatnonzero(room_swap)
+    none_l, none_a = np.full(len(leaving), -1), np.full(len(arriving), -1)
+    kinds = (
+        [TEACHER_SWAPPED] * len(swaps_t) + [ROOM_SWAPPED] * len(swaps_r)
+        + [MOVED] * sum(len(o) for o, _ in moved)
+        + [REMOVED] * len(leaving) + [ADDED] * len(arriving)
+    )
+    old_i = np.concatenate([swaps_t, swaps_r, *(o for o, _ in moved), leaving, none_a]).astype(np.intp)
+    new_i = np.concatenate([swaps_t, swaps_r, *(n for _, n in moved), none_l, arriving]).astype(np.intp)
+    has_old, has_new = old_i >= 0, new_i >= 0
+    o, n = before[old_i], after[new_i]   # -1 rows are masked out below
+
+    def column(values, present):
+        return [v if ok else None for v, ok in zip(values.tolist(), present.tolist())]
+
+    columns = zip(
+        kinds,
+        classes[c[np.where(has_old, old_i, new_i)]].tolist(),
+        np.where(has_old, o[:, SUBJECT], n[:, SUBJECT]).tolist(),
+        column(periods[p[old_i]], has_old),
+        column(periods[p[new_i]], has_new),
+        column(o[:, TEACHER], has_old),
+        column(n[:, TEACHER], has_new),
+        column(o[:, ROOM], has_old),
+        column(n[:, ROOM], has_new),
+    )
+    changes = sorted(
+        (Change(*row) for row in columns),
+        key=lambda ch: (ch.school_class, ch.old_period or ch.new_period),
+    )
+    return TimetableDiff(old_label, new_label, changes)
+
+
+def diff_specs(old_spec, new_spec):
+    old_label, old = resolve(old_spec)
+    new_label, new = resolve(new_spec)
+    return diff(old, new, old_label, new_label)
+
+
+# -------------------------------------------------
+# Text for people
+# -------------------------------------------------
+def load_labels(changes):
+    """Names of everything ``changes`` mention: 5 queries, whatever the size."""
+    ids = defaultdict(set)
+    for ch in changes:
+        ids["class"].add(ch.school_class)
+        ids["subject"].add(ch.subject)
+        ids["period"].update({ch.old_period, ch.new_period} - {None})
+        ids["teacher"].update({ch.old_teacher, ch.new_teacher} - {None})
+        ids["room"].update({ch.old_room, ch.new_room} - {None})
+    return {
+        "class": dict(SchoolClass.objects.filter(pk__in=ids["class"]).values_list("pk", "name")),
+        "subject": dict(Subject.objects.filter(pk__in=ids["subject"]).values_list("pk", "name")),
+        "teacher": dict(Teacher.objects.filter(pk__in=ids["teacher"]).values_list("pk", "code")),
+        "room": dict(Room.objects.filter(pk__in=ids["room"]).values_list("pk", "name")),
+        "period": {
+            pk: f"{DAY_LABELS.get(day, f'Day {day}')} P{order}"
+            for pk, day, order in Period.objects.filter(pk__in=ids["period"]).values_list("pk", "day", "order")
+        },
+    }
+
+
+def describe(change, labels):
+    """One line, e.g. "10-A Maths: Monday P2 -> Tuesday P5 (T012)"."""
+    def name(kind, pk):
+        return labels[kind].get(pk, f"#{pk}") if pk is not None else "-"
+
+    head = f"{name('class', change.school_class)} {name('subject', change.subject)}"
+    if change.kind == TEACHER_SWAPPED:
+        room = (
+            f", room {name('room', change.old_room)} -> {name('room', change.new_room)}"
+            if change.old_room != change.new_room else ""
+        )
+        return (
+            f"{head} {name('period', change.old_period)}: teacher "
+            f"{name('teacher', change.old_teacher)} -> {name('teacher', change.new_teacher)}{room}"
+        )
+    if change.kind == ROOM_SWAPPED:
+        return (
+            f"{head} {name('period', change.old_period)}: room "
+            f"{name('room', change.old_room)} -> {name('room', change.new_room)}"
+        )
+    if change.kind == MOVED:
+        teacher = (
+            name("teacher", change.new_teacher) if change.old_teacher == change.new_teacher
+            else f"{name('teacher', change.old_teacher)} -> {name('teacher', change.new_teacher)}"
+        )
+        return (
+            f"{head}: {name('period', change.old_period)} -> "
+            f"{name('period', change.new_period)} ({teacher})"
+        )
+    if change.kind == REMOVED:
+        return f"{head} {name('period', change.old_period)}: removed ({name('teacher', change.old_teacher)})"
+    return f"{head} {name('period', change.new_period)}: added ({name('teacher', change.new_teacher)})"
@@ -0,0 +1,193 @@
+"""
+Timetable exports.
+
+* ``pdf_documents`` yields the printable HTML of every class (and teacher),
+  built from the school grid projection; ``pdf.render_many`` and
+  ``zipstream.stream_zip`` turn them into a streamed ZIP of PDFs.
+* ``csv_chunks`` / ``xlsx_chunks`` stream every TimetableEntry as one flat
+  table (for SIS / payroll imports). Rows come from a server-side
+  ``values_list().iterator()`` and go out in small chunks, so memory stays
+  flat and the first bytes leave before the last row is read.
+"""
+
+import csv
+import io
+import zipfile
+from xml.sax.saxutils import escape
+
+from django.template.loader import render_to_string
+from django.utils.text import get_valid_filename
+
+from .grids import DAY_LABELS, school_grids
+from .models import SchoolClass, Teacher, TimetableEntry
+from .zipstream import ZipSink
+
+
+def _unique(name, taken):
+    """Archive path for ``name``; same-named classes get -2, -3, ..."""
+    stem, n = name, 1
+    while name in taken:
+        n += 1
+        name = f"{stem}-{n}"
+    taken.add(name)
+    return name
+
+
+def class_html(school_class, grids):
+    """Printable page of one class (what its PDF is rendered from)."""
+    return render_to_string("scheduler/printable_timetable.html", {
+        "school_class": school_class,
+        "period_orders": grids.period_orders,
+        "rows": grids.class_rows(school_class.pk),
+    })
+
+
+def pdf_documents(teachers=False):
+    """
+    Yield ``(archive path, html)`` per class, then per teacher if asked.
+    Lazy: one page is rendered only when the consumer asks for it.
+    """
+    grids = school_grids()
+    taken = set()
+
+    for school_class in SchoolClass.objects.order_by("name"):
+        name = _unique(f"classes/{get_valid_filename(school_class.name)}", taken)
+        yield f"{name}.pdf", class_html(school_class, grids)
+
+    if not teachers:
+        return
+    for teacher in Teacher.objects.select_related("user").order_by("code"):
+        html = render_to_string("scheduler/printable_teacher_timetable.html", {
+            "teacher": teacher,
+            "period_orders": grids.period_orders,
+            "rows": grids.teacher_rows(teacher.pk),
+        })
+        name = _unique(f"teachers/{get_valid_filename(teacher.code)}", taken)
+        yield f"{name}.pdf", html
+
+
+# -------------------------------------------------
+# Flat table export (CSV / XLSX)
+# -------------------------------------------------
+EXPORT_HEADER = ["class", "day", "period", "start_time", "end_time", "subject", "teacher_code", "room"]
+
+# Rows per DB fetch, and per chunk handed to the response
+CHUNK_ROWS = 2000
+
+
+def _time(value):
+    return value.strftime("%H:%M") if value else ""
+
+
+def export_rows(chunk_size=CHUNK_ROWS):
+    """Every lesson as a tuple in ``EXPORT_HEADER`` order, streamed from the DB."""
+    rows = (
+        TimetableEntry.objects
+        .order_by("school_class__name", "school_class_id", "period__day", "period__order")
+        .values_list(
+            "school_class__name",
+            "period__day",
+            "period__order",
+            "period__start_time",
+            "period__end_time",
+            "subject__name",
+            "teacher__code",
+            "room__name",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    for class_name, day, order, start, end, subject, teacher_code, room in rows:
+        yield (
+            class_name,
+            DAY_LABELS.get(day, f"Day {day}"),
+            order,
+            _time(start),
+            _time(end),
+            subject,
+            teacher_code,
+            room,
+        )
+
+
+def csv_chunks(rows, chunk_rows=CHUNK_ROWS):
+    """Yield CSV text (header first) in chunks of ``chunk_rows`` rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADER)
+    for i, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if i % chunk_rows == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+# Minimal SpreadsheetML package: one sheet, inline strings (no shared-string
+# table, which would need every value before the sheet could be written).
+_XLSX_PARTS = [
+    ("[Content_Types].xml",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ("_rels/.rels",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ("xl/workbook.xml",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Timetable" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ("xl/_rels/workbook.xml.rels",
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/>'
+     '</Relationships>'),
+]
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, int):
+            cells.append(f"<c t=\"n\"><v>{value}</v></c>")
+        else:
+            cells.append(f"<c t=\"inlineStr\"><is><t>{escape(str(value))}</t></is></c>")
+    return "<row>" + "".join(cells) + "</row>"
+
+
+def xlsx_chunks(rows, chunk_rows=CHUNK_ROWS):
+    """
+    Yield an .xlsx file (header row first) chunk by chunk. The sheet is
+    deflated straight into a streamed ZIP member as rows arrive.
+    """
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, xml in _XLSX_PARTS:
+            archive.writestr(name, xml)
+        with archive.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b"<sheetData>"
+            )
+            sheet.write(_xlsx_row(EXPORT_HEADER).encode())
+            for i, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row).encode())
+                if i % chunk_rows == 0:
+                    yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
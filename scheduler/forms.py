@@ -7,3 +7,34 @@ class ClassForm(forms.ModelForm):
         fields = ['name', 'strength']
 
 # Add other forms as needed for admin UI (subject, teacher) — simple ModelForms
+
+
+class GenerationForm(forms.Form):
+    """
+    Web se generation start karne ke options (generate_timetable jaise hi).
+    """
+    time_limit = forms.FloatField(
+        initial=30, min_value=1, max_value=3600,
+        help_text="Seconds of search per attempt.",
+    )
+    restarts = forms.IntegerField(
+        initial=1, min_value=1, max_value=32,
+        help_text="Independently seeded attempts; the best one is saved.",
+    )
+    jobs = forms.IntegerField(
+        initial=1, min_value=1, max_value=16,
+        help_text="Worker processes for the attempts.",
+    )
+    optimize = forms.FloatField(
+        initial=0, min_value=0, max_value=600,
+        help_text="Seconds of local search per attempt (fewer gaps, better spread).",
+    )
+    seed = forms.IntegerField(required=False, help_text="Same seed, same timetable.")
+    incremental = forms.BooleanField(
+        required=False,
+        help_text="Keep the current timetable, only re-solve around edits.",
+    )
+    strict = forms.BooleanField(
+        required=False,
+        help_text="Stop before the search if the pre-check finds that not every lesson can be placed.",
+    )
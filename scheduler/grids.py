@@ -0,0 +1,115 @@
+"""
+School-wide timetable grids.
+
+One pass over TimetableEntry builds the day x period grid of every class,
+teacher and room. The result is kept per process and rebuilt only when
+the school stamp moves (any bump in stamps.py), so the grid views run no
+timetable queries between changes.
+
+Entries come as plain rows (joined with their period) and point at one
+shared instance per subject / teacher / room / class - building a model
+object per row and per relation (select_related) was ~10x slower.
+"""
+
+import threading
+from collections import defaultdict, namedtuple
+
+from . import snapshots
+from .models import Period, TimetableEntry, Subject, Teacher, Room, SchoolClass
+from .stamps import school_stamp
+
+DAY_LABELS = dict(Period.DAY_CHOICES)
+
+# Grid cell - same attribute paths as a TimetableEntry, so templates work on both
+Lesson = namedtuple("Lesson", "school_class subject teacher room")
+
+
+class SchoolGrids:
+    """Every lesson of the school, indexed by class, teacher and room."""
+
+    def __init__(self, periods, rows, classes, subjects, teachers, rooms):
+        """``rows``: (class, subject, teacher, room, day, order) id tuples."""
+        self.period_orders = sorted({order for _, order in periods})
+        self.days = sorted({day for day, _ in periods})
+        self.n_periods = len(periods)
+
+        self.by_class = defaultdict(dict)
+        self.by_teacher = defaultdict(dict)
+        self.by_room = defaultdict(dict)
+        for class_id, subject_id, teacher_id, room_id, day, order in rows:
+            lesson = Lesson(classes[class_id], subjects[subject_id], teachers[teacher_id], rooms[room_id])
+            self.by_class[class_id][(day, order)] = lesson
+            self.by_teacher[teacher_id][(day, order)] = lesson
+            self.by_room[room_id][(day, order)] = lesson
+
+    def _rows(self, cells):
+        return [
+            {
+                "day": day,
+                "label": DAY_LABELS.get(day, f"Day {day}"),
+                "cells": [cells.get((day, order)) for order in self.period_orders],
+            }
+            for day in self.days
+        ]
+
+    def class_rows(self, class_id):
+        return self._rows(self.by_class.get(class_id, {}))
+
+    def teacher_rows(self, teacher_id):
+        return self._rows(self.by_teacher.get(teacher_id, {}))
+
+    def room_rows(self, room_id):
+        return self._rows(self.by_room.get(room_id, {}))
+
+    def room_usage(self, room_id):
+        """(periods used, periods in the week) for one room."""
+        return len(self.by_room.get(room_id, ())), self.n_periods
+
+
+def build_grids(stamp_key=None):
+    """
+    6 queries, one of them over TimetableEntry - replaced by the active
+    version's array snapshot when it was built at ``stamp_key``.
+    """
+    periods = {pk: (day, order) for pk, day, order in Period.objects.values_list("id", "day", "order")}
+    snapshot = snapshots.current(stamp_key) if stamp_key else None
+    if snapshot is not None:
+        rows = [
+            (c, s, t, r, *periods[p])
+            for c, p, s, t, r in snapshot.rows().tolist() if p in periods
+        ]
+    else:
+        rows = TimetableEntry.objects.values_list(
+            "school_class_id", "subject_id", "teacher_id", "room_id", "period__day", "period__order"
+        )
+    return SchoolGrids(
+        list(periods.values()),
+        rows,
+        SchoolClass.objects.in_bulk(),
+        Subject.objects.in_bulk(),
+        Teacher.objects.select_related("user").in_bulk(),
+        Room.objects.in_bulk(),
+    )
+
+
+_lock = threading.Lock()
+_cached = (None, None)  # (school stamp key, SchoolGrids)
+
+
+def school_grids():
+    """The current ``SchoolGrids``, rebuilt only after a change."""
+    global _cached
+    key = school_stamp().key
+    if _cached[0] != key:
+        with _lock:
+            # Stamp read before the build, so the grids are never older than key
+            if _cached[0] != key:
+                _cached = (key, build_grids(key))
+    return _cached[1]
+
+
+def clear_cache():
+    """Forget the projection (benchmarks measure the cold path with this)."""
+    global _cached
+    with _lock:
+        _cached = (None, None)
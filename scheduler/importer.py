@@ -0,0 +1,511 @@
+"""
+Bulk import of school master data from CSV / JSON.
+
+Sources (any mix):
+
+* ``<kind>.csv`` - one file per kind, header row with the columns below
+* ``*.json``     - ``{"<kind>": [{column: value, ...}, ...], ...}``
+* ``*.zip``      - any of the above inside
+
+Kinds, in import order (natural key first):
+
+* ``subjects``         name, code, default_periods_per_week, color_code
+* ``rooms``            name, capacity
+* ``classes``          name, strength
+* ``periods``          day (1-6 or Monday..), order, start_time, end_time
+* ``teachers``         code, username, first_name, last_name, email, max_periods_per_day
+* ``teacher_subjects`` teacher (code), subject (name)
+* ``constraints``      teacher (code, empty = everyone), day, order, blocked, note
+
+Rows whose key already exists update that row (only if a value differs,
+so re-importing the same files writes nothing), the rest are created.
+Everything is parsed and checked first - references are resolved against
+the file and the database with one query per table - and only a clean
+import is written, in one transaction with bulk_create / bulk_update.
+Bulk writes send no model signals, so what the receivers would do per
+row (user profiles, ScheduleChange tracking, page stamps) happens here
+once per batch.
+"""
+
+import csv
+import io
+import json
+import os
+import zipfile
+from datetime import datetime
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import stamps
+from .models import (
+    UserProfile,
+    Teacher,
+    Room,
+    SchoolClass,
+    Subject,
+    TeacherSubject,
+    Period,
+    Constraint,
+    ScheduleChange,
+)
+
+KINDS = ["subjects", "rooms", "classes", "periods", "teachers", "teacher_subjects", "constraints"]
+
+DAY_NUMBERS = {label.lower(): day for day, label in Period.DAY_CHOICES}
+
+
+class ImportFailed(Exception):
+    """The sources have problems; ``errors`` lists them, nothing was written."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__(f"{len(errors)} problem(s) in the import")
+
+
+# -------------------------------------------------
+# Reading sources
+# -------------------------------------------------
+def read_source(name, data, rows=None):
+    """
+    Add the rows of one file (``data`` = bytes) to ``rows``:
+    ``{kind: [(where, {column: value}), ...]}``. ``where`` is used in
+    error messages, e.g. ``teachers.csv:12``.
+    """
+    rows = rows if rows is not None else {kind: [] for kind in KINDS}
+    base = os.path.basename(name)
+    stem, ext = os.path.splitext(base)
+    ext = ext.lower()
+
+    if ext == ".zip":
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+        except zipfile.BadZipFile:
+            raise ImportFailed([f"{base}: not a valid ZIP file"])
+        with archive:
+            for member in archive.namelist():
+                if not member.endswith("/"):
+                    read_source(member, archive.read(member), rows)
+    elif ext == ".json":
+        try:
+            content = json.loads(data.decode("utf-8-sig"))
+        except ValueError as exc:  # UnicodeDecodeError bhi ValueError hai
+            raise ImportFailed([f"{base}: not valid UTF-8 JSON ({exc})"])
+        if not isinstance(content, dict):
+            raise ImportFailed([f"{base}: expected an object with {', '.join(KINDS)}"])
+        for kind in KINDS:
+            for i, row in enumerate(content.get(kind) or []):
+                rows[kind].append((f"{base}:{kind}[{i}]", row if isinstance(row, dict) else {}))
+    elif ext == ".csv":
+        if stem not in KINDS:
+            raise ImportFailed([f"{base}: file name must be one of {', '.join(k + '.csv' for k in KINDS)}"])
+        try:
+            text = data.decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise ImportFailed([f"{base}: save the file as UTF-8 CSV"])
+        for line, row in enumerate(csv.DictReader(io.StringIO(text)), 2):
+            rows[stem].append((f"{base}:{line}", row))
+    else:
+        raise ImportFailed([f"{base}: only .csv, .json and .zip files can be imported"])
+    return rows
+
+
+def read_paths(paths):
+    """``read_source`` for files and directories (all files directly inside)."""
+    rows = {kind: [] for kind in KINDS}
+    for path in paths:
+        files = (
+            sorted(os.path.join(path, f) for f in os.listdir(path)
+                   if os.path.isfile(os.path.join(path, f)))
+            if os.path.isdir(path) else [path]
+        )
+        for file_path in files:
+            with open(file_path, "rb") as handle:
+                read_source(file_path, handle.read(), rows)
+    return rows
+
+
+def describe(summary):
+    """One line for messages: 'teachers 10 new / 2 updated, ...'."""
+    parts = []
+    for kind in KINDS:
+        value = summary.get(kind)
+        if isinstance(value, int):
+            if value:
+                parts.append(f"{kind} {value}")
+        elif value and any(value):
+            parts.append(f"{kind} {value[0]} new / {value[1]} updated")
+    return ", ".join(parts) or "nothing"
+
+
+# -------------------------------------------------
+# Field parsing
+# -------------------------------------------------
+def _text(row, field, required=False, max_length=None):
+    value = row.get(field)
+    value = "" if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f"{field} is required")
+    if max_length and len(value) > max_length:
+        raise ValueError(f"{field} is longer than {max_length} characters")
+    return value
+
+
+def _int(row, field, default=None, minimum=0):
+    value = _text(row, field)
+    if not value:
+        if default is None:
+            raise ValueError(f"{field} is required")
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f"{field} must be a whole number, got {value!r}")
+    if number < minimum:
+        raise ValueError(f"{field} must be at least {minimum}")
+    return number
+
+
+def _time(row, field):
+    value = _text(row, field)
+    if not value:
+        return None
+    for fmt in ("%H:%M", "%H:%M:%S"):  # Excel "9:00" bhi chalega
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError(f"{field} must be a time like 09:00, got {value!r}")
+
+
+def _day(row):
+    value = _text(row, "day", required=True)
+    if value.isdigit() and int(value) in dict(Period.DAY_CHOICES):
+        return int(value)
+    if value.lower() in DAY_NUMBERS:
+        return DAY_NUMBERS[value.lower()]
+    raise ValueError(f"day must be 1-6 or a day name, got {value!r}")
+
+
+def _bool(row, field, default=True):
+    value = _text(row, field).lower()
+    if not value:
+        return default
+    if value in ("1", "true", "yes", "y"):
+        return True
+    if value in ("0", "false", "no", "n"):
+        return False
+    raise ValueError(f"{field} must be yes/no, got {value!r}")
+
+
+# -------------------------------------------------
+# Import
+# -------------------------------------------------
+class SchoolImport:
+    """
+    ``SchoolImport(rows).run()`` validates everything, then writes it.
+    Raises ``ImportFailed`` (nothing written) or returns a summary
+    ``{kind: (created, updated)}``; with ``dry_run`` only validates and
+    returns ``{kind: rows}``.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.errors = []
+        self.parsed = {kind: {} for kind in KINDS}
+
+    def run(self, dry_run=False):
+        self.parse()
+        self.check_references()
+        if self.errors:
+            raise ImportFailed(self.errors)
+        if dry_run:
+            return {kind: len(items) for kind, items in self.parsed.items()}
+        with transaction.atomic():
+            return self.write()
+
+    # ---- step 1: every row on its own ----
+    def parse(self):
+        parsers = {
+            "subjects": self._subject,
+            "rooms": self._room,
+            "classes": self._class,
+            "periods": self._period,
+            "teachers": self._teacher,
+            "teacher_subjects": self._teacher_subject,
+            "constraints": self._constraint,
+        }
+        for kind in KINDS:
+            seen = {}
+            for where, row in self.rows.get(kind, ()):
+                try:
+                    key, values = parsers[kind](row)
+                except ValueError as exc:
+                    self.errors.append(f"{where}: {exc}")
+                    continue
+                if key in seen:
+                    self.errors.append(f"{where}: duplicate of {seen[key]}")
+                    continue
+                seen[key] = where
+                self.parsed[kind][key] = values
+
+    def _subject(self, row):
+        name = _text(row, "name", required=True, max_length=100)
+        color = _text(row, "color_code", max_length=7)
+        if color and not color.startswith("#"):
+            raise ValueError(f"color_code must look like #81E6D9, got {color!r}")
+        return name, {
+            "code": _text(row, "code", max_length=20),
+            "default_periods_per_week": _int(row, "default_periods_per_week", default=5),
+            "color_code": color,
+        }
+
+    def _room(self, row):
+        return _text(row, "name", required=True, max_length=50), {
+            "capacity": _int(row, "capacity", default=30),
+        }
+
+    def _class(self, row):
+        return _text(row, "name", required=True, max_length=50), {
+            "strength": _int(row, "strength", default=30),
+        }
+
+    def _period(self, row):
+        return (_day(row), _int(row, "order", minimum=1)), {
+            "start_time": _time(row, "start_time"),
+            "end_time": _time(row, "end_time"),
+        }
+
+    def _teacher(self, row):
+        code = _text(row, "code", required=True, max_length=20)
+        return code, {
+            "username": _text(row, "username", max_length=150) or code,
+            "first_name": _text(row, "first_name", max_length=150),
+            "last_name": _text(row, "last_name", max_length=150),
+            "email": _text(row, "email", max_length=254),
+            "max_periods_per_day": _int(row, "max_periods_per_day", default=6, minimum=1),
+        }
+
+    def _teacher_subject(self, row):
+        return (_text(row, "teacher", required=True), _text(row, "subject", required=True)), {}
+
+    def _constraint(self, row):
+        key = (_text(row, "teacher"), _day(row), _int(row, "order", minimum=1))
+        return key, {
+            "blocked": _bool(row, "blocked"),
+            "note": _text(row, "note", max_length=200),
+        }
+
+    # ---- step 2: references, set-based (one query per table) ----
+    def check_references(self):
+        teachers = self.parsed["teachers"]
+        pairs = self.parsed["teacher_subjects"]
+        constraints = self.parsed["constraints"]
+
+        codes = {t for t, _ in pairs} | {t for t, _, _ in constraints if t}
+        known_codes = set(teachers) | set(
+            Teacher.objects.filter(code__in=codes - set(teachers)).values_list("code", flat=True)
+        )
+        names = {s for _, s in pairs}
+        known_subjects = set(self.parsed["subjects"]) | set(
+            Subject.objects.filter(name__in=names).values_list("name", flat=True)
+        )
+        slots = {(day, order) for _, day, order in constraints}
+        known_slots = set(self.parsed["periods"]) | set(
+            Period.objects.filter(day__in={d for d, _ in slots}).values_list("day", "order")
+        )
+
+        for code, subject in pairs:
+            if code not in known_codes:
+                self.errors.append(f"teacher_subjects: unknown teacher {code!r}")
+            if subject not in known_subjects:
+                self.errors.append(f"teacher_subjects: unknown subject {subject!r}")
+        for code, day, order in constraints:
+            if code and code not in known_codes:
+                self.errors.append(f"constraints: unknown teacher {code!r}")
+            if (day, order) not in known_slots:
+                self.errors.append(f"constraints: no period for day {day}, order {order}")
+
+        # usernames: must not belong to a different teacher (in DB or in this file)
+        by_username = {}
+        for code, values in teachers.items():
+            other = by_username.setdefault(values["username"], code)
+            if other != code:
+                self.errors.append(f"teachers: {code} and {other} both use username {values['username']!r}")
+        linked = Teacher.objects.filter(user__username__in=by_username).values_list("user__username", "code")
+        for username, code in linked:
+            if by_username[username] != code:
+                self.errors.append(
+                    f"teachers: username {username!r} already belongs to teacher {code}"
+                )
+        current = Teacher.objects.filter(code__in=teachers).values_list("code", "user__username")
+        for code, username in current:
+            if teachers[code]["username"] != username:
+                self.errors.append(
+                    f"teachers: {code} is linked to user {username!r}, not {teachers[code]['username']!r}"
+                )
+
+    # ---- step 3: write ----
+    def write(self):
+        summary = {}
+        changed = {"teacher": set(), "room": set(), "period": set()}
+
+        summary["subjects"], _ = _upsert(Subject, self.parsed["subjects"], "name")
+        summary["rooms"], changed["room"] = _upsert(Room, self.parsed["rooms"], "name")
+        summary["classes"], _ = _upsert(SchoolClass, self.parsed["classes"], "name")
+        summary["periods"], changed["period"] = _upsert(Period, self.parsed["periods"], "day", "order")
+        summary["teachers"], changed["teacher"] = self._write_teachers()
+
+        teacher_ids = dict(Teacher.objects.filter(
+            code__in={t for t, _ in self.parsed["teacher_subjects"]}
+            | {t for t, _, _ in self.parsed["constraints"] if t}
+        ).values_list("code", "pk"))
+        summary["teacher_subjects"], mapped = self._write_teacher_subjects(teacher_ids)
+        summary["constraints"], blocked = self._write_constraints(teacher_ids)
+
+        # What the post_save receivers would have recorded, once
+        ScheduleChange.objects.bulk_create(
+            [ScheduleChange(teacher_pk=pk, source="import") for pk in changed["teacher"] | mapped]
+            + [ScheduleChange(room_pk=pk, source="import") for pk in changed["room"]]
+            + [ScheduleChange(period_pk=pk, source="import") for pk in changed["period"]]
+            + [ScheduleChange(teacher_pk=t, period_pk=p, source="import") for t, p in blocked]
+        )
+        if any(any(counts) for counts in summary.values()):
+            stamps.bump(everything=True)
+        return summary
+
+    def _write_teachers(self):
+        teachers = self.parsed["teachers"]
+        if not teachers:
+            return (0, 0), set()
+        user_fields = ["first_name", "last_name", "email"]
+
+        # Users
+        by_username = {v["username"]: v for v in teachers.values()}
+        users = {u.username: u for u in User.objects.filter(username__in=by_username)}
+        new_users, changed_users = [], []
+        for username, values in by_username.items():
+            user = users.get(username)
+            if user is None:
+                # Unusable password: teachers set their own (hashing thousands here would take minutes)
+                new_users.append(User(username=username, password=make_password(None),
+                                      **{f: values[f] for f in user_fields}))
+            elif _assign(user, {f: values[f] for f in user_fields}):
+                changed_users.append(user)
+        User.objects.bulk_create(new_users)
+        User.objects.bulk_update(changed_users, user_fields)
+        user_ids = dict(User.objects.filter(username__in=by_username).values_list("username", "pk"))
+
+        # Profiles: create missing ones as TEACHER, promote STUDENT (never demote an ADMIN)
+        has_profile = set(UserProfile.objects.filter(user_id__in=user_ids.values()).values_list("user_id", flat=True))
+        UserProfile.objects.bulk_create([
+            UserProfile(user_id=pk, role="TEACHER") for pk in user_ids.values() if pk not in has_profile
+        ])
+        UserProfile.objects.filter(user_id__in=has_profile, role="STUDENT").update(role="TEACHER")
+
+        # Teachers
+        existing = {t.code: t for t in Teacher.objects.filter(code__in=teachers)}
+        new, updated = [], []
+        for code, values in teachers.items():
+            teacher = existing.get(code)
+            if teacher is None:
+                new.append(Teacher(code=code, user_id=user_ids[values["username"]],
+                                   max_periods_per_day=values["max_periods_per_day"]))
+            elif _assign(teacher, {"max_periods_per_day": values["max_periods_per_day"]}):
+                updated.append(teacher)
+        Teacher.objects.bulk_create(new)
+        Teacher.objects.bulk_update(updated, ["max_periods_per_day"])
+        return (len(new), len(updated)), {t.pk for t in updated}
+
+    def _write_teacher_subjects(self, teacher_ids):
+        pairs = self.parsed["teacher_subjects"]
+        if not pairs:
+            return (0, 0), set()
+        subject_ids = _first_pks(Subject, "name", {s for _, s in pairs})
+        wanted = {(teacher_ids[t], subject_ids[s]) for t, s in pairs}
+        have = set(TeacherSubject.objects.filter(
+            teacher_id__in={t for t, _ in wanted}
+        ).values_list("teacher_id", "subject_id"))
+        new = [TeacherSubject(teacher_id=t, subject_id=s) for t, s in wanted - have]
+        TeacherSubject.objects.bulk_create(new)
+        return (len(new), 0), {ts.teacher_id for ts in new}
+
+    def _write_constraints(self, teacher_ids):
+        constraints = self.parsed["constraints"]
+        if not constraints:
+            return (0, 0), set()
+        period_ids = {
+            (day, order): pk
+            for pk, day, order in Period.objects.filter(
+                day__in={d for _, d, _ in constraints}
+            ).values_list("pk", "day", "order")
+        }
+        wanted = {
+            (teacher_ids.get(t), period_ids[(d, o)]): values
+            for (t, d, o), values in constraints.items()
+        }
+        existing = {}
+        for c in Constraint.objects.filter(period_id__in={p for _, p in wanted}).order_by("-pk"):
+            existing[(c.teacher_id, c.period_id)] = c  # lowest pk wins
+        new, updated = [], []
+        for (teacher_id, period_id), values in wanted.items():
+            c = existing.get((teacher_id, period_id))
+            if c is None:
+                new.append(Constraint(teacher_id=teacher_id, period_id=period_id, **values))
+            elif _assign(c, values):
+                updated.append(c)
+        Constraint.objects.bulk_create(new)
+        Constraint.objects.bulk_update(updated, ["blocked", "note"])
+        return (len(new), len(updated)), {(c.teacher_id, c.period_id) for c in new + updated}
+
+
+def _assign(obj, values):
+    """Set ``values`` on ``obj``; True if anything actually changed."""
+    changed = False
+    for field, value in values.items():
+        if getattr(obj, field) != value:
+            setattr(obj, field, value)
+            changed = True
+    return changed
+
+
+def _first_pks(model, field, values):
+    """{value: pk} - with duplicate names the oldest row wins."""
+    result = {}
+    for value, pk in model.objects.filter(**{f"{field}__in": values}).order_by("-pk").values_list(field, "pk"):
+        result[value] = pk
+    return result
+
+
+def _upsert(model, items, *key_fields):
+    """
+    Create / update ``model`` rows from ``{key: {field: value}}``, where
+    a key is the value of ``key_fields`` (a tuple if there are several).
+    Unchanged rows are left alone. Returns ((created, updated), pks of
+    updated rows).
+    """
+    if not items:
+        return (0, 0), set()
+
+    def key_of(obj):
+        values = tuple(getattr(obj, f) for f in key_fields)
+        return values if len(key_fields) > 1 else values[0]
+
+    keys = [k if len(key_fields) > 1 else (k,) for k in items]
+    lookup = {f"{field}__in": {k[i] for k in keys} for i, field in enumerate(key_fields)}
+    existing = {}
+    for obj in model.objects.filter(**lookup).order_by("-pk"):
+        existing[key_of(obj)] = obj  # duplicate names: oldest row wins
+
+    new, updated = [], []
+    for key, values in items.items():
+        obj = existing.get(key)
+        if obj is None:
+            parts = key if len(key_fields) > 1 else (key,)
+            new.append(model(**dict(zip(key_fields, parts)), **values))
+        elif _assign(obj, values):
+            updated.append(obj)
+    model.objects.bulk_create(new)
+    model.objects.bulk_update(updated, list(next(iter(items.values()))))
+    return (len(new), len(updated)), {obj.pk for obj in updated}
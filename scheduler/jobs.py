@@ -0,0 +1,203 @@
+"""
+Background timetable generation.
+
+Admins queue a ``GenerationJob`` from the web (``enqueue``); the worker
+(``manage.py generation_worker``) polls the table and runs
+``generate_timetable --job <id>`` for it - no broker, no request timeout.
+The command reports through ``JobReporter``: phase, lessons placed / to
+place, best score so far, and it stops at the next report once
+``cancel_requested`` is set.
+
+Lock: a job is RUNNING only between ``claim`` / ``start_direct`` and
+``JobReporter.finish``, and the table allows one RUNNING and one QUEUED
+row, so a second generation (web or CLI) is refused by the database
+itself - the ``active_job`` checks before that only give a nicer message.
+A RUNNING job whose worker died stops sending heartbeats and is failed
+after ``STALE_AFTER`` (``reap_stale``), which frees the lock.
+"""
+
+import threading
+import time
+from datetime import timedelta
+
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.utils import timezone
+
+from .models import GenerationJob
+
+# A running job's process touches heartbeat_at this often (own thread, so
+# a long solve on a process pool or a big write doesn't look dead) ...
+HEARTBEAT_EVERY = 20
+# ... and without a heartbeat for this long the worker is gone
+STALE_AFTER = timedelta(minutes=2)
+
+# Progress writes per job, at most one per this many seconds
+WRITE_EVERY = 1.0
+
+
+class GenerationLocked(Exception):
+    """Another generation is queued / running."""
+
+
+class Cancelled(Exception):
+    """The job was cancelled while it ran."""
+
+
+def reap_stale():
+    """Fail RUNNING jobs without a heartbeat for ``STALE_AFTER``."""
+    now = timezone.now()
+    return GenerationJob.objects.filter(
+        status=GenerationJob.RUNNING, heartbeat_at__lt=now - STALE_AFTER
+    ).update(
+        status=GenerationJob.FAILED,
+        finished_at=now,
+        phase="",
+        message="The worker stopped responding.",
+    )
+
+
+def active_job():
+    return GenerationJob.objects.filter(
+        status__in=[GenerationJob.QUEUED, GenerationJob.RUNNING]
+    ).order_by("id").first()
+
+
+def enqueue(options, user=None):
+    """Queue a run for the worker. Only one job can wait or run at a time."""
+    reap_stale()
+    current = active_job()
+    if current is not None:
+        raise GenerationLocked(f"Generation #{current.pk} is already {current.status}.")
+    try:
+        with transaction.atomic():
+            return GenerationJob.objects.create(options=options, requested_by=user)
+    except IntegrityError:
+        # Check ke baad kisi aur ne queue kar diya (one_queued_generation)
+        raise GenerationLocked("Another generation was queued just now.")
+
+
+def claim(job_id):
+    """
+    QUEUED -> RUNNING for the worker. False if the job is not queued any
+    more (cancelled); ``GenerationLocked`` if another one is running.
+    """
+    reap_stale()
+    now = timezone.now()
+    try:
+        with transaction.atomic():
+            return bool(GenerationJob.objects.filter(
+                pk=job_id, status=GenerationJob.QUEUED, cancel_requested=False
+            ).update(status=GenerationJob.RUNNING, started_at=now, heartbeat_at=now, phase="loading"))
+    except IntegrityError:
+        raise GenerationLocked("Another generation is running.")
+
+
+def start_direct(options, tries=2):
+    """A CLI run: a job that is RUNNING right away, under the same lock."""
+    for _ in range(tries):
+        reap_stale()
+        now = timezone.now()
+        try:
+            with transaction.atomic():
+                return GenerationJob.objects.create(
+                    status=GenerationJob.RUNNING,
+                    options=options,
+                    started_at=now,
+                    heartbeat_at=now,
+                    phase="loading",
+                )
+        except IntegrityError:
+            running = GenerationJob.objects.filter(status=GenerationJob.RUNNING).first()
+            if running is not None:
+                raise GenerationLocked(f"Generation #{running.pk} is running.")
+            # Lock wala job abhi abhi khatam hua - dobara try
+    raise GenerationLocked("Another generation is running.")
+
+
+def cancel(job):
+    """Queued: cancelled now. Running: stops at its next progress report."""
+    now = timezone.now()
+    if GenerationJob.objects.filter(pk=job.pk, status=GenerationJob.QUEUED).update(
+        status=GenerationJob.CANCELLED, cancel_requested=True, finished_at=now
+    ):
+        return
+    GenerationJob.objects.filter(pk=job.pk, status=GenerationJob.RUNNING).update(cancel_requested=True)
+
+
+class JobReporter:
+    """
+    Writes the progress of a RUNNING job to its row (throttled) and
+    raises ``Cancelled`` from the write that finds ``cancel_requested``.
+    Use as a context manager: a heartbeat thread runs inside it.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.next_write = 0.0
+        self.attempts = 0
+        self.best = None  # (unplaced, soft penalty) of the best finished attempt
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def _heartbeat(self):
+        try:
+            while not self._stop.wait(HEARTBEAT_EVERY):
+                try:
+                    GenerationJob.objects.filter(
+                        pk=self.job_id, status=GenerationJob.RUNNING
+                    ).update(heartbeat_at=timezone.now())
+                except DatabaseError:
+                    pass  # e.g. SQLite busy during the timetable write; next beat
+        finally:
+            connection.close()  # this thread's own connection
+
+    def update(self, force=False, **fields):
+        now = time.monotonic()
+        if not force and now < self.next_write:
+            return
+        self.next_write = now + WRITE_EVERY
+        # one query: the update matches nothing once a cancel was asked
+        if not GenerationJob.objects.filter(pk=self.job_id, cancel_requested=False).update(
+            heartbeat_at=timezone.now(), **fields
+        ):
+            raise Cancelled()
+
+    def phase(self, name):
+        self.update(force=True, phase=name)
+
+    def search_progress(self, placed, total, best):
+        fields = {"placed": placed, "total": total}
+        if self.best is None:
+            fields["best_unplaced"] = total - best
+        self.update(**fields)
+
+    def attempt_done(self, solution):
+        self.attempts += 1
+        if self.best is None or solution.quality < self.best:
+            self.best = solution.quality
+        self.update(
+            force=True,
+            attempts_done=self.attempts,
+            best_unplaced=self.best[0],
+            best_penalty=self.best[1],
+        )
+
+    def finish(self, status, message="", **fields):
+        """Final state (frees the lock); never raises Cancelled, the run is over."""
+        now = timezone.now()
+        GenerationJob.objects.filter(pk=self.job_id).update(
+            status=status,
+            phase="",
+            finished_at=now,
+            heartbeat_at=now,
+            message=message,
+            **fields,
+        )
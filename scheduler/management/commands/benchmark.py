@@ -0,0 +1,138 @@
+import json
+from dataclasses import replace
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+
+from scheduler import benchmark
+from scheduler.synthetic import PRESETS
+
+# --<option> that override a field of every chosen SchoolSize
+SIZE_OPTIONS = [
+    ("classes", int),
+    ("teachers", int),
+    ("subjects", int),
+    ("rooms", int),
+    ("periods_per_day", int),
+    ("constraint_density", float),
+    ("subjects_per_teacher", int),
+    ("seed", int),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark generation, validation and grid views on synthetic schools (in a throwaway test database)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            choices=sorted(PRESETS),
+            default=["small", "medium"],
+            help="School presets to run (default: small medium).",
+        )
+        for field, kind in SIZE_OPTIONS:
+            parser.add_argument(
+                f"--{field.replace('_', '-')}",
+                type=kind,
+                default=None,
+                help=f"Override {field} of every preset.",
+            )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Timed runs per case (default 3).",
+        )
+        parser.add_argument(
+            "--time-limit",
+            type=float,
+            default=10.0,
+            help="generate_timetable --time-limit for each run.",
+        )
+        parser.add_argument(
+            "--baseline",
+            default=str(Path(settings.BASE_DIR) / "benchmark_baseline.json"),
+            help="Baseline JSON to compare with / save to.",
+        )
+        parser.add_argument(
+            "--save",
+            action="store_true",
+            help="Store this run as the new baseline.",
+        )
+        parser.add_argument(
+            "--output",
+            help="Also write this run's results to a JSON file.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Allowed slowdown / memory growth before it counts as a regression (default 0.2 = 20%%).",
+        )
+        parser.add_argument(
+            "--fail-on-regression",
+            action="store_true",
+            help="Exit with an error if anything regressed against the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        overrides = {f: options[f] for f, _ in SIZE_OPTIONS if options[f] is not None}
+        results = {"environment": benchmark.environment(), "sizes": {}}
+
+        # Apna data kabhi nahi chhoota: sab kuch test database me
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        runner.setup_test_environment()
+        old_config = runner.setup_databases()
+        try:
+            for name in options["sizes"]:
+                size = replace(PRESETS[name], **overrides)
+                self.stdout.write(f"{name}: {size}")
+                call_command("flush", interactive=False, verbosity=0)
+                run = benchmark.run_size(size, options["repeat"], options["time_limit"])
+                results["sizes"][name] = run
+                self.report(run)
+        finally:
+            runner.teardown_databases(old_config)
+            runner.teardown_test_environment()
+
+        text = json.dumps(results, indent=2)
+        if options["output"]:
+            Path(options["output"]).write_text(text)
+
+        baseline_path = Path(options["baseline"])
+        regressions = []
+        if baseline_path.exists():
+            lines, regressions = benchmark.compare(
+                results, json.loads(baseline_path.read_text()), options["tolerance"]
+            )
+            self.stdout.write(f"\nAgainst {baseline_path}:")
+            for line in lines:
+                style = self.style.ERROR if line in regressions else str
+                self.stdout.write(style(f"  {line}"))
+        else:
+            self.stdout.write(f"\nNo baseline at {baseline_path} (use --save to create it).")
+
+        if options["save"]:
+            baseline_path.write_text(text)
+            self.stdout.write(self.style.SUCCESS(f"Saved baseline to {baseline_path}."))
+
+        if regressions:
+            message = f"{len(regressions)} regression(s) against the baseline."
+            if options["fail_on_regression"]:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+
+    def report(self, run):
+        self.stdout.write(f"  built in {run['build_ms']:.0f} ms")
+        for case, metrics in run["cases"].items():
+            extra = "".join(
+                f", {key} {metrics[key]}" for key in ("solve_rate", "solved", "entries") if key in metrics
+            )
+            self.stdout.write(
+                f"  {case:<18} {metrics['wall_ms']:>9.1f} ms (best {metrics['best_ms']:.1f})"
+                f"  {metrics['queries']:>5} queries  {metrics['peak_kb']:>7} KB peak{extra}"
+            )
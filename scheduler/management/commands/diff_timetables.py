@@ -0,0 +1,78 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler import diffs
+
+
+class Command(BaseCommand):
+    help = 'Show what changed between two timetable versions (or snapshot directories)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "old",
+            nargs="?",
+            help="Version id, 'db' or a snapshot directory. Default: the version the last generation replaced.",
+        )
+        parser.add_argument(
+            "new",
+            nargs="?",
+            default="db",
+            help="Version id, 'db' (default: the current timetable) or a snapshot directory.",
+        )
+        parser.add_argument(
+            "--by",
+            choices=["class", "teacher"],
+            default="class",
+            help="Group the change list per class (default) or per teacher.",
+        )
+        parser.add_argument("--limit", type=int, default=0, help="Show at most N changes per group.")
+        parser.add_argument("--json", action="store_true", help="Print the changes as JSON.")
+
+    def handle(self, *args, **options):
+        old = options["old"]
+        if old is None:
+            old = diffs.previous_version_id()
+            if old is None:
+                raise CommandError("No archived version to compare with; pass OLD explicitly.")
+
+        started = time.perf_counter()
+        try:
+            result = diffs.diff_specs(old, options["new"])
+        except diffs.DiffError as exc:
+            raise CommandError(str(exc))
+        elapsed = (time.perf_counter() - started) * 1000
+
+        labels = diffs.load_labels(result.changes)
+        key = "class" if options["by"] == "class" else "teacher"
+        groups = result.by_class() if key == "class" else result.by_teacher()
+        ordered = sorted(groups.items(), key=lambda item: labels[key].get(item[0], ""))
+
+        if options["json"]:
+            self.stdout.write(json.dumps({
+                "old": result.old_label,
+                "new": result.new_label,
+                "counts": result.counts(),
+                f"by_{key}": {
+                    labels[key].get(pk, f"#{pk}"): [
+                        {"text": diffs.describe(change, labels), **change._asdict()}
+                        for change in changes
+                    ]
+                    for pk, changes in ordered
+                },
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f"{result.old_label} -> {result.new_label}: {result.summary()} ({elapsed:.0f} ms)"
+        )
+        limit = options["limit"]
+        for pk, changes in ordered:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f"{labels[key].get(pk, f'#{pk}')} ({len(changes)})"
+            ))
+            for change in changes[:limit or None]:
+                self.stdout.write(f"  {diffs.describe(change, labels)}")
+            if limit and len(changes) > limit:
+                self.stdout.write(f"  ... {len(changes) - limit} more")
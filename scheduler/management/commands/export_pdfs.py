@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler import pdf
+from scheduler.exports import pdf_documents
+from scheduler.zipstream import stream_zip
+
+
+class Command(BaseCommand):
+    help = 'Render every class (and optionally teacher) timetable to PDF, into one ZIP'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            default="timetables.zip",
+            help="ZIP file to write (default: timetables.zip).",
+        )
+        parser.add_argument(
+            "--teachers",
+            action="store_true",
+            help="Also add a PDF per teacher.",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=pdf.DEFAULT_JOBS,
+            help="Worker processes rendering PDFs.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            pdf.check_available()
+        except pdf.PDFUnavailable as exc:
+            raise CommandError(str(exc))
+
+        documents = pdf_documents(teachers=options["teachers"])
+        rendered = 0
+
+        def progress(files):
+            nonlocal rendered
+            for name, data in files:
+                rendered += 1
+                self.stdout.write(f"  {name} ({len(data) // 1024} KB)")
+                yield name, data
+
+        with open(options["output"], "wb") as out:
+            for chunk in stream_zip(progress(pdf.render_many(documents, options["jobs"]))):
+                out.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rendered} PDFs to {options['output']}."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.exports import export_rows, csv_chunks, xlsx_chunks
+
+
+class Command(BaseCommand):
+    help = 'Export every timetable entry as CSV or XLSX (class, day, period, times, subject, teacher code, room)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format",
+            choices=["csv", "xlsx"],
+            default="csv",
+        )
+        parser.add_argument(
+            "--output",
+            default="-",
+            help="File to write; '-' (default) writes CSV to stdout.",
+        )
+
+    def handle(self, *args, **options):
+        fmt, output = options["format"], options["output"]
+
+        if fmt == "csv":
+            if output == "-":
+                for chunk in csv_chunks(export_rows()):
+                    self.stdout.write(chunk, ending="")
+                return
+            with open(output, "w", newline="", encoding="utf-8") as out:
+                for chunk in csv_chunks(export_rows()):
+                    out.write(chunk)
+        else:
+            if output == "-":
+                raise CommandError("XLSX is a binary file, give it an --output path.")
+            with open(output, "wb") as out:
+                for chunk in xlsx_chunks(export_rows()):
+                    out.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {output}."))
@@ -1,113 +1,384 @@
-from django.core.management.base import BaseCommand
-from scheduler.models import SchoolClass, Subject, TeacherSubject, Period, Teacher, Room, TimetableEntry, Constraint
-from django.db import transaction
-import random
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler import diffs, jobs, pdf, snapshots, versions
+from scheduler.models import GenerationJob
+from scheduler.profiling import RunProfile
+from scheduler.stamps import school_stamp
+from scheduler.solver import check_feasibility, solve_many
+from scheduler.solver.db import (
+    load_problem,
+    load_names,
+    load_entries,
+    last_change_id,
+    load_changes,
+    clear_changes,
+    build_entries,
+    diff_counts,
+    entry_ids,
+)
+from scheduler.solver.feasibility import describe
+from scheduler.solver.incremental import cells_to_free, with_fixed
+
+# Options that describe a run (stored on its GenerationJob)
+RUN_OPTIONS = (
+    "seed", "time_limit", "max_nodes", "restarts", "jobs", "optimize", "incremental", "strict",
+)
+
 
 class Command(BaseCommand):
     help = 'Generate timetable for all classes'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=None,
+            help="Random seed, to get the same timetable again.",
+        )
+        parser.add_argument(
+            "--time-limit",
+            type=float,
+            default=30.0,
+            help="Stop searching after this many seconds and keep the best timetable found.",
+        )
+        parser.add_argument(
+            "--max-nodes",
+            type=int,
+            default=None,
+            help="Stop searching after this many placements.",
+        )
+        parser.add_argument(
+            "--restarts",
+            type=int,
+            default=1,
+            help="Number of independently seeded attempts; the best one is saved.",
+        )
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=1,
+            help="Worker processes for the attempts.",
+        )
+        parser.add_argument(
+            "--optimize",
+            type=float,
+            default=0,
+            metavar="SECONDS",
+            help="Improve each attempt by local search (gaps, subject spread, teacher load) for this long.",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Keep the current timetable and only re-solve around changed master data.",
+        )
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only run the feasibility pre-check (teacher-hours, rooms, daily limits) "
+                 "and report the bottlenecks; nothing is solved or saved.",
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Stop before the search if the pre-check finds that not every lesson can be placed.",
+        )
+        parser.add_argument(
+            "--no-pdfs",
+            action="store_true",
+            help="Don't pre-render the class PDFs in the background afterwards.",
+        )
+        parser.add_argument(
+            "--job",
+            type=int,
+            default=None,
+            help="Run this queued GenerationJob (used by manage.py generation_worker).",
+        )
+        parser.add_argument(
+            "--profile",
+            nargs="?",
+            const="-",
+            default=None,
+            metavar="FILE",
+            help="Write a JSON report (phase times, queries, search counters, per-class "
+                 "solve time) to FILE, or to stdout if no FILE is given.",
+        )
+        parser.add_argument(
+            "--cprofile",
+            default=None,
+            metavar="FILE",
+            help="Run under cProfile and save the stats to FILE (main process only, "
+                 "so use --jobs 1); the top functions also go into the --profile report.",
+        )
+
     def handle(self, *args, **options):
+        self.report_out = self.stdout
+        if options["profile"] == "-":
+            # stdout is for the JSON report; progress messages go to stderr
+            self.stdout = self.stderr
+        run_options = {key: options[key] for key in RUN_OPTIONS}
+
+        if options["check"]:
+            # Sirf pre-check: koi lock / job nahi, DB me kuch nahi likhta
+            return self.check_only()
+
+        # Ek waqt me ek hi generation - web job ho ya CLI (see jobs.py)
+        try:
+            if options["job"]:
+                job_id = options["job"]
+                if not jobs.claim(job_id):
+                    raise CommandError(f"Generation #{job_id} is not queued any more.")
+            else:
+                job_id = jobs.start_direct(run_options).pk
+        except jobs.GenerationLocked as exc:
+            raise CommandError(f"{exc} Try again once it has finished.")
+
+        with jobs.JobReporter(job_id) as reporter:
+            try:
+                status, message, fields = self.generate(options, run_options, reporter, job_id)
+            except jobs.Cancelled:
+                reporter.finish(GenerationJob.CANCELLED, "Cancelled, the timetable was not changed.")
+                self.stdout.write(self.style.WARNING(
+                    f"Generation #{job_id} cancelled, the timetable was not changed."
+                ))
+                return
+            except BaseException as exc:
+                reporter.finish(GenerationJob.FAILED, f"{type(exc).__name__}: {exc}")
+                raise
+            reporter.finish(status, message, **fields)
+
+    def generate(self, options, run_options, reporter, job_id):
+        """The run itself; returns (job status, message, final job fields)."""
+        profile = RunProfile(cprofile=bool(options["cprofile"]))
         self.stdout.write("Starting timetable generation...")
-        classes = list(SchoolClass.objects.all())
-        periods = list(Period.objects.all().order_by('day','order'))
-        rooms = list(Room.objects.all())
-        if not classes or not periods or not rooms:
-            self.stdout.write(self.style.ERROR("Please create classes, periods, teachers, subjects and rooms first."))
-            return
 
-        # Simple data structure: for each class we need a subject-to-remaining-count dict
-        # For demonstration we assign each subject its default_periods_per_week
-        class_subjects = {}
-        for c in classes:
-            # In practice you might have subject assignments per class, here pick all subjects
-            sub_list = {}
-            for s in Subject.objects.all():
-                sub_list[s.id] = s.default_periods_per_week
-            class_subjects[c.id] = sub_list
-
-        # Clear existing timetable
-        TimetableEntry.objects.all().delete()
-        failed = []
-
-        # For each class, try to fill every period
-        for c in classes:
-            success = self.fill_for_class(c, periods, class_subjects[c.id], rooms)
-            if not success:
-                failed.append(c.name)
+        with profile.phase("load"):
+            # Changes saved while we solve stay pending for the next run
+            last_change = last_change_id()
+
+            # Whole school in a fixed handful of queries, then no DB until the write
+            problem = load_problem()
+            if not problem.n_classes or not problem.n_periods or not problem.n_rooms:
+                message = "Please create classes, periods, teachers, subjects and rooms first."
+                self.stdout.write(self.style.ERROR(message))
+                return GenerationJob.FAILED, message, {}
+
+            existing = None
+            if options["incremental"]:
+                existing = load_entries(problem)
+                changes = load_changes(problem, up_to=last_change)
+                free = cells_to_free(problem, existing, changes)
+                problem = with_fixed(problem, existing, free)
+                self.stdout.write(
+                    f"Incremental: keeping {len(problem.fixed)} of {len(existing)} lessons, "
+                    f"re-solving the rest and any free periods."
+                )
+
+        reporter.phase("checking")
+        with profile.phase("check"):
+            notes = self.feasibility_notes(problem)
+        profile.feasibility = notes
+        for note in notes:
+            self.stdout.write(self.style.WARNING(f"Pre-check: {note}"))
+        if notes and options["strict"]:
+            message = f"Stopped before the search, not every lesson can be placed: {' '.join(notes)}"
+            self.stdout.write(self.style.ERROR("Stopped (--strict); the timetable was not changed."))
+            return GenerationJob.FAILED, message, {}
+
+        def on_result(solution):
+            if options["restarts"] > 1:
+                self.report_attempt(solution)
+            reporter.attempt_done(solution)
+
+        reporter.phase("solving")
+        with profile.phase("solve"):
+            solution, attempts = solve_many(
+                problem,
+                restarts=max(options["restarts"], 1),
+                jobs=options["jobs"],
+                seed=options["seed"],
+                time_limit=options["time_limit"],
+                max_nodes=options["max_nodes"],
+                optimize_time=options["optimize"],
+                on_result=on_result,
+                progress=reporter.search_progress,
+            )
+
+        changed = diff_counts(existing, solution) if existing is not None else None
+        changes = None
+        if changed == (0, 0):
+            # Incremental run ne kuch nahi badla - naya version banane ki zarurat nahi
+            clear_changes(up_to=last_change)
+            self.stdout.write("Nothing changed, the current timetable stays active.")
+        else:
+            changes = self.write_version(
+                problem, solution, reporter, profile, job_id, last_change, incremental=existing is not None
+            )
+            if changed is not None:
+                self.stdout.write(f"Changed {changed[0]} old and {changed[1]} new lessons.")
+
+        message = (
+            f"Placed {len(solution.entries)} periods "
+            f"({solution.status}, {solution.nodes} nodes, "
+            f"{solution.backjumps} backjumps, {solution.elapsed:.2f}s)."
+        )
+        self.stdout.write(message)
+        if len(attempts) > 1:
+            self.stdout.write(
+                f"Best of {len(attempts)} attempts: seed {solution.seed}, "
+                f"{solution.quality[0]} unplaced, soft penalty {solution.quality[1]}."
+            )
+        if solution.optimized:
+            before, after, moves = solution.optimized
+            self.stdout.write(
+                f"Local search: soft penalty {before} -> {after} ({moves} moves accepted)."
+            )
 
+        failed = [problem.class_names[c] for c in sorted(solution.unplaced)]
         if failed:
-            self.stdout.write(self.style.WARNING("Could not fully schedule: " + ", ".join(failed)))
+            warning = "Could not fully schedule: " + ", ".join(failed)
+            self.stdout.write(self.style.WARNING(warning))
+            message += " " + warning
         else:
             self.stdout.write(self.style.SUCCESS("Timetable generation completed."))
+        if changes:
+            message += f" Changes: {changes}."
+        if notes:
+            more = f" (+{len(notes) - 1} more)" if len(notes) > 1 else ""
+            message += f" Pre-check: {notes[0]}{more}"
+
+        if not options["no_pdfs"]:
+            self.start_pdf_prerender()
+
+        if options["profile"] or options["cprofile"]:
+            self.write_profile(profile, problem, solution, attempts, options, run_options)
 
-    def find_teacher_for_subject(self, subject_id):
-        ts = TeacherSubject.objects.filter(subject_id=subject_id).select_related('teacher')
-        if not ts.exists():
-            return None
-        return random.choice(list(ts)).teacher
-
-    def is_teacher_available(self, teacher, period):
-        # check Constraint
-        if Constraint.objects.filter(teacher=teacher, period=period, blocked=True).exists():
-            return False
-        # check current assignments for teacher at this period
-        return not TimetableEntry.objects.filter(teacher=teacher, period=period).exists()
-
-    @transaction.atomic
-    def fill_for_class(self, school_class, periods, subject_remaining, rooms):
+        wanted = sum(problem.required_for_class(c) for c in range(problem.n_classes))
+        return GenerationJob.DONE, message, {
+            "placed": len(solution.entries),
+            "total": wanted,
+            "best_unplaced": solution.total_unplaced,
+            "best_penalty": solution.quality[1],
+        }
+
+    def write_version(self, problem, solution, reporter, profile, job_id, last_change, incremental=False):
         """
-        Greedy fill: iterate periods. For each, pick a subject that still needs periods,
-        find an available teacher for that subject, and a room with sufficient capacity.
-        If stuck: attempt simple backtracking (retry last N assignments). This is simplified.
+        Naya timetable ek draft version me likho - pages purana (active)
+        version hi dekhte rahte hain, aur har batch ek chhota write hai.
+        Incremental run me na badle lessons DB ke andar hi copy hote hain.
+        Phir ek transaction me activate; fail / cancel pe draft hata do.
+        Returns the changes against the replaced version, as text (or None).
         """
-        assignments = []  # (period, subject_id, teacher, room)
-        for period in periods:
-            # pick candidates sorted by how many left (largest first to avoid starvation)
-            candidates = [ (sid, cnt) for sid,cnt in subject_remaining.items() if cnt>0 ]
-            if not candidates:
-                # no remaining subject -> put free or elective placeholder (skip)
-                continue
-            candidates.sort(key=lambda x: -x[1])
-            placed = False
-            # try candidates
-            for sid, _ in candidates:
-                teacher = self.find_teacher_for_subject(sid)
-                if not teacher:
-                    continue
-                if not self.is_teacher_available(teacher, period):
-                    continue
-                # find room
-                room = None
-                for r in rooms:
-                    if r.capacity >= school_class.strength and not TimetableEntry.objects.filter(room=r, period=period).exists():
-                        room = r
-                        break
-                if not room:
-                    continue
-                # create entry
-                subject = Subject.objects.get(pk=sid)
-                TimetableEntry.objects.create(
-                    school_class=school_class,
-                    period=period,
-                    subject=subject,
-                    teacher=teacher,
-                    room=room
+        reporter.phase("writing")
+        with profile.phase("write"):
+            previous = versions.active_id()
+            draft = versions.create_draft(job_id=job_id, note=f"Generation #{job_id}")
+            try:
+                versions.write_draft(
+                    draft,
+                    build_entries(problem, solution.entries, draft.pk),
+                    on_batch=lambda done, total: reporter.update(),
+                    base=previous if incremental else None,
                 )
-                subject_remaining[sid] -= 1
-                assignments.append((period, sid, teacher.id, room.id))
-                placed = True
-                break
-            if not placed:
-                # Try simple backtracking: remove previous assignment and try alternative
-                if assignments:
-                    last_period, last_sid, last_teacher_id, last_room_id = assignments.pop()
-                    # revert last assignment
-                    TimetableEntry.objects.filter(school_class=school_class, period=last_period).delete()
-                    subject_remaining[last_sid] += 1
-                    # push current period to end and reattempt — naive but may help
-                    periods.append(period)
-                    continue
-                else:
-                    # cannot place at all and nothing to backtrack
-                    return False
-        return True
+                # Last chance to cancel: after this the new timetable is live
+                reporter.phase("activating")
+                versions.activate(draft.pk, before_switch=lambda: clear_changes(up_to=last_change))
+            except BaseException:
+                versions.discard(draft)
+                raise
+        self.stdout.write(f"Timetable version #{draft.pk} is now active.")
+
+        with profile.phase("snapshot"):
+            snapshot = snapshots.from_rows(
+                draft.pk, entry_ids(problem, solution.entries), school_stamp().key
+            )
+            try:
+                snapshots.save(snapshot)
+            except OSError as exc:
+                self.stdout.write(self.style.WARNING(f"Snapshot not saved: {exc}"))
+
+        changes = None
+        if previous is not None:
+            # Kya badla - teachers ko batane ke liye (details: manage.py diff_timetables)
+            with profile.phase("diff"):
+                old = snapshots.load(previous)
+                if old is not None:
+                    changes = diffs.diff(old, snapshot).summary()
+            if changes:
+                self.stdout.write(f"Changes since version #{previous}: {changes}.")
+
+        pruned = versions.prune()
+        if pruned:
+            self.stdout.write(f"Pruned {pruned} old timetable versions.")
+        return changes
+
+    def feasibility_notes(self, problem):
+        """Pre-check bottlenecks as text, worst first (names only loaded if needed)."""
+        bottlenecks = check_feasibility(problem)
+        if not bottlenecks:
+            return []
+        names = load_names(problem)
+        return [describe(b, names, problem) for b in bottlenecks]
+
+    def check_only(self):
+        started = time.perf_counter()
+        problem = load_problem()
+        if not problem.n_classes or not problem.n_periods or not problem.n_rooms:
+            raise CommandError("Please create classes, periods, teachers, subjects and rooms first.")
+        notes = self.feasibility_notes(problem)
+        elapsed = time.perf_counter() - started
+        for note in notes:
+            self.stdout.write(self.style.WARNING(note))
+        if notes:
+            raise CommandError(f"{len(notes)} bottleneck(s) found in {elapsed * 1000:.0f} ms.")
+        self.stdout.write(self.style.SUCCESS(
+            f"No bottleneck found in {elapsed * 1000:.0f} ms "
+            f"(necessary checks only - the search can still fall short)."
+        ))
+
+    def write_profile(self, profile, problem, solution, attempts, options, run_options):
+        if options["cprofile"]:
+            profile.dump_cprofile(options["cprofile"])
+            self.stdout.write(f"cProfile stats written to {options['cprofile']}.")
+        if not options["profile"]:
+            return
+
+        report = json.dumps(profile.report(problem, solution, attempts, run_options), indent=2)
+        if options["profile"] == "-":
+            self.report_out.write(report)
+        else:
+            Path(options["profile"]).write_text(report)
+            self.stdout.write(f"Profile written to {options['profile']}.")
+
+    def report_attempt(self, solution):
+        unplaced, soft = solution.quality
+        self.stdout.write(
+            f"  seed {solution.seed}: {solution.status}, "
+            f"{unplaced} unplaced, soft penalty {soft}, {solution.elapsed:.2f}s"
+        )
+
+    def start_pdf_prerender(self):
+        """
+        Naye timetable ke class PDFs background process me render karo,
+        taaki pehla download bhi cache se mile. Detached: this command
+        returns right away and the renderer outlives it.
+        """
+        try:
+            pdf.check_available()
+        except pdf.PDFUnavailable as exc:
+            self.stdout.write(f"Skipping PDF pre-render: {exc}")
+            return
+        subprocess.Popen(
+            [sys.executable, str(settings.BASE_DIR / "manage.py"), "render_pdfs"],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+        self.stdout.write("Pre-rendering class PDFs in the background (manage.py render_pdfs).")
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from scheduler import jobs
+from scheduler.models import GenerationJob
+
+
+class Command(BaseCommand):
+    help = 'Run queued timetable generation jobs (keep one running next to the web server)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--poll",
+            type=float,
+            default=2.0,
+            help="Seconds between checks of the queue (default 2).",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Run what is queued now, then exit.",
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Waiting for generation jobs...")
+        while True:
+            # Long-lived process: drop connections the DB may have closed
+            close_old_connections()
+            jobs.reap_stale()
+            job = GenerationJob.objects.filter(
+                status=GenerationJob.QUEUED, cancel_requested=False
+            ).order_by("id").first()
+
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+                continue
+
+            self.stdout.write(f"Generation #{job.pk}: {job.options}")
+            try:
+                call_command(
+                    "generate_timetable",
+                    job=job.pk,
+                    stdout=self.stdout,
+                    stderr=self.stderr,
+                    **job.options,
+                )
+            except CommandError as exc:
+                # e.g. a CLI run holds the lock: the job stays queued
+                self.stderr.write(f"Generation #{job.pk}: {exc}")
+                if options["once"]:
+                    return
+                time.sleep(options["poll"])
+            except Exception as exc:
+                # generate_timetable already marked the job failed
+                self.stderr.write(f"Generation #{job.pk} failed: {exc!r}")
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler.importer import ImportFailed, SchoolImport, describe, read_paths
+
+
+class Command(BaseCommand):
+    help = 'Import teachers, subjects, rooms, classes, periods, mappings and constraints from CSV / JSON files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="<kind>.csv / .json / .zip files, or directories containing them.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only validate, write nothing.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            rows = read_paths(options["paths"])
+            summary = SchoolImport(rows).run(dry_run=options["dry_run"])
+        except OSError as exc:
+            raise CommandError(str(exc))
+        except ImportFailed as exc:
+            for error in exc.errors:
+                self.stderr.write(f"  {error}")
+            raise CommandError(f"{exc} - nothing was imported.")
+
+        if options["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"Valid: {describe(summary)}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Imported: {describe(summary)}."))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler import pdf
+from scheduler.pdf_cache import prerender
+
+
+class Command(BaseCommand):
+    help = 'Render class timetable PDFs that are not in the PDF cache yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--jobs",
+            type=int,
+            default=pdf.DEFAULT_JOBS,
+            help="Worker processes rendering PDFs.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            pdf.check_available()
+        except pdf.PDFUnavailable as exc:
+            raise CommandError(str(exc))
+
+        rendered = prerender(jobs=options["jobs"])
+        self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} class PDFs."))
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler import snapshots
+from scheduler.models import TimetableVersion
+
+
+class Command(BaseCommand):
+    help = 'Build or verify the array (.npy) snapshots of timetable versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument("action", choices=["build", "verify"])
+        parser.add_argument(
+            "versions",
+            nargs="*",
+            type=int,
+            metavar="VERSION",
+            help="Version ids. Default: build the active version, verify every version.",
+        )
+
+    def handle(self, *args, **options):
+        versions = options["versions"]
+        if options["action"] == "build":
+            if not versions:
+                versions = list(
+                    TimetableVersion.objects.filter(status=TimetableVersion.ACTIVE)
+                    .values_list("pk", flat=True)
+                )
+            for version_id in versions:
+                if not TimetableVersion.objects.filter(pk=version_id).exists():
+                    raise CommandError(f"Timetable version #{version_id} does not exist.")
+                started = time.perf_counter()
+                snapshot = snapshots.build(version_id)
+                path = snapshots.save(snapshot)
+                self.stdout.write(self.style.SUCCESS(
+                    f"Version #{version_id}: {snapshot.lessons} lessons -> {path} "
+                    f"({(time.perf_counter() - started) * 1000:.0f} ms)"
+                ))
+            return
+
+        if not versions:
+            versions = list(TimetableVersion.objects.order_by("pk").values_list("pk", flat=True))
+        failed = 0
+        for version_id in versions:
+            snapshot = snapshots.load(version_id)
+            if snapshot is None:
+                self.stdout.write(f"Version #{version_id}: no snapshot.")
+                continue
+            problems = snapshots.verify(snapshot)
+            if problems:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"Version #{version_id}: {' '.join(problems)}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Version #{version_id}: {snapshot.lessons} lessons, matches the DB."
+                ))
+        if failed:
+            raise CommandError(f"{failed} snapshot(s) differ from the DB; rebuild them with "
+                               f"'timetable_snapshot build <id>'.")
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from scheduler import versions
+from scheduler.models import TimetableVersion
+
+
+class Command(BaseCommand):
+    help = 'List timetable versions, roll back to an older one, or prune old ones'
+
+    def add_arguments(self, parser):
+        sub = parser.add_subparsers(dest="action")
+        sub.add_parser("list", help="Show the versions, newest first (default).")
+        activate = sub.add_parser("activate", help="Make an archived version the live timetable again.")
+        activate.add_argument("version", type=int)
+        prune = sub.add_parser("prune", help="Delete old archived versions and abandoned drafts.")
+        prune.add_argument(
+            "--keep",
+            type=int,
+            default=None,
+            help="Archived versions to keep (default: settings.TIMETABLE_VERSIONS_KEEP).",
+        )
+
+    def handle(self, *args, **options):
+        action = options["action"] or "list"
+        if action == "activate":
+            try:
+                version = versions.restore(options["version"])
+            except versions.VersionError as exc:
+                raise CommandError(str(exc))
+            lessons = TimetableVersion.objects.with_lessons().get(pk=version.pk).lessons
+            self.stdout.write(self.style.SUCCESS(
+                f"Timetable version #{version.pk} ({lessons} lessons) is now active."
+            ))
+        elif action == "prune":
+            deleted = versions.prune(keep=options["keep"])
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} versions."))
+        else:
+            for version in TimetableVersion.objects.with_lessons():
+                activated = f"{version.activated_at:%Y-%m-%d %H:%M}" if version.activated_at else "-"
+                self.stdout.write(
+                    f"#{version.pk:<5} {version.status:<9} {version.lessons:>6} lessons  "
+                    f"created {version.created_at:%Y-%m-%d %H:%M}  activated {activated}  {version.note}"
+                )
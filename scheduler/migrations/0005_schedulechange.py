@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0004_alter_room_options_alter_schoolclass_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('teacher_pk', models.BigIntegerField(blank=True, null=True)),
+                ('room_pk', models.BigIntegerField(blank=True, null=True)),
+                ('period_pk', models.BigIntegerField(blank=True, null=True)),
+                ('source', models.CharField(max_length=50)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:29
+
+import csv
+from pathlib import Path
+
+from django.conf import settings
+from django.db import migrations, models
+from django.utils import timezone
+
+BACKUP_COLUMNS = [
+    'id', 'school_class', 'day', 'period', 'subject', 'teacher', 'room',
+    'school_class_id', 'period_id', 'subject_id', 'teacher_id', 'room_id',
+    'created_at', 'clashed_with',
+]
+
+
+def drop_double_bookings(apps, schema_editor):
+    """
+    Old generator ne kuch double bookings likh di thi; constraint add
+    karne se pehle har (teacher, period) / (room, period) ki sabse
+    purani entry rakho, baaki hata do. Delete se pehle har hatayi gayi
+    row (ids aur naam) ek CSV me likhi jaati hai (README: Upgrade notes);
+    file na likh paaye to migration fail, kuch delete nahi hota.
+    """
+    TimetableEntry = apps.get_model('scheduler', 'TimetableEntry')
+    by_teacher, by_room, clashes = {}, {}, []
+    rows = TimetableEntry.objects.order_by('id').values_list(
+        'id', 'school_class__name', 'period__day', 'period__order',
+        'subject__name', 'teacher__code', 'room__name',
+        'school_class_id', 'period_id', 'subject_id', 'teacher_id', 'room_id', 'created_at',
+    )
+    for row in rows:
+        pk, period_id, teacher_id, room_id = row[0], row[8], row[10], row[11]
+        kept = by_teacher.get((teacher_id, period_id)) or by_room.get((room_id, period_id))
+        if kept is not None:
+            clashes.append((row, kept))
+            continue
+        by_teacher[(teacher_id, period_id)] = pk
+        by_room[(room_id, period_id)] = pk
+    if not clashes:
+        return
+
+    backup = Path(getattr(settings, 'BASE_DIR', '.')) / (
+        f"removed_double_bookings_{timezone.now():%Y%m%d-%H%M%S}.csv"
+    )
+    with open(backup, 'x', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(BACKUP_COLUMNS)
+        for row, kept in clashes:
+            writer.writerow([*row, kept])
+
+    print(
+        f"\n  Removing {len(clashes)} double-booked timetable entries "
+        f"(the oldest entry of each teacher/room + period is kept), saved to {backup}:"
+    )
+    for (pk, class_name, day, order, subject, teacher, room, *_), kept in clashes:
+        print(
+            f"    #{pk}: class {class_name}, day {day} period {order}, {subject}, "
+            f"teacher {teacher}, room {room} (clashed with #{kept})"
+        )
+    TimetableEntry.objects.filter(pk__in=[row[0] for row, _ in clashes]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0005_schedulechange'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_double_bookings, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='constraint',
+            index=models.Index(fields=['period', 'blocked', 'teacher'], name='constraint_period_lookup_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetableentry',
+            constraint=models.UniqueConstraint(fields=('teacher', 'period'), name='entry_teacher_period_uniq', violation_error_message='This teacher is already assigned to another class in this period.'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetableentry',
+            constraint=models.UniqueConstraint(fields=('room', 'period'), name='entry_room_period_uniq', violation_error_message='This room is already assigned to another class in this period.'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0006_entry_clash_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableStamp',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('class', 'Class'), ('teacher', 'Teacher'), ('all', 'All timetables')], max_length=10)),
+                ('object_pk', models.BigIntegerField(default=0)),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('scope', 'object_pk'), name='timetable_stamp_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 02:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0007_timetablestamp'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timetablestamp',
+            name='scope',
+            field=models.CharField(choices=[('class', 'Class'), ('teacher', 'Teacher'), ('room', 'Room'), ('all', 'All timetables')], max_length=10),
+        ),
+    ]
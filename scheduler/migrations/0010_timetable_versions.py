@@ -0,0 +1,98 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:13
+
+import django.db.models.deletion
+import scheduler.models
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def adopt_current_timetable(apps, schema_editor):
+    """
+    Jo timetable abhi hai wo version 1 (active) ban jaata hai; har
+    existing entry usi version me.
+    """
+    TimetableVersion = apps.get_model('scheduler', 'TimetableVersion')
+    TimetableEntry = apps.get_model('scheduler', 'TimetableEntry')
+    count = TimetableEntry.objects.count()
+    if not count:
+        return
+    version = TimetableVersion.objects.create(
+        status='active', note='Initial timetable', lessons=count, activated_at=timezone.now()
+    )
+    TimetableEntry.objects.update(version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0009_generationjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimetableVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('draft', 'Draft'), ('active', 'Active'), ('archived', 'Archived')], default='draft', max_length=10)),
+                ('note', models.CharField(blank=True, max_length=200)),
+                ('lessons', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('activated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-id'],
+            },
+        ),
+        migrations.RemoveConstraint(
+            model_name='timetableentry',
+            name='entry_teacher_period_uniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='timetableentry',
+            name='entry_room_period_uniq',
+        ),
+        migrations.AddField(
+            model_name='timetableversion',
+            name='job',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='versions', to='scheduler.generationjob'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timetableentry',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='timetableentry',
+            name='version',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='scheduler.timetableversion'),
+        ),
+        migrations.RunPython(adopt_current_timetable, migrations.RunPython.noop),
+        # NOT NULL with a plain placeholder (every row has a version by now),
+        # so the callable default is not run against the real model here
+        migrations.AlterField(
+            model_name='timetableentry',
+            name='version',
+            field=models.ForeignKey(default=0, on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='scheduler.timetableversion'),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='timetableentry',
+            name='version',
+            field=models.ForeignKey(default=scheduler.models.active_version_id, on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='scheduler.timetableversion'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='timetableentry',
+            unique_together={('version', 'school_class', 'period')},
+        ),
+        migrations.AddConstraint(
+            model_name='timetableentry',
+            constraint=models.UniqueConstraint(fields=('version', 'teacher', 'period'), name='entry_teacher_period_uniq', violation_error_message='This teacher is already assigned to another class in this period.'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetableentry',
+            constraint=models.UniqueConstraint(fields=('version', 'room', 'period'), name='entry_room_period_uniq', violation_error_message='This room is already assigned to another class in this period.'),
+        ),
+        migrations.AddConstraint(
+            model_name='timetableversion',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'active')), fields=('status',), name='one_active_timetable_version'),
+        ),
+    ]
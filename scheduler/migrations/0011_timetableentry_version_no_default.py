@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0010_timetable_versions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='timetableentry',
+            name='version',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='scheduler.timetableversion'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:48
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0011_timetableentry_version_no_default'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='generationjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('status',), name='one_queued_generation'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:49
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('scheduler', '0012_one_queued_generation'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='timetableversion',
+            name='lessons',
+        ),
+    ]
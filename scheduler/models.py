@@ -141,11 +141,105 @@ class Constraint(models.Model):
     blocked = models.BooleanField(default=True)
     note = models.CharField(max_length=200, blank=True)
 
+    class Meta:
+        indexes = [
+            # "is this period blocked (for this teacher)?" lookups
+            models.Index(fields=["period", "blocked", "teacher"], name="constraint_period_lookup_idx"),
+        ]
+
     def __str__(self):
         return f"Constraint {self.teacher or 'ANY'} {self.period}"
 
 
+class TimetableVersionQuerySet(models.QuerySet):
+
+    def with_lessons(self):
+        """
+        ``lessons`` per version, counted from its entries - stays right
+        whatever adds or deletes lessons (generation, admin, week editor).
+        """
+        return self.annotate(lessons=models.Count("entries"))
+
+
+class TimetableVersion(models.Model):
+    """
+    One complete timetable. Every TimetableEntry belongs to a version and
+    pages only ever read the ACTIVE one (``TimetableEntry.objects``).
+
+    generate_timetable writes into a new DRAFT, which nobody sees, and
+    then ``versions.activate`` switches the status in one short
+    transaction - readers get the old timetable or the new one, never a
+    half-written mix. The previous version stays ARCHIVED for rollback
+    until the retention limit prunes it (see versions.py).
+
+    At most one ACTIVE row (partial UniqueConstraint, like GenerationJob).
+    """
+    DRAFT = "draft"
+    ACTIVE = "active"
+    ARCHIVED = "archived"
+    STATUS_CHOICES = [
+        (DRAFT, "Draft"),
+        (ACTIVE, "Active"),
+        (ARCHIVED, "Archived"),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=DRAFT)
+    job = models.ForeignKey(
+        "GenerationJob",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="versions",
+    )
+    note = models.CharField(max_length=200, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    activated_at = models.DateTimeField(null=True, blank=True)
+
+    objects = TimetableVersionQuerySet.as_manager()
+
+    class Meta:
+        ordering = ["-id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["status"],
+                condition=models.Q(status="active"),
+                name="one_active_timetable_version",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Timetable v{self.pk} ({self.status})"
+
+
+def active_version():
+    """
+    The ACTIVE version, created on first use (empty school). Not a field
+    default - it may write - so code that adds lessons by hand (admin,
+    week editor) calls it once and sets ``version`` on its rows.
+    """
+    version, _ = TimetableVersion.objects.get_or_create(
+        status=TimetableVersion.ACTIVE, defaults={"note": "Initial timetable"}
+    )
+    return version
+
+
+def active_version_id():
+    return active_version().pk
+
+
+class ActiveEntryManager(models.Manager):
+    """Only the lessons of the ACTIVE timetable version."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(version__status=TimetableVersion.ACTIVE)
+
+
 class TimetableEntry(models.Model):
+    version = models.ForeignKey(
+        TimetableVersion,
+        on_delete=models.CASCADE,
+        related_name="entries",
+    )
     school_class = models.ForeignKey(SchoolClass, on_delete=models.CASCADE)
     period = models.ForeignKey(Period, on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
@@ -153,9 +247,29 @@ class TimetableEntry(models.Model):
     room = models.ForeignKey(Room, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Pehla manager default hai: pages, admin, related sets - sab sirf active
+    # version dekhte hain. Drafts / archived rows ke liye ``all_versions``.
+    objects = ActiveEntryManager()
+    all_versions = models.Manager()
+
     class Meta:
-        unique_together = ('school_class', 'period')
+        unique_together = ('version', 'school_class', 'period')
         ordering = ["school_class__name", "period__day", "period__order"]
+        constraints = [
+            # Double booking DB level pe hi reject (har version ke andar); ye
+            # unique indexes (version, teacher, period) / (version, room, period)
+            # lookups ke liye bhi kaam aate hain.
+            models.UniqueConstraint(
+                fields=["version", "teacher", "period"],
+                name="entry_teacher_period_uniq",
+                violation_error_message="This teacher is already assigned to another class in this period.",
+            ),
+            models.UniqueConstraint(
+                fields=["version", "room", "period"],
+                name="entry_room_period_uniq",
+                violation_error_message="This room is already assigned to another class in this period.",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.school_class} | {self.period} | {self.subject}"
@@ -169,74 +283,168 @@ class TimetableEntry(models.Model):
         3) Same room ek hi period me 2 alag class ko nahi mil sakta.
         4) Constraint table respect karega (global & teacher-specific).
         5) Teacher ka max_periods_per_day cross na ho ek din me.
+
+        Rules scheduler.validation.validate_entries me hain. Admin inline
+        formsets poore batch ko ek saath (clashes samet) validate karte hain
+        aur ``_validated_in_batch`` set karte hain, taaki yahan - aur unique
+        / constraint checks me - dobara na ho. Akeli row ke liye 2) aur 3)
+        Meta.constraints (UniqueConstraint) validate_constraints() me check
+        hote hain, isliye yahan skip.
         """
         super().clean()
-        errors = {}
-
-        # 1) TeacherSubject mapping check
-        if self.teacher_id and self.subject_id:
-            from .models import TeacherSubject  # local import not needed actually but safe
-            if not TeacherSubject.objects.filter(
-                teacher=self.teacher,
-                subject=self.subject
-            ).exists():
-                errors.setdefault("teacher", []).append(
-                    f"{self.teacher} is not assigned to teach {self.subject}."
-                )
-
-        # 2) Teacher double booking (same day+period across classes)
-        if self.teacher_id and self.period_id:
-            clash_qs = TimetableEntry.objects.filter(
-                teacher=self.teacher,
-                period=self.period,
-            ).exclude(pk=self.pk)
-            if clash_qs.exists():
-                errors.setdefault("teacher", []).append(
-                    "This teacher is already assigned to another class in this period."
-                )
-
-        # 3) Room double booking
-        if self.room_id and self.period_id:
-            room_qs = TimetableEntry.objects.filter(
-                room=self.room,
-                period=self.period,
-            ).exclude(pk=self.pk)
-            if room_qs.exists():
-                errors.setdefault("room", []).append(
-                    "This room is already assigned to another class in this period."
-                )
-
-        # 4) Constraints (global or teacher-specific block)
-        if self.period_id:
-            constraint_qs = Constraint.objects.filter(
-                period=self.period,
-                blocked=True,
-            )
-            from django.db.models import Q
-            if self.teacher_id:
-                constraint_qs = constraint_qs.filter(
-                    Q(teacher__isnull=True) | Q(teacher=self.teacher)
-                )
-            else:
-                constraint_qs = constraint_qs.filter(teacher__isnull=True)
-
-            if constraint_qs.exists():
-                errors.setdefault("period", []).append(
-                    "This period is blocked by a timetable constraint."
-                )
-
-        # 5) Teacher max_periods_per_day limit
-        if self.teacher_id and self.period_id:
-            same_day_count = TimetableEntry.objects.filter(
-                teacher=self.teacher,
-                period__day=self.period.day,
-            ).exclude(pk=self.pk).count()
-
-            if same_day_count + 1 > self.teacher.max_periods_per_day:
-                errors.setdefault("teacher", []).append(
-                    f"This will exceed {self.teacher}'s max periods per day "
-                    f"({self.teacher.max_periods_per_day})."
-                )
+        if getattr(self, "_validated_in_batch", False):
+            return
 
+        from .validation import validate_entries
+        errors = validate_entries([self], check_clashes=False)[0]
         if errors:
             raise ValidationError(errors)
+
+    # ``_validated_in_batch``: validate_entries(check_clashes=True) is row ke
+    # batch ke saath chalega - per-row DB lookups yahan dobara nahi chahiye.
+    def clean_fields(self, exclude=None):
+        if getattr(self, "_validated_in_batch", False):
+            # FK rows form ke ModelChoiceFields pehle hi la chuke - exists() queries skip
+            exclude = {*(exclude or ()), *(f.name for f in self._meta.concrete_fields if f.is_relation)}
+        super().clean_fields(exclude=exclude)
+
+    def validate_unique(self, exclude=None):
+        # (version, school_class, period) unique_together
+        if not getattr(self, "_validated_in_batch", False):
+            super().validate_unique(exclude=exclude)
+
+    def validate_constraints(self, exclude=None):
+        # (version, teacher, period) / (version, room, period)
+        if not getattr(self, "_validated_in_batch", False):
+            super().validate_constraints(exclude=exclude)
+
+
+class ScheduleChange(models.Model):
+    """
+    Master data edited since the last generation (filled by signals).
+    generate_timetable --incremental re-solves only around these:
+
+    - teacher + period -> that teacher in that period (teacher Constraint)
+    - teacher only     -> every lesson of that teacher
+    - room only        -> every lesson in that room
+    - period only      -> every class in that period
+
+    Plain ids, not FKs, so a change survives deleting the object.
+    """
+    teacher_pk = models.BigIntegerField(null=True, blank=True)
+    room_pk = models.BigIntegerField(null=True, blank=True)
+    period_pk = models.BigIntegerField(null=True, blank=True)
+    source = models.CharField(max_length=50)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+
+    def __str__(self):
+        return f"{self.source} changed at {self.created_at:%Y-%m-%d %H:%M}"
+
+
+class TimetableStamp(models.Model):
+    """
+    Rendered-timetable version for one class / teacher / room, bumped by signals
+    (see stamps.py). scope ALL is a single row that invalidates every page.
+    """
+    CLASS = "class"
+    TEACHER = "teacher"
+    ROOM = "room"
+    ALL = "all"
+    SCOPE_CHOICES = [
+        (CLASS, "Class"),
+        (TEACHER, "Teacher"),
+        (ROOM, "Room"),
+        (ALL, "All timetables"),
+    ]
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    object_pk = models.BigIntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["scope", "object_pk"], name="timetable_stamp_uniq"),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.object_pk} v{self.version}"
+
+
+class GenerationJob(models.Model):
+    """
+    One generate_timetable run. Web requests only queue it; the worker
+    (manage.py generation_worker) runs it and writes progress here, so a
+    long solve never blocks a request. CLI runs get a row too.
+
+    Lock: at most one row can be RUNNING and one QUEUED (partial
+    UniqueConstraints), so two generations never write the timetable at
+    the same time. See jobs.py.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+        (CANCELLED, "Cancelled"),
+    ]
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # generate_timetable options: seed, time_limit, restarts, optimize, incremental, ...
+    options = models.JSONField(default=dict, blank=True)
+    requested_by = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="generation_jobs",
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # updated with the progress; a RUNNING job without one for long is dead
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+
+    # Progress: loading / checking / solving / writing / activating
+    phase = models.CharField(max_length=20, blank=True)
+    placed = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    best_unplaced = models.PositiveIntegerField(null=True, blank=True)
+    best_penalty = models.IntegerField(null=True, blank=True)
+    attempts_done = models.PositiveIntegerField(default=0)
+
+    cancel_requested = models.BooleanField(default=False)
+    message = models.TextField(blank=True)
+
+    class Meta:
+        ordering = ["-id"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["status"],
+                condition=models.Q(status="running"),
+                name="one_running_generation",
+            ),
+            models.UniqueConstraint(
+                fields=["status"],
+                condition=models.Q(status="queued"),
+                name="one_queued_generation",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Generation #{self.pk} ({self.status})"
+
+    @property
+    def is_active(self):
+        return self.status in (self.QUEUED, self.RUNNING)
+
+    @property
+    def percent(self):
+        return round(100 * self.placed / self.total) if self.total else 0
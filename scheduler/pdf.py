@@ -0,0 +1,74 @@
+"""
+PDF rendering for printable timetables.
+
+WeasyPrint is imported only when a PDF is actually rendered (it needs
+Pango/Cairo system libraries, the web pages do not). Rendering is CPU
+bound, so bulk exports spread it over a process pool; only (name, html)
+strings cross the process boundary and this module never touches the
+ORM, so workers need no Django setup.
+"""
+
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+
+# Bulk export from a web request: don't take every core of the server
+DEFAULT_JOBS = min(4, os.cpu_count() or 1)
+
+
+class PDFUnavailable(Exception):
+    """WeasyPrint (or its system libraries) is not installed."""
+
+
+@lru_cache(maxsize=None)
+def _import_error():
+    # Checked once per process - a failed import is slow (library lookups)
+    try:
+        import weasyprint  # noqa: F401
+    except (ImportError, OSError) as exc:
+        return str(exc)
+    return None
+
+
+def check_available():
+    error = _import_error()
+    if error:
+        raise PDFUnavailable(f"PDF export needs WeasyPrint: {error}")
+
+
+def html_to_pdf(html):
+    from weasyprint import HTML
+    return HTML(string=html).write_pdf()
+
+
+def _render(name, html):
+    return name, html_to_pdf(html)
+
+
+def render_many(documents, jobs=DEFAULT_JOBS):
+    """
+    Yield ``(name, pdf bytes)`` for each ``(name, html)`` of ``documents``
+    in the order they finish. ``documents`` is read lazily and at most
+    ``2 * jobs`` are in flight, so memory does not grow with their number.
+    """
+    if jobs <= 1:
+        for name, html in documents:
+            yield _render(name, html)
+        return
+
+    pool = ProcessPoolExecutor(max_workers=jobs)
+    pending = set()
+    try:
+        for name, html in documents:
+            pending.add(pool.submit(_render, name, html))
+            if len(pending) >= 2 * jobs:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    finally:
+        # Client gone / error: don't render what nobody will read
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,113 @@
+"""
+On-disk cache of class timetable PDFs.
+
+A class PDF is stored under a hash of its timetable stamp and the
+printable template, so a new timetable (or a template change on deploy)
+is simply a miss - nothing has to be deleted when data changes. Hits
+touch the file; once the directory grows past TIMETABLE_PDF_CACHE_MB the
+least recently used files are evicted, which also clears stale versions.
+"""
+
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.template.loader import get_template
+
+from . import pdf
+from .exports import class_html
+from .grids import school_grids
+from .models import SchoolClass
+from .stamps import class_stamps
+
+TEMPLATE = "scheduler/printable_timetable.html"
+
+
+@lru_cache(maxsize=None)
+def _template_hash():
+    # Template sirf deploy pe badalta hai - process me ek baar hash kaafi
+    source = get_template(TEMPLATE).template.source
+    return hashlib.sha256(source.encode()).hexdigest()[:16]
+
+
+def artifact_key(stamp):
+    """Content hash of a class PDF: timetable version + template."""
+    return hashlib.sha256(f"{stamp.key}:{_template_hash()}".encode()).hexdigest()
+
+
+def artifact_path(stamp):
+    key = artifact_key(stamp)
+    return Path(settings.TIMETABLE_PDF_DIR) / key[:2] / f"{key}.pdf"
+
+
+def _store(path, data):
+    # temp file + rename: a reader never sees half a PDF
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as out:
+        out.write(data)
+    os.replace(tmp, path)
+
+
+def class_pdf(school_class, stamp):
+    """Path of the class PDF for ``stamp``; rendered now on a miss."""
+    path = artifact_path(stamp)
+    if path.exists():
+        os.utime(path)  # LRU: recently used
+        return path
+    _store(path, pdf.html_to_pdf(class_html(school_class, school_grids())))
+    evict()
+    return path
+
+
+def prerender(jobs=pdf.DEFAULT_JOBS):
+    """Render every class PDF that is not cached yet; returns how many."""
+    classes = list(SchoolClass.objects.all())
+    stamps = class_stamps([c.pk for c in classes])
+    missing = []
+    for school_class in classes:
+        path = artifact_path(stamps[school_class.pk])
+        if not path.exists():
+            missing.append((path, school_class))
+
+    grids = school_grids()
+    documents = ((str(path), class_html(c, grids)) for path, c in missing)
+    rendered = 0
+    for name, data in pdf.render_many(documents, jobs):
+        _store(Path(name), data)
+        rendered += 1
+    evict()
+    return rendered
+
+
+def evict(limit_bytes=None):
+    """Delete least recently used PDFs until the cache fits its cap."""
+    if limit_bytes is None:
+        limit_bytes = settings.TIMETABLE_PDF_CACHE_MB * 1024 * 1024
+    root = Path(settings.TIMETABLE_PDF_DIR)
+    if not root.is_dir():
+        return 0
+
+    files = []
+    for sub in os.scandir(root):
+        if sub.is_dir():
+            for entry in os.scandir(sub.path):
+                if entry.name.endswith(".pdf"):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in files)
+
+    removed = 0
+    for _, size, path in sorted(files):
+        if total <= limit_bytes:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass  # another process evicted it first
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,136 @@
+"""
+Run report for generate_timetable --profile.
+
+``RunProfile.phase(name)`` times a block and counts / times every query
+it runs through ``connection.execute_wrapper``. ``report()`` turns the
+phases plus the solver's counters (nodes, backjumps, per-class search
+time, see ``solver.search.Solution``) into one JSON-ready dict.
+"""
+
+import cProfile
+import io
+import pstats
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+from django.utils import timezone
+
+# cProfile rows kept in the JSON report (the .prof file has all of them)
+CPROFILE_TOP = 25
+
+
+class RunProfile:
+
+    def __init__(self, cprofile=False):
+        self.started = timezone.now()
+        self.phases = {}
+        self.feasibility = []  # pre-check bottlenecks, as text
+        self._current = None
+        self.profiler = cProfile.Profile() if cprofile else None
+
+    @contextmanager
+    def phase(self, name):
+        stats = self.phases.setdefault(name, {"seconds": 0.0, "queries": 0, "query_seconds": 0.0})
+        self._current = stats
+        started = time.perf_counter()
+        if self.profiler:
+            self.profiler.enable()
+        try:
+            with connection.execute_wrapper(self._count_query):
+                yield stats
+        finally:
+            if self.profiler:
+                self.profiler.disable()
+            stats["seconds"] += time.perf_counter() - started
+            self._current = None
+
+    def _count_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self._current["queries"] += 1
+            self._current["query_seconds"] += time.perf_counter() - started
+
+    def report(self, problem, solution, attempts, options):
+        phases = {
+            name: {key: round(value, 4) for key, value in stats.items()}
+            for name, stats in self.phases.items()
+        }
+        wanted = [problem.required_for_class(c) for c in range(problem.n_classes)]
+        classes = [
+            {
+                "class": problem.class_names[c],
+                "seconds": round(solution.class_seconds[c], 4),
+                "placements": solution.class_nodes[c],
+                "failures": solution.class_failures[c],
+                "wanted": wanted[c],
+                "unplaced": solution.unplaced.get(c, 0),
+            }
+            for c in range(problem.n_classes)
+        ]
+        classes.sort(key=lambda row: (-row["seconds"], row["class"]))
+
+        report = {
+            "started": self.started.isoformat(timespec="seconds"),
+            "options": options,
+            "school": {
+                "classes": problem.n_classes,
+                "teachers": problem.n_teachers,
+                "subjects": problem.n_subjects,
+                "rooms": problem.n_rooms,
+                "periods": problem.n_periods,
+                "fixed_lessons": len(problem.fixed),
+                "lessons_wanted": sum(wanted),
+            },
+            "total_seconds": round(sum(p["seconds"] for p in self.phases.values()), 4),
+            "queries": sum(p["queries"] for p in self.phases.values()),
+            "query_seconds": round(sum(p["query_seconds"] for p in self.phases.values()), 4),
+            "phases": phases,
+            "feasibility": self.feasibility,
+            "search": {
+                "status": solution.status,
+                "seed": solution.seed,
+                "placements_attempted": solution.nodes,
+                "backjumps": solution.backjumps,
+                "failures": sum(solution.class_failures),
+                "placed": len(solution.entries),
+                "unplaced": solution.total_unplaced,
+                "seconds": {k: round(v, 4) for k, v in solution.phases.items()},
+            },
+            "attempts": [
+                {
+                    "seed": a.seed,
+                    "status": a.status,
+                    "placements_attempted": a.nodes,
+                    "backjumps": a.backjumps,
+                    "seconds": round(a.elapsed, 4),
+                    "unplaced": a.quality[0] if a.quality else a.total_unplaced,
+                    "soft_penalty": a.quality[1] if a.quality else None,
+                }
+                for a in sorted(attempts, key=lambda a: a.seed)
+            ],
+            "classes": classes,
+        }
+        if self.profiler:
+            report["cprofile"] = self.cprofile_rows()
+        return report
+
+    def cprofile_rows(self, limit=CPROFILE_TOP):
+        """Top functions by cumulative time (this process only)."""
+        stats = pstats.Stats(self.profiler, stream=io.StringIO())
+        rows = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({
+                "function": f"{filename}:{line}({function})",
+                "calls": calls,
+                "own_seconds": round(own, 4),
+                "cumulative_seconds": round(cumulative, 4),
+            })
+        rows.sort(key=lambda row: -row["cumulative_seconds"])
+        return rows[:limit]
+
+    def dump_cprofile(self, path):
+        """Full cProfile data, for snakeviz / pstats."""
+        self.profiler.dump_stats(path)
@@ -1,8 +1,20 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 
-from .models import UserProfile
+from .models import (
+    UserProfile,
+    Teacher,
+    Room,
+    SchoolClass,
+    Period,
+    Subject,
+    TeacherSubject,
+    TimetableEntry,
+    Constraint,
+    ScheduleChange,
+)
+from . import stamps
 
 
 @receiver(post_save, sender=User)
@@ -18,3 +30,127 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
         # (if it doesn't exist for some reason, create it)
         UserProfile.objects.get_or_create(user=instance)
         instance.profile.save()
+
+
+# -------------------------------------------------
+# Dirty tracking for generate_timetable --incremental
+# -------------------------------------------------
+@receiver([post_save, post_delete], sender=Constraint)
+def track_constraint_change(sender, instance, **kwargs):
+    ScheduleChange.objects.create(
+        teacher_pk=instance.teacher_id,
+        period_pk=instance.period_id,
+        source="constraint",
+    )
+
+
+@receiver([post_save, post_delete], sender=TeacherSubject)
+def track_teacher_subject_change(sender, instance, **kwargs):
+    ScheduleChange.objects.create(teacher_pk=instance.teacher_id, source="teacher subject")
+
+
+@receiver([post_save, post_delete], sender=Teacher)
+def track_teacher_change(sender, instance, **kwargs):
+    ScheduleChange.objects.create(teacher_pk=instance.pk, source="teacher")
+
+
+@receiver([post_save, post_delete], sender=Room)
+def track_room_change(sender, instance, **kwargs):
+    ScheduleChange.objects.create(room_pk=instance.pk, source="room")
+
+
+@receiver([post_save, post_delete], sender=Period)
+def track_period_change(sender, instance, **kwargs):
+    ScheduleChange.objects.create(period_pk=instance.pk, source="period")
+
+
+# -------------------------------------------------
+# Timetable page versions (ETag / rendered-grid cache)
+# -------------------------------------------------
+@receiver(pre_save, sender=TimetableEntry)
+def remember_entry_owner(sender, instance, raw=False, **kwargs):
+    # Edit me class/teacher/room badla to purane wale ka page bhi stale hai
+    instance._stamp_before = None
+    if instance.pk and not raw:
+        instance._stamp_before = (
+            TimetableEntry.objects.filter(pk=instance.pk)
+            .values_list("school_class_id", "teacher_id", "room_id")
+            .first()
+        )
+
+
+@receiver([post_save, post_delete], sender=TimetableEntry)
+def bump_entry_stamps(sender, instance, **kwargs):
+    classes = {instance.school_class_id}
+    teachers = {instance.teacher_id}
+    rooms = {instance.room_id}
+    before = getattr(instance, "_stamp_before", None)
+    if before:
+        classes.add(before[0])
+        teachers.add(before[1])
+        rooms.add(before[2])
+    stamps.bump(classes=classes, teachers=teachers, rooms=rooms)
+
+
+def _bump_entries(classes=(), teachers=(), rooms=(), **lookup):
+    """Bump every class/teacher/room with a lesson matching ``lookup``."""
+    rows = (
+        TimetableEntry.objects.filter(**lookup)
+        .values_list("school_class_id", "teacher_id", "room_id")
+        .distinct()
+    )
+    classes = set(classes)
+    teachers = set(teachers)
+    rooms = set(rooms)
+    for class_id, teacher_id, room_id in rows:
+        classes.add(class_id)
+        teachers.add(teacher_id)
+        rooms.add(room_id)
+    stamps.bump(classes=classes, teachers=teachers, rooms=rooms)
+
+
+@receiver([post_save, post_delete], sender=SchoolClass)
+def bump_class_stamps(sender, instance, **kwargs):
+    _bump_entries(classes={instance.pk}, school_class_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Teacher)
+def bump_teacher_stamps(sender, instance, **kwargs):
+    _bump_entries(teachers={instance.pk}, teacher_id=instance.pk)
+
+
+# Teacher ke naam sirf User pe hain (grids / API me dikhte hain)
+TEACHER_NAME_FIELDS = {"username", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=User)
+def bump_teacher_user_stamps(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Har login last_login save karta hai - us pe cache mat todo
+    if created or raw or (update_fields is not None and not TEACHER_NAME_FIELDS & set(update_fields)):
+        return
+    teacher_id = Teacher.objects.filter(user_id=instance.pk).values_list("pk", flat=True).first()
+    if teacher_id is not None:
+        _bump_entries(teachers={teacher_id}, teacher_id=teacher_id)
+
+
+@receiver([post_save, post_delete], sender=Subject)
+def bump_subject_stamps(sender, instance, **kwargs):
+    _bump_entries(subject_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Room)
+def bump_room_stamps(sender, instance, **kwargs):
+    _bump_entries(rooms={instance.pk}, room_id=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Period)
+def bump_period_stamps(sender, instance, **kwargs):
+    # Period grid ke rows/columns hi badal dete hain - sab pages stale
+    stamps.bump(everything=True)
+
+
+@receiver([post_save, post_delete], sender=Constraint)
+def bump_constraint_stamps(sender, instance, **kwargs):
+    # Sabke liye blocked period: open periods badle (dashboard stats) - sab stale
+    if instance.teacher_id is None:
+        stamps.bump(everything=True)
@@ -0,0 +1,217 @@
+"""
+Array snapshots of timetable versions.
+
+A snapshot is one timetable version as NumPy arrays, saved as plain
+``.npy`` files under ``settings.TIMETABLE_SNAPSHOT_DIR/v<version id>/``:
+
+* ``cells.npy``  int32 [class, period, 3]: (subject, teacher, room) as
+  indexes into the id arrays below, -1 for a free period;
+* ``classes.npy`` / ``periods.npy`` / ``subjects.npy`` / ``teachers.npy`` /
+  ``rooms.npy``: the sorted database ids those indexes point at;
+* ``meta.json``: version id, school stamp at build time, lesson count.
+
+``load`` memory-maps the arrays (read-only, no copy, no model objects),
+so the grid projection and the incremental solver can take the timetable
+from disk instead of a query over every ``TimetableEntry`` row.
+
+A snapshot of the ACTIVE version is only used while the school stamp is
+the one it was built at - any edit (admin, week editor) moves the stamp
+and the DB is read instead. ``versions.activate`` refreshes the outgoing
+version's snapshot before archiving it, so archived snapshots are exact.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+
+from .models import Period, SchoolClass, TimetableEntry, TimetableVersion
+from .stamps import school_stamp
+
+FREE = -1
+FORMAT = 1
+ARRAYS = ("cells", "classes", "periods", "subjects", "teachers", "rooms")
+SUBJECT, TEACHER, ROOM = 0, 1, 2
+
+
+@dataclass
+class Snapshot:
+    version_id: int
+    stamp: str          # school stamp key when it was built
+    cells: np.ndarray   # int32 [classes, periods, 3]
+    classes: np.ndarray
+    periods: np.ndarray
+    subjects: np.ndarray
+    teachers: np.ndarray
+    rooms: np.ndarray
+
+    @property
+    def lessons(self):
+        return int(np.count_nonzero(self.cells[:, :, SUBJECT] != FREE))
+
+    def rows(self):
+        """int64 [lessons, 5]: (class, period, subject, teacher, room) database ids."""
+        c, p = np.nonzero(self.cells[:, :, SUBJECT] != FREE)
+        cell = self.cells[c, p]
+        return np.column_stack([
+            self.classes[c],
+            self.periods[p],
+            self.subjects[cell[:, SUBJECT]],
+            self.teachers[cell[:, TEACHER]],
+            self.rooms[cell[:, ROOM]],
+        ])
+
+
+def _index(ids, wanted):
+    """Positions of ``wanted`` in the sorted array ``ids`` (all present)."""
+    return np.searchsorted(ids, wanted).astype(np.int32)
+
+
+def build(version_id):
+    """Snapshot of a version straight from the DB (one query over its entries)."""
+    stamp = school_stamp().key
+    rows = TimetableEntry.all_versions.filter(version_id=version_id).values_list(
+        "school_class_id", "period_id", "subject_id", "teacher_id", "room_id"
+    )
+    return from_rows(version_id, list(rows), stamp)
+
+
+def from_rows(version_id, rows, stamp):
+    """
+    Snapshot from (class, period, subject, teacher, room) id rows - e.g. a
+    solution that was just written, without reading it back. Two small
+    queries (classes / periods), the rest is numpy.
+    """
+    rows = np.asarray(rows, dtype=np.int64).reshape(-1, 5)
+    # Har class / period ki row-column, lessons ho ya na ho
+    classes = np.union1d(rows[:, 0], np.fromiter(SchoolClass.objects.values_list("pk", flat=True), np.int64))
+    periods = np.union1d(rows[:, 1], np.fromiter(Period.objects.values_list("pk", flat=True), np.int64))
+    subjects, teachers, rooms = (np.unique(rows[:, i]) for i in (2, 3, 4))
+
+    cells = np.full((len(classes), len(periods), 3), FREE, dtype=np.int32)
+    cells[_index(classes, rows[:, 0]), _index(periods, rows[:, 1])] = np.column_stack([
+        _index(subjects, rows[:, 2]),
+        _index(teachers, rows[:, 3]),
+        _index(rooms, rows[:, 4]),
+    ])
+    return Snapshot(version_id, stamp, cells, classes, periods, subjects, teachers, rooms)
+
+
+def _dir(version_id):
+    return Path(settings.TIMETABLE_SNAPSHOT_DIR) / f"v{version_id}"
+
+
+def save(snapshot):
+    """Write to a temp directory, then rename - a reader never sees half a snapshot."""
+    final = _dir(snapshot.version_id)
+    final.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(dir=final.parent, prefix=".tmp-"))
+    for name in ARRAYS:
+        np.save(tmp / f"{name}.npy", np.ascontiguousarray(getattr(snapshot, name)))
+    (tmp / "meta.json").write_text(json.dumps({
+        "format": FORMAT,
+        "version": snapshot.version_id,
+        "stamp": snapshot.stamp,
+        "lessons": snapshot.lessons,
+    }))
+    if final.exists():
+        shutil.rmtree(final)
+    os.rename(tmp, final)
+    return final
+
+
+def load(version_id):
+    """The saved snapshot (arrays memory-mapped, read-only), or None."""
+    return load_dir(_dir(version_id))
+
+
+def load_dir(path):
+    """Snapshot saved in directory ``path`` (e.g. copied elsewhere), or None."""
+    path = Path(path)
+    try:
+        meta = json.loads((path / "meta.json").read_text())
+        if meta.get("format") != FORMAT:
+            return None
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in ARRAYS}
+    except (OSError, ValueError):
+        return None
+    return Snapshot(meta["version"], meta["stamp"], **arrays)
+
+
+def restamp(version_id):
+    """
+    Mark a saved snapshot as matching the DB now (a rolled-back version:
+    its lessons are unchanged, only the stamp moved). False if none saved.
+    """
+    path = _dir(version_id) / "meta.json"
+    try:
+        meta = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return False
+    meta["stamp"] = school_stamp().key
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "w") as out:
+        json.dump(meta, out)
+    os.replace(tmp, path)
+    return True
+
+
+def delete(version_id):
+    shutil.rmtree(_dir(version_id), ignore_errors=True)
+
+
+def current(stamp_key=None):
+    """
+    Snapshot of the ACTIVE version if it still matches the DB (school
+    stamp unchanged since it was built), else None.
+    """
+    version_id = (
+        TimetableVersion.objects.filter(status=TimetableVersion.ACTIVE)
+        .values_list("pk", flat=True).first()
+    )
+    if version_id is None:
+        return None
+    snapshot = load(version_id)
+    if snapshot is None:
+        return None
+    if snapshot.stamp != (stamp_key or school_stamp().key):
+        return None
+    return snapshot
+
+
+def ensure(version_id):
+    """
+    Snapshot of ``version_id``, rebuilt and saved if missing - or, for the
+    active version, if the timetable was edited since it was built.
+    """
+    snapshot = load(version_id)
+    active = TimetableVersion.objects.filter(pk=version_id, status=TimetableVersion.ACTIVE).exists()
+    if snapshot is None or (active and snapshot.stamp != school_stamp().key):
+        snapshot = build(version_id)
+        save(snapshot)
+    return snapshot
+
+
+def verify(snapshot):
+    """
+    Differences between a snapshot and its version in the DB, as
+    messages (empty: identical).
+    """
+    fresh = build(snapshot.version_id)
+    problems = []
+    have = {tuple(row) for row in snapshot.rows().tolist()}
+    want = {tuple(row) for row in fresh.rows().tolist()}
+    if have - want:
+        problems.append(f"{_lessons_are(len(have - want))} in the snapshot but not in the DB.")
+    if want - have:
+        problems.append(f"{_lessons_are(len(want - have))} in the DB but missing from the snapshot.")
+    return problems
+
+
+def _lessons_are(n):
+    return "1 lesson is" if n == 1 else f"{n} lessons are"
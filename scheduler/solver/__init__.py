@@ -0,0 +1,26 @@
+"""
+In-memory timetable solver.
+
+The core modules (``problem``, ``search``) do not touch the ORM at all:
+they work on a plain ``Problem`` snapshot and return a ``Solution``.
+``scheduler.solver.db`` is the only bridge to the Django models.
+"""
+
+from .feasibility import check_feasibility
+from .multistart import solve_many
+from .optimize import optimize
+from .problem import Problem
+from .scoring import penalty, quality, soft_violations
+from .search import Solution, solve
+
+__all__ = [
+    "Problem",
+    "Solution",
+    "check_feasibility",
+    "optimize",
+    "penalty",
+    "quality",
+    "soft_violations",
+    "solve",
+    "solve_many",
+]
@@ -0,0 +1,222 @@
+"""
+ORM glue for the solver: load a ``Problem`` snapshot in a fixed number
+of queries and turn a ``Solution`` back into ``TimetableEntry`` rows.
+"""
+
+import numpy as np
+
+from scheduler.models import (
+    SchoolClass,
+    Subject,
+    Teacher,
+    TeacherSubject,
+    Period,
+    Room,
+    Constraint,
+    TimetableEntry,
+    ScheduleChange,
+)
+
+from scheduler import snapshots
+from scheduler.stamps import school_stamp
+
+from .incremental import ChangeSet
+from .problem import Problem
+
+
+def _index(ids):
+    return {pk: i for i, pk in enumerate(ids)}
+
+
+def load_problem():
+    """
+    Seven queries, whatever the size of the school.
+    """
+    classes = list(SchoolClass.objects.values_list("id", "name", "strength"))
+    subjects = list(Subject.objects.values_list("id", "default_periods_per_week"))
+    teachers = list(Teacher.objects.values_list("id", "max_periods_per_day"))
+    periods = list(
+        Period.objects.order_by("day", "order").values_list("id", "day")
+    )
+    rooms = list(Room.objects.values_list("id", "capacity"))
+
+    subject_index = {sid: i for i, (sid, _) in enumerate(subjects)}
+    teacher_index = {tid: i for i, (tid, _) in enumerate(teachers)}
+    period_index = {pid: i for i, (pid, _) in enumerate(periods)}
+
+    qualified = frozenset(
+        (teacher_index[t], subject_index[s])
+        for t, s in TeacherSubject.objects.values_list("teacher_id", "subject_id")
+    )
+
+    blocked_periods = set()
+    teacher_blocked = set()
+    for teacher_id, period_id in Constraint.objects.filter(blocked=True).values_list(
+        "teacher_id", "period_id"
+    ):
+        if teacher_id is None:
+            blocked_periods.add(period_index[period_id])
+        else:
+            teacher_blocked.add((teacher_index[teacher_id], period_index[period_id]))
+
+    return Problem(
+        class_ids=tuple(c[0] for c in classes),
+        class_names=tuple(c[1] for c in classes),
+        class_strength=tuple(c[2] for c in classes),
+        subject_ids=tuple(s[0] for s in subjects),
+        subject_demand=tuple(s[1] for s in subjects),
+        teacher_ids=tuple(t[0] for t in teachers),
+        teacher_max_per_day=tuple(t[1] for t in teachers),
+        period_ids=tuple(p[0] for p in periods),
+        period_day=tuple(p[1] for p in periods),
+        room_ids=tuple(r[0] for r in rooms),
+        room_capacity=tuple(r[1] for r in rooms),
+        qualified=qualified,
+        blocked_periods=frozenset(blocked_periods),
+        teacher_blocked=frozenset(teacher_blocked),
+    )
+
+
+def load_names(problem):
+    """
+    Labels for messages about ``problem`` (feasibility.describe), in
+    index space: {"subject" / "teacher" / "room" / "period" / "day": {index: label}}.
+    Three queries.
+    """
+    subjects = Subject.objects.in_bulk(problem.subject_ids)
+    teachers = dict(Teacher.objects.filter(id__in=problem.teacher_ids).values_list("id", "code"))
+    rooms = dict(Room.objects.filter(id__in=problem.room_ids).values_list("id", "name"))
+    days = dict(Period.DAY_CHOICES)
+    orders = dict(Period.objects.filter(id__in=problem.period_ids).values_list("id", "order"))
+    return {
+        "subject": {i: subjects[pk].name for i, pk in enumerate(problem.subject_ids)},
+        "teacher": {i: teachers[pk] for i, pk in enumerate(problem.teacher_ids)},
+        "room": {i: rooms[pk] for i, pk in enumerate(problem.room_ids)},
+        "period": {
+            i: f"{days.get(day, day)} P{orders[pk]}"
+            for i, (pk, day) in enumerate(zip(problem.period_ids, problem.period_day))
+        },
+        "day": days,
+    }
+
+
+def build_entries(problem, entries, version_id):
+    """
+    Unsaved ``TimetableEntry`` objects of timetable version
+    ``version_id``, ready for ``bulk_create``. Only the FK ids are set, so
+    no related rows are fetched.
+    """
+    return [
+        TimetableEntry(
+            version_id=version_id,
+            school_class_id=problem.class_ids[c],
+            period_id=problem.period_ids[p],
+            subject_id=problem.subject_ids[s],
+            teacher_id=problem.teacher_ids[t],
+            room_id=problem.room_ids[r],
+        )
+        for c, p, s, t, r in entries
+    ]
+
+
+def _id_lists(problem):
+    return (
+        problem.class_ids, problem.period_ids, problem.subject_ids,
+        problem.teacher_ids, problem.room_ids,
+    )
+
+
+def entry_ids(problem, entries):
+    """int64 [lessons, 5] database ids of index-space ``entries`` (numpy, no ORM)."""
+    entries = np.asarray(entries, dtype=np.int64).reshape(-1, 5)
+    return np.column_stack([
+        np.asarray(ids, dtype=np.int64)[entries[:, i]] for i, ids in enumerate(_id_lists(problem))
+    ]).reshape(-1, 5)
+
+
+def _to_indexes(problem, rows):
+    """Inverse of ``entry_ids``, vectorised; rows naming unknown objects are dropped."""
+    columns, keep = [], np.ones(len(rows), dtype=bool)
+    for i, ids in enumerate(_id_lists(problem)):
+        if not ids:
+            return []
+        ids = np.asarray(ids, dtype=np.int64)
+        order = np.argsort(ids)
+        found = order[np.searchsorted(ids, rows[:, i], sorter=order).clip(0, len(ids) - 1)]
+        keep &= ids[found] == rows[:, i]
+        columns.append(found)
+    return [tuple(row) for row in np.column_stack(columns)[keep].tolist()]
+
+
+def load_entries(problem):
+    """
+    Current timetable as a list of (class, period, subject, teacher, room)
+    in the index space of ``problem``. From the active version's array
+    snapshot when it is up to date, else one query.
+    """
+    snapshot = snapshots.current(school_stamp().key)
+    if snapshot is not None:
+        return _to_indexes(problem, snapshot.rows())
+
+    classes = _index(problem.class_ids)
+    subjects = _index(problem.subject_ids)
+    teachers = _index(problem.teacher_ids)
+    periods = _index(problem.period_ids)
+    rooms = _index(problem.room_ids)
+    return [
+        (classes[c], periods[p], subjects[s], teachers[t], rooms[r])
+        for c, p, s, t, r in TimetableEntry.objects.values_list(
+            "school_class_id", "period_id", "subject_id", "teacher_id", "room_id"
+        )
+    ]
+
+
+def last_change_id():
+    """Newest ``ScheduleChange`` id; take it *before* loading the problem."""
+    return ScheduleChange.objects.order_by("-id").values_list("id", flat=True).first()
+
+
+def load_changes(problem, up_to):
+    """
+    ``ScheduleChange`` rows up to ``up_to`` as a ``ChangeSet``. Changes to
+    objects that no longer exist are skipped (their lessons are gone
+    already).
+    """
+    teachers = _index(problem.teacher_ids)
+    rooms = _index(problem.room_ids)
+    periods = _index(problem.period_ids)
+
+    changes = ChangeSet()
+    if up_to is None:
+        return changes
+    for teacher_pk, room_pk, period_pk in ScheduleChange.objects.filter(
+        id__lte=up_to
+    ).values_list("teacher_pk", "room_pk", "period_pk"):
+        t = teachers.get(teacher_pk)
+        p = periods.get(period_pk)
+        if teacher_pk is not None and period_pk is not None:
+            if t is not None and p is not None:
+                changes.teacher_periods.add((t, p))
+        elif t is not None:
+            changes.teachers.add(t)
+        elif p is not None:
+            changes.periods.add(p)
+        elif room_pk in rooms:
+            changes.rooms.add(rooms[room_pk])
+    return changes
+
+
+def clear_changes(up_to):
+    """Drop the changes that the run just handled."""
+    if up_to is not None:
+        ScheduleChange.objects.filter(id__lte=up_to).delete()
+
+
+def diff_counts(existing, solution):
+    """
+    How the solution differs from the current timetable (``load_entries``):
+    (lessons dropped or moved, lessons new or moved).
+    """
+    wanted = set(solution.entries)
+    have = set(existing)
+    return len(have - wanted), len(wanted - have)
@@ -0,0 +1,292 @@
+"""
+Pre-solve feasibility checks.
+
+Necessary conditions for a full timetable, checked on the ``Problem``
+before any search. Each one is a max-flow (or a plain count where the
+flow graph would be a single edge), and a failed flow's min cut names
+the resources that are short:
+
+* teachers: every lesson needs a qualified teacher-period. Subjects ->
+  qualified teachers -> each teacher's week (daily cap on every day,
+  minus blocked periods). The cut is the set of subjects whose teachers
+  cannot cover them.
+* rooms: every lesson needs a room-period big enough for the class.
+  Classes -> rooms that fit -> open periods. Rooms are never blocked per
+  period, so the week total is also the per-period check.
+* days / periods: a class with k spare periods a week needs at least
+  ``open periods of the day - k`` lessons that day, and every period if
+  it has no spare ones - compared with the teachers available then.
+
+Passing all of them does not guarantee a solution, but failing one means
+the search cannot place everything, whatever it tries. Everything runs
+in milliseconds even for a large school.
+"""
+
+from collections import defaultdict, deque
+from dataclasses import dataclass
+
+TEACHERS = "teachers"
+ROOMS = "rooms"
+DAY = "day"
+PERIOD = "period"
+
+
+@dataclass(frozen=True)
+class Bottleneck:
+    """One failed check, in index space (see ``describe``)."""
+    check: str
+    needed: int      # lessons (or teachers, for PERIOD) the input asks for
+    available: int   # what the resources can give at most
+    subjects: tuple = ()
+    teachers: tuple = ()
+    classes: tuple = ()
+    rooms: tuple = ()
+    periods: tuple = ()
+    day: int = None
+
+    @property
+    def shortfall(self):
+        return self.needed - self.available
+
+
+class _Flow:
+    """Dinic max-flow on a small graph (a few hundred nodes)."""
+
+    def __init__(self):
+        self.graph = defaultdict(list)  # node -> [edge index]
+        self.to, self.cap = [], []
+
+    def edge(self, u, v, capacity):
+        self.graph[u].append(len(self.to))
+        self.to.append(v)
+        self.cap.append(capacity)
+        self.graph[v].append(len(self.to))
+        self.to.append(u)
+        self.cap.append(0)
+
+    def _levels(self, source):
+        level = {source: 0}
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            for e in self.graph[u]:
+                if self.cap[e] > 0 and self.to[e] not in level:
+                    level[self.to[e]] = level[u] + 1
+                    queue.append(self.to[e])
+        return level
+
+    def _push(self, u, sink, amount, level, next_edge):
+        if u == sink:
+            return amount
+        edges = self.graph[u]
+        while next_edge[u] < len(edges):
+            e = edges[next_edge[u]]
+            v = self.to[e]
+            if self.cap[e] > 0 and level.get(v) == level[u] + 1:
+                pushed = self._push(v, sink, min(amount, self.cap[e]), level, next_edge)
+                if pushed:
+                    self.cap[e] -= pushed
+                    self.cap[e ^ 1] += pushed
+                    return pushed
+            next_edge[u] += 1
+        return 0
+
+    def max_flow(self, source, sink):
+        total = 0
+        while True:
+            level = self._levels(source)
+            if sink not in level:
+                return total
+            next_edge = defaultdict(int)
+            while True:
+                pushed = self._push(source, sink, float("inf"), level, next_edge)
+                if not pushed:
+                    break
+                total += pushed
+
+    def cut(self, source, kind):
+        """
+        Indexes of the ``(kind, index)`` nodes still reachable from
+        ``source`` after ``max_flow`` - the source side of the min cut.
+        """
+        return tuple(sorted(
+            node[1] for node in self._levels(source) if isinstance(node, tuple) and node[0] == kind
+        ))
+
+
+def _open_by_day(problem):
+    days = defaultdict(list)
+    for p in problem.open_periods():
+        days[problem.period_day[p]].append(p)
+    return days
+
+
+def _teacher_week(problem, open_by_day):
+    """Periods teacher t can teach per day: min(daily cap, unblocked open periods)."""
+    return [
+        {
+            day: min(problem.teacher_max_per_day[t],
+                     sum(1 for p in periods if (t, p) not in problem.teacher_blocked))
+            for day, periods in open_by_day.items()
+        }
+        for t in range(problem.n_teachers)
+    ]
+
+
+def check_teachers(problem, required, week):
+    """Subject demand vs qualified teacher-hours (max-flow)."""
+    flow = _Flow()
+    source, sink = "source", "sink"
+    for s, demand in enumerate(problem.subject_demand):
+        flow.edge(source, ("s", s), demand * problem.n_classes)
+    for t, s in problem.qualified:
+        flow.edge(("s", s), ("t", t), float("inf"))
+    for t in {t for t, _ in problem.qualified}:
+        flow.edge(("t", t), sink, sum(week[t].values()))
+
+    total = sum(required)
+    placed = flow.max_flow(source, sink)
+    if placed >= total:
+        return []
+    return [Bottleneck(
+        TEACHERS, total, placed, subjects=flow.cut(source, "s"), teachers=flow.cut(source, "t")
+    )]
+
+
+def check_rooms(problem, required):
+    """Lessons per class vs room-periods of rooms big enough (max-flow)."""
+    n_open = len(problem.open_periods())
+    flow = _Flow()
+    source, sink = "source", "sink"
+    for c, need in enumerate(required):
+        flow.edge(source, ("c", c), need)
+        for r, capacity in enumerate(problem.room_capacity):
+            if capacity >= problem.class_strength[c]:
+                flow.edge(("c", c), ("r", r), float("inf"))
+    for r in range(problem.n_rooms):
+        flow.edge(("r", r), sink, n_open)
+
+    total = sum(required)
+    placed = flow.max_flow(source, sink)
+    if placed >= total:
+        return []
+    classes = flow.cut(source, "c")
+    rooms = flow.cut(source, "r")
+    # the cut's classes need exactly what goes over their source edges
+    needed = sum(required[c] for c in classes)
+    return [Bottleneck(ROOMS, needed, n_open * len(rooms), classes=classes, rooms=rooms)]
+
+
+def check_days(problem, required, week, open_by_day):
+    """Lessons each day must have vs teacher-periods that day."""
+    n_open = len(problem.open_periods())
+    spare = [n_open - need for need in required]
+    teaching = {t for t, _ in problem.qualified}
+    found = []
+    for day, periods in sorted(open_by_day.items()):
+        needed = sum(max(0, len(periods) - k) for k in spare)
+        available = sum(week[t][day] for t in teaching)
+        if needed > available:
+            short = tuple(sorted(t for t in teaching if week[t][day] < len(periods)))
+            found.append(Bottleneck(DAY, needed, available, teachers=short, day=day))
+    return found
+
+
+def check_periods(problem, required):
+    """Classes without a spare period vs teachers free in each period."""
+    n_open = len(problem.open_periods())
+    full = tuple(c for c, need in enumerate(required) if need >= n_open)
+    if not full:
+        return []
+    teaching = {t for t, _ in problem.qualified if problem.teacher_max_per_day[t] > 0}
+    short = defaultdict(list)  # available teachers -> periods
+    for p in problem.open_periods():
+        available = sum(1 for t in teaching if (t, p) not in problem.teacher_blocked)
+        if available < len(full):
+            short[available].append(p)
+    return [
+        Bottleneck(PERIOD, len(full), available, classes=full, periods=tuple(periods))
+        for available, periods in sorted(short.items())
+    ]
+
+
+def check_feasibility(problem):
+    """Every failed check, worst first; an empty list means none failed."""
+    if not problem.n_classes or not problem.open_periods():
+        return []
+    required = [problem.required_for_class(c) for c in range(problem.n_classes)]
+    open_by_day = _open_by_day(problem)
+    week = _teacher_week(problem, open_by_day)
+    found = (
+        check_teachers(problem, required, week)
+        + check_rooms(problem, required)
+        + check_days(problem, required, week, open_by_day)
+        + check_periods(problem, required)
+    )
+    found.sort(key=lambda b: -b.shortfall)
+    return found
+
+
+def _count(n, noun, plural=None):
+    """"1 teacher" / "3 teachers" (``plural`` for irregular nouns)."""
+    return f"{n} {noun if n == 1 else plural or noun + 's'}"
+
+
+def describe(bottleneck, names, problem, limit=8):
+    """
+    One line for a person. ``names``: {"subject"|"teacher"|"room":
+    {index: label}} (``db.load_names``); classes come from the problem.
+    """
+    def listing(kind, indexes):
+        if kind == "class":
+            labels = [problem.class_names[i] for i in indexes]
+        else:
+            labels = [names[kind][i] for i in indexes]
+        more = f" and {len(labels) - limit} more" if len(labels) > limit else ""
+        return ", ".join(str(label) for label in labels[:limit]) + more
+
+    b = bottleneck
+    blocked = len(problem.blocked_periods)
+    blocked_note = (
+        f" ({_count(blocked, 'period')} {'is' if blocked == 1 else 'are'} blocked for everybody)"
+        if blocked else ""
+    )
+    if b.check == TEACHERS:
+        if not b.teachers:
+            return (
+                f"No teacher is qualified for {listing('subject', b.subjects)}: "
+                f"{_count(b.shortfall, 'lesson')} a week cannot be given."
+            )
+        who = "the only teacher" if len(b.teachers) == 1 else f"the {len(b.teachers)} teachers"
+        return (
+            f"Teachers: {who} qualified for {listing('subject', b.subjects)} "
+            f"({listing('teacher', b.teachers)}) cannot cover those lessons within their daily "
+            f"limits and blocked periods{blocked_note} - at most {b.available} of the school's "
+            f"{_count(b.needed, 'lesson')} can be placed."
+        )
+    if b.check == ROOMS:
+        smallest = min(problem.class_strength[c] for c in b.classes)
+        if not b.rooms:
+            return (
+                f"Rooms: no room holds {listing('class', b.classes)} "
+                f"(strength {smallest}+)."
+            )
+        which = "the only room" if len(b.rooms) == 1 else f"the {len(b.rooms)} rooms"
+        return (
+            f"Rooms: {listing('class', b.classes)} (strength {smallest}+) "
+            f"{'needs' if len(b.classes) == 1 else 'need'} {_count(b.needed, 'room-period')} "
+            f"a week, {which} big enough ({listing('room', b.rooms)}) "
+            f"{'has' if len(b.rooms) == 1 else 'have'} {b.available}{blocked_note}."
+        )
+    if b.check == DAY:
+        return (
+            f"{names['day'].get(b.day, f'Day {b.day}')}: classes need at least "
+            f"{_count(b.needed, 'lesson')}, teachers can give {b.available} (daily limits / "
+            f"blocked periods; {_count(len(b.teachers), 'teacher')} cannot work the whole "
+            f"day){blocked_note}."
+        )
+    return (
+        f"Periods {listing('period', b.periods)}: {_count(b.needed, 'class', 'classes')} "
+        f"{'has' if b.needed == 1 else 'have'} no free period to spare, only "
+        f"{_count(b.available, 'teacher')} {'is' if b.available == 1 else 'are'} available then."
+    )
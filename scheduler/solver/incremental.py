@@ -0,0 +1,87 @@
+"""
+Incremental regeneration: keep every existing lesson that is still valid
+and untouched by a change, and hand only the rest back to the search.
+"""
+
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+
+
+@dataclass
+class ChangeSet:
+    """Changed master data, in index space (see ``ScheduleChange``)."""
+    teachers: set = field(default_factory=set)
+    rooms: set = field(default_factory=set)
+    periods: set = field(default_factory=set)
+    teacher_periods: set = field(default_factory=set)
+
+    def __bool__(self):
+        return bool(self.teachers or self.rooms or self.periods or self.teacher_periods)
+
+
+def invalid_cells(problem, entries):
+    """
+    Cells whose lesson breaks a hard rule under the current master data
+    (same rules as ``TimetableEntry.clean``, plus the subject's weekly
+    count). ``entries`` are (class, period, subject, teacher, room).
+    """
+    bad = set()
+    teacher_slot = defaultdict(list)
+    room_slot = defaultdict(list)
+    teacher_day = defaultdict(list)
+    class_subject = defaultdict(list)
+
+    for c, p, s, t, r in entries:
+        cell = (c, p)
+        if (
+            (t, s) not in problem.qualified
+            or p in problem.blocked_periods
+            or (t, p) in problem.teacher_blocked
+            or problem.room_capacity[r] < problem.class_strength[c]
+        ):
+            bad.add(cell)
+        teacher_slot[(t, p)].append(cell)
+        room_slot[(r, p)].append(cell)
+        teacher_day[(t, problem.period_day[p])].append(cell)
+        class_subject[(c, s)].append(cell)
+
+    for cells in list(teacher_slot.values()) + list(room_slot.values()):
+        if len(cells) > 1:
+            bad.update(cells)
+    for (t, _), cells in teacher_day.items():
+        if len(cells) > problem.teacher_max_per_day[t]:
+            bad.update(cells)
+    for (_, s), cells in class_subject.items():
+        if len(cells) > problem.subject_demand[s]:
+            bad.update(cells)
+    return bad
+
+
+def cells_to_free(problem, entries, changes):
+    """
+    Cells to re-solve: lessons touching a changed teacher/room/period,
+    and invalid lessons together with the rest of their class's day, so
+    the search has some room to shuffle a replacement in.
+    """
+    invalid = invalid_cells(problem, entries)
+    invalid_days = {(c, problem.period_day[p]) for c, p in invalid}
+
+    free = set()
+    for c, p, s, t, r in entries:
+        if (
+            (c, problem.period_day[p]) in invalid_days
+            or t in changes.teachers
+            or r in changes.rooms
+            or p in changes.periods
+            or (t, p) in changes.teacher_periods
+        ):
+            free.add((c, p))
+    return free
+
+
+def with_fixed(problem, entries, free):
+    """``problem`` with every lesson outside ``free`` fixed in place."""
+    return replace(
+        problem,
+        fixed=tuple(e for e in entries if (e[0], e[1]) not in free),
+    )
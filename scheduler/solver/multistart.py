@@ -0,0 +1,110 @@
+"""
+Multi-start solving: run several independently seeded searches across
+a process pool and keep the best one by ``scoring.quality``.
+
+Only ``Problem`` and ``Solution`` cross the process boundary, both plain
+picklable data, so the workers never need the ORM.
+
+When the run is stopped (a callback raised, e.g. a cancelled job) the
+pool is not waited for: a shared event tells the running attempts to
+give up at their next progress check, and ``solve_many`` raises at once.
+"""
+
+import multiprocessing
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .optimize import optimize
+from .scoring import quality
+from .search import solve
+
+
+def attempt_seeds(restarts, seed=None):
+    """
+    Seeds for ``restarts`` attempts. With a base seed the first attempt
+    is the same as a single ``solve(problem, seed)`` run.
+    """
+    if seed is None:
+        seed = random.SystemRandom().randrange(2 ** 31)
+    return [seed + i for i in range(restarts)]
+
+
+class Stopped(Exception):
+    """A pool attempt gave up because the run was stopped."""
+
+
+# Pool workers only: set by the parent when the run is stopped
+_stop = None
+
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+
+def _stopped():
+    return _stop is not None and _stop.is_set()
+
+
+def _check_stop(*progress):
+    if _stopped():
+        raise Stopped()
+
+
+def _attempt(problem, seed, time_limit, max_nodes, optimize_time, progress=None):
+    solution = solve(
+        problem, seed=seed, time_limit=time_limit, max_nodes=max_nodes,
+        progress=progress or _check_stop,
+    )
+    if optimize_time:
+        started = time.perf_counter()
+        solution = optimize(problem, solution, optimize_time, seed=seed, should_stop=_stopped)
+        solution.phases = {**solution.phases, "optimize": time.perf_counter() - started}
+    solution.quality = quality(problem, solution)
+    return solution
+
+
+def solve_many(problem, restarts=1, jobs=1, seed=None, time_limit=None,
+               max_nodes=None, optimize_time=0, on_result=None, progress=None):
+    """
+    Run ``restarts`` attempts on ``jobs`` processes and return
+    ``(best, attempts)``. Each attempt is polished by ``optimize`` for
+    ``optimize_time`` seconds before it is ranked. ``on_result`` is
+    called with every finished attempt, in completion order.
+    ``progress`` goes to ``solve`` when the attempts run in this process
+    (a callback can't reach pool workers). An exception raised by either
+    callback stops the run at once: attempts not started yet are dropped,
+    running ones give up at their next progress check.
+    """
+    seeds = attempt_seeds(restarts, seed)
+    attempts = []
+
+    if jobs <= 1 or restarts <= 1:
+        for s in seeds:
+            attempts.append(_attempt(problem, s, time_limit, max_nodes, optimize_time, progress))
+            if on_result:
+                on_result(attempts[-1])
+    else:
+        stop = multiprocessing.Event()
+        pool = ProcessPoolExecutor(
+            max_workers=min(jobs, restarts), initializer=_init_worker, initargs=(stop,)
+        )
+        futures = [
+            pool.submit(_attempt, problem, s, time_limit, max_nodes, optimize_time)
+            for s in seeds
+        ]
+        try:
+            for future in as_completed(futures):
+                attempts.append(future.result())
+                if on_result:
+                    on_result(attempts[-1])
+        except BaseException:
+            # Chal rahe attempts ka intezaar nahi - woh khud ruk jaate hain
+            stop.set()
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+    best = min(attempts, key=lambda a: (a.quality, a.seed))
+    return best, attempts
@@ -0,0 +1,231 @@
+"""
+Post-solve local search.
+
+Simulated annealing over two neighbourhoods:
+
+* swap    - exchange two periods of one class (two lessons, or a lesson
+            and a free period); teachers stay
+* teacher - hand a lesson to another qualified teacher who is free
+
+Every move is applied to a ``SolverState`` and only the penalty terms it
+touches are re-scored (the same terms ``scoring.penalty`` sums over the
+whole timetable), so a move costs O(affected slots) instead of a full
+rescore. Hard rules are never broken and fixed lessons never move.
+Rooms are dropped while moving (only the per-period room counts are
+kept feasible) and given out again at the end, see ``rooms.py``.
+"""
+
+import math
+import random
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from .rooms import assign_rooms
+from .scoring import WEIGHTS, penalty, subject_terms, teacher_gap, teacher_overload
+from .state import FREE, SolverState
+
+
+def optimize(problem, solution, time_limit, seed=None,
+             start_temperature=2.0, end_temperature=0.05, should_stop=None):
+    """
+    Improve ``solution`` for ``time_limit`` seconds (less if
+    ``should_stop()`` turns true). Returns a new ``Solution`` with
+    ``optimized`` set to (penalty before, after, moves).
+    """
+    opt = _Optimizer(problem, solution, seed)
+    before = opt.score
+    moves = opt.run(time_limit, start_temperature, end_temperature, should_stop)
+    entries = opt.best_entries()
+    after = penalty(problem, entries)
+    return replace(solution, entries=entries, optimized=(before, after, moves))
+
+
+class _Optimizer:
+
+    def __init__(self, problem, solution, seed):
+        self.problem = problem
+        self.rng = random.Random(seed)
+        self.state = st = SolverState(problem)
+
+        fixed = {(c, p) for c, p, *_ in problem.fixed}
+        for c, p, s, t, _ in solution.entries:
+            if (c, p) not in fixed:
+                st.place(c, p, s, t)
+
+        self.n_days = len(problem.days)
+        self.day_periods = [
+            np.flatnonzero(st.period_day == d) for d in range(self.n_days)
+        ]
+        movable = np.tile(st.period_open, (problem.n_classes, 1))
+        for c, p in fixed:
+            movable[c, p] = False
+        self.movable = [np.flatnonzero(row).tolist() for row in movable]
+        self.classes = [c for c, row in enumerate(self.movable) if len(row) >= 2]
+        self.teachers_for = [
+            np.flatnonzero(st.qualified[:, s]).tolist() for s in range(problem.n_subjects)
+        ]
+
+        self.score = penalty(problem, solution.entries)
+        self.best_score = self.score
+        self.best = self._snapshot()
+
+    # -------------------------------------------------
+    # Local penalty terms
+    # -------------------------------------------------
+    def _subject_cost(self, c, s):
+        st = self.state
+        counts = np.bincount(
+            st.period_day[st.class_subject[c] == s], minlength=self.n_days
+        )
+        repeats, spread = subject_terms(counts.tolist(), self.n_days)
+        return WEIGHTS["subject_repeats"] * repeats + WEIGHTS["subject_spread"] * spread
+
+    def _teacher_day_cost(self, t, d):
+        busy = np.flatnonzero(self.state.teacher_at[t, self.day_periods[d]] != FREE)
+        return WEIGHTS["teacher_gaps"] * teacher_gap(busy.tolist())
+
+    def _teacher_week_cost(self, t):
+        loads = self.state.teacher_load[t].tolist()
+        return WEIGHTS["teacher_overload"] * teacher_overload(loads, self.n_days)
+
+    def _local(self, subjects, teacher_days, teachers):
+        return (
+            sum(self._subject_cost(c, s) for c, s in subjects)
+            + sum(self._teacher_day_cost(t, d) for t, d in teacher_days)
+            + sum(self._teacher_week_cost(t) for t in teachers)
+        )
+
+    # -------------------------------------------------
+    # Lesson helpers
+    # -------------------------------------------------
+    def _take(self, c, p):
+        if self.state.class_subject[c, p] == FREE:
+            return None
+        return self.state.remove(c, p)
+
+    def _fits(self, c, p, s, t):
+        st = self.state
+        return (
+            st.teacher_at[t, p] == FREE
+            and not st.teacher_blocked[t, p]
+            and st.teacher_load[t, st.period_day[p]] < st.max_per_day[t]
+        )
+
+    def _put(self, c, p, lesson):
+        """Place ``lesson`` at (c, p) if the hard rules allow it."""
+        if lesson is None:
+            return True
+        s, t, _ = lesson
+        if not (self._fits(c, p, s, t) and self.state.room_free(c, p)):
+            return False
+        self.state.place(c, p, s, t)
+        return True
+
+    # -------------------------------------------------
+    # Moves: each returns (delta, undo) or None when not possible
+    # -------------------------------------------------
+    def _swap(self):
+        st = self.state
+        c = self.rng.choice(self.classes)
+        p1, p2 = self.rng.sample(self.movable[c], 2)
+        a, b = st.class_subject[c, p1], st.class_subject[c, p2]
+        if a == b:
+            return None  # same subject or both free: nothing changes
+
+        d1, d2 = st.period_day[p1], st.period_day[p2]
+        ta, tb = st.class_teacher[c, p1], st.class_teacher[c, p2]
+        subjects = {(c, s) for s in (a, b) if s != FREE}
+        teachers = {t for t in (ta, tb) if t != FREE}
+        teacher_days = {(t, d) for t in teachers for d in (d1, d2)}
+        before = self._local(subjects, teacher_days, teachers)
+
+        la, lb = self._take(c, p1), self._take(c, p2)
+
+        def undo():
+            self._take(c, p1)
+            self._take(c, p2)
+            self._put(c, p1, la)
+            self._put(c, p2, lb)
+
+        if not self._put(c, p2, la):
+            undo()
+            return None
+        if not self._put(c, p1, lb):
+            undo()
+            return None
+        return self._local(subjects, teacher_days, teachers) - before, undo
+
+    def _reassign(self):
+        st = self.state
+        c = self.rng.choice(self.classes)
+        p = self.rng.choice(self.movable[c])
+        s = st.class_subject[c, p]
+        if s == FREE or len(self.teachers_for[s]) < 2:
+            return None
+        t_old = st.class_teacher[c, p]
+        t_new = self.rng.choice(self.teachers_for[s])
+        if t_new == t_old or not self._fits(c, p, s, t_new):
+            return None
+
+        d = st.period_day[p]
+        teachers = {t_old, t_new}
+        teacher_days = {(t, d) for t in teachers}
+        before = self._local((), teacher_days, teachers)
+
+        st.remove(c, p)
+        st.place(c, p, s, t_new)
+
+        def undo():
+            st.remove(c, p)
+            st.place(c, p, s, t_old)
+
+        return self._local((), teacher_days, teachers) - before, undo
+
+    # -------------------------------------------------
+    # Annealing
+    # -------------------------------------------------
+    def run(self, time_limit, start_temperature, end_temperature, should_stop=None):
+        if not self.classes or time_limit <= 0:
+            return 0
+        started = time.perf_counter()
+        ratio = end_temperature / start_temperature
+        temperature = start_temperature
+        accepted = 0
+        step = 0
+
+        while True:
+            step += 1
+            if step % 64 == 0:
+                elapsed = (time.perf_counter() - started) / time_limit
+                if elapsed >= 1 or (should_stop is not None and should_stop()):
+                    break
+                temperature = start_temperature * ratio ** elapsed
+
+            move = self._swap() if self.rng.random() < 0.7 else self._reassign()
+            if move is None:
+                continue
+            delta, undo = move
+            if delta <= 0 or self.rng.random() < math.exp(-delta / temperature):
+                self.score += delta
+                accepted += 1
+                if self.score < self.best_score:
+                    self.best_score = self.score
+                    self.best = self._snapshot()
+            else:
+                undo()
+        return accepted
+
+    def _snapshot(self):
+        st = self.state
+        return (st.class_subject.copy(), st.class_teacher.copy(), st.class_room.copy())
+
+    def best_entries(self):
+        subjects, teachers, rooms = self.best
+        cs, ps = np.nonzero(subjects != FREE)
+        entries, _ = assign_rooms(self.problem, [
+            (int(c), int(p), int(subjects[c, p]), int(teachers[c, p]), int(rooms[c, p]))
+            for c, p in zip(cs, ps)
+        ])
+        return entries
@@ -0,0 +1,73 @@
+"""
+Plain problem snapshot for the solver.
+
+Everything is stored in *index space*: class ``c``, subject ``s``,
+teacher ``t``, period ``p`` and room ``r`` are positions in the matching
+``*_ids`` tuple. The ids are only needed again when the solution is
+written back to the database.
+"""
+
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class Problem:
+    class_ids: tuple
+    class_names: tuple
+    class_strength: tuple
+
+    subject_ids: tuple
+    subject_demand: tuple  # periods per week, same for every class
+
+    teacher_ids: tuple
+    teacher_max_per_day: tuple
+
+    period_ids: tuple      # already sorted by (day, order)
+    period_day: tuple
+
+    room_ids: tuple
+    room_capacity: tuple
+
+    # (teacher, subject) pairs from TeacherSubject
+    qualified: frozenset = field(default_factory=frozenset)
+    # periods blocked for everybody (Constraint.teacher is NULL)
+    blocked_periods: frozenset = field(default_factory=frozenset)
+    # (teacher, period) pairs blocked for one teacher
+    teacher_blocked: frozenset = field(default_factory=frozenset)
+    # (class, period, subject, teacher, room) lessons the solver must keep
+    fixed: tuple = ()
+
+    @property
+    def n_classes(self):
+        return len(self.class_ids)
+
+    @property
+    def n_subjects(self):
+        return len(self.subject_ids)
+
+    @property
+    def n_teachers(self):
+        return len(self.teacher_ids)
+
+    @property
+    def n_periods(self):
+        return len(self.period_ids)
+
+    @property
+    def n_rooms(self):
+        return len(self.room_ids)
+
+    @property
+    def days(self):
+        return sorted(set(self.period_day))
+
+    def open_periods(self):
+        """Periods that are not blocked globally, in (day, order) order."""
+        return [p for p in range(self.n_periods) if p not in self.blocked_periods]
+
+    def required_for_class(self, c):
+        """
+        How many lessons class ``c`` should get. If the subjects ask for
+        more periods than the week has, every open period gets filled.
+        """
+        return min(sum(self.subject_demand), len(self.open_periods()))
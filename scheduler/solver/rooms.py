@@ -0,0 +1,137 @@
+"""
+Stage two of a solve: rooms.
+
+The search (stage one) only decides class / subject / teacher / period
+and keeps the room *count* of every period feasible (``SolverState``
+tiers). Rooms are then given out period by period as a minimum-cost
+assignment (Hungarian method) between that period's lessons and its free
+rooms:
+
+* a class stays in its home room whenever it can - home rooms are one
+  assignment of the whole school up front, tightest fit first;
+* otherwise the smallest room that still fits, so big rooms stay free.
+
+Lessons that already have a room (fixed ones) keep it. Every period is
+solved optimally and independently, in O(lessons^2 x rooms).
+"""
+
+from collections import defaultdict
+
+import numpy as np
+
+from .state import FREE
+
+# cost of a pair that does not fit: never chosen while a fitting
+# assignment exists
+NO_FIT = 1e9
+
+
+def min_cost_assignment(cost):
+    """
+    Row -> distinct column with the smallest total ``cost`` (rows <=
+    columns). Hungarian method with potentials; each step is vectorised
+    over the columns. Returns the column of every row.
+    """
+    n, m = cost.shape
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.intp)  # column -> row + 1 (0: none); column 0 is a sentinel
+    way = np.zeros(m + 1, dtype=np.intp)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        best = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            row = owner[j0]
+            reduced = cost[row - 1] - u[row] - v[1:]
+            open_ = ~used[1:]
+            better = open_ & (reduced < best[1:])
+            best[1:][better] = reduced[better]
+            way[1:][better] = j0
+            candidates = np.where(open_, best[1:], np.inf)
+            j1 = int(np.argmin(candidates)) + 1
+            delta = candidates[j1 - 1]
+            done = np.flatnonzero(used)
+            u[owner[done]] += delta
+            v[done] -= delta
+            best[1:][open_] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    columns = np.full(n, FREE, dtype=np.intp)
+    rows = np.flatnonzero(owner[1:])
+    columns[owner[1:][rows] - 1] = rows
+    return columns
+
+
+def _fit_cost(problem, classes, rooms):
+    """[classes, rooms]: spare seats where the class fits, NO_FIT elsewhere."""
+    strength = np.array([problem.class_strength[c] for c in classes])
+    capacity = np.array([problem.room_capacity[r] for r in rooms])
+    slack = (capacity[None, :] - strength[:, None]).astype(float)
+    return np.where(slack >= 0, slack, NO_FIT)
+
+
+def home_rooms(problem):
+    """One room per class (tightest fit overall), FREE when there are too few rooms."""
+    classes = list(range(problem.n_classes))
+    rooms = list(range(problem.n_rooms))
+    if not classes or not rooms:
+        return np.full(len(classes), FREE, dtype=np.intp)
+    cost = _fit_cost(problem, classes, rooms)
+    # more classes than rooms: the extra ones get a "no home" column
+    extra = max(len(classes) - len(rooms), 0)
+    no_home = max(problem.room_capacity) + 1
+    cost = np.hstack([cost, np.full((len(classes), extra), no_home)])
+    columns = min_cost_assignment(cost)
+    homes = np.where(columns < len(rooms), columns, FREE)
+    homes[cost[np.arange(len(classes)), columns] >= NO_FIT] = FREE
+    return homes
+
+
+def assign_rooms(problem, entries):
+    """
+    Give every lesson without a room (room FREE) one. Returns
+    ``(entries, dropped)``; ``dropped`` lessons had no fitting room left,
+    which the search's room counts rule out unless the input was already
+    broken (e.g. fixed lessons sharing a room).
+    """
+    homes = home_rooms(problem)
+    move_cost = max(problem.room_capacity, default=0) + 1
+
+    placed, waiting = [], defaultdict(list)
+    taken = defaultdict(set)
+    for entry in entries:
+        if entry[4] == FREE:
+            waiting[entry[1]].append(entry)
+        else:
+            placed.append(entry)
+            taken[entry[1]].add(entry[4])
+
+    dropped = []
+    for p, lessons in sorted(waiting.items()):
+        # usual case: every class can sit in its own room - that is optimal
+        own = [homes[c] for c, *_ in lessons]
+        if FREE not in own and not taken[p].intersection(own):
+            placed.extend((c, p, s, t, int(r)) for (c, p, s, t, _), r in zip(lessons, own))
+            continue
+        rooms = [r for r in range(problem.n_rooms) if r not in taken[p]]
+        classes = [c for c, *_ in lessons]
+        cost = _fit_cost(problem, classes, rooms)
+        cost += np.where(np.array(rooms)[None, :] == homes[classes][:, None], 0, move_cost)
+        if len(classes) > len(rooms):
+            cost = np.hstack([cost, np.full((len(classes), len(classes) - len(rooms)), NO_FIT)])
+        columns = min_cost_assignment(cost)
+        for (c, p, s, t, _), j, row in zip(lessons, columns, cost):
+            if row[j] >= NO_FIT:
+                dropped.append((c, p, s, t, FREE))
+            else:
+                placed.append((c, p, s, t, rooms[j]))
+    return placed, dropped
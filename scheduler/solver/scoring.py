@@ -0,0 +1,91 @@
+"""
+Timetable quality.
+
+Hard rules (clashes, caps, constraints) are never broken by the solver,
+so a solution is judged by how many lessons it left out and then by a
+weighted sum of soft rule breaks:
+
+* ``subject_repeats``  - a class gets the same subject twice on one day
+* ``subject_spread``   - a subject sits on fewer distinct days than it could
+* ``teacher_gaps``     - idle periods between a teacher's lessons in a day
+* ``teacher_overload`` - lessons above a teacher's even share for a day
+
+``optimize`` keeps the same terms per class/teacher so it can re-score
+only what a move touches.
+"""
+
+from collections import defaultdict
+
+WEIGHTS = {
+    "subject_repeats": 2,
+    "subject_spread": 2,
+    "teacher_gaps": 1,
+    "teacher_overload": 1,
+}
+
+
+def _day_positions(problem):
+    """Period index -> (day, position of the period inside its day)."""
+    seen = defaultdict(int)
+    positions = []
+    for day in problem.period_day:
+        positions.append((day, seen[day]))
+        seen[day] += 1
+    return positions
+
+
+def subject_terms(day_counts, n_days):
+    """(repeats, spread) for one class+subject, from its per-day counts."""
+    total = sum(day_counts)
+    used = sum(1 for n in day_counts if n)
+    repeats = total - used
+    return repeats, min(total, n_days) - used
+
+
+def teacher_gap(slots):
+    """Idle periods between the first and last busy position of a day."""
+    if not slots:
+        return 0
+    return max(slots) - min(slots) + 1 - len(slots)
+
+
+def teacher_overload(day_loads, n_days):
+    """Lessons above ceil(weekly load / days) on each day."""
+    target = -(-sum(day_loads) // n_days)
+    return sum(max(0, n - target) for n in day_loads)
+
+
+def soft_violations(problem, entries):
+    positions = _day_positions(problem)
+    days = problem.days
+    n_days = len(days)
+    subject_day = defaultdict(lambda: defaultdict(int))
+    teacher_day = defaultdict(lambda: defaultdict(list))
+
+    for c, p, s, t, r in entries:
+        day, pos = positions[p]
+        subject_day[(c, s)][day] += 1
+        teacher_day[t][day].append(pos)
+
+    totals = dict.fromkeys(WEIGHTS, 0)
+    for counts in subject_day.values():
+        repeats, spread = subject_terms(list(counts.values()), n_days)
+        totals["subject_repeats"] += repeats
+        totals["subject_spread"] += spread
+    for per_day in teacher_day.values():
+        totals["teacher_gaps"] += sum(teacher_gap(slots) for slots in per_day.values())
+        totals["teacher_overload"] += teacher_overload(
+            [len(per_day.get(d, ())) for d in days], n_days
+        )
+    return totals
+
+
+def penalty(problem, entries):
+    """Weighted soft-rule score of a timetable; lower is better."""
+    counts = soft_violations(problem, entries)
+    return sum(WEIGHTS[k] * v for k, v in counts.items())
+
+
+def quality(problem, solution):
+    """Sort key for solutions: lower is better."""
+    return (solution.total_unplaced, penalty(problem, solution.entries))
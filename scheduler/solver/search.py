@@ -0,0 +1,422 @@
+"""
+Constraint-satisfaction search over a ``Problem`` snapshot.
+
+Variables are the open (class, period) cells of the whole school. A
+value is a (subject, teacher) pair, or FREE while the class still has
+spare periods. Rooms are not part of the search: it only keeps enough
+rooms of every size free in each period (``SolverState`` tiers), and
+``rooms.assign_rooms`` hands them out afterwards.
+
+* MRV: the cell with the fewest options left is filled next.
+* Forward checking: after every placement the option counts of all
+  open cells are recomputed from the ``SolverState`` masks, and a cell
+  (or a subject of a class) that has run out of options fails at once.
+* Conflict-directed backjumping: a failure is explained by the
+  placements that caused it, and the search jumps straight back to the
+  most recent of those instead of the previous cell.
+
+If the node/time limit runs out, or the input has no full solution, the
+best partial timetable seen is completed greedily, so the caller always
+gets something to save.
+"""
+
+import random
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .rooms import assign_rooms
+from .state import FREE, SolverState
+
+SOLVED = "solved"
+LIMIT = "limit"
+INFEASIBLE = "infeasible"
+
+# value meaning "leave this period free"
+FREE_VALUE = (FREE, FREE)
+
+# seconds between progress(...) calls
+PROGRESS_EVERY = 0.5
+
+
+@dataclass
+class Solution:
+    # (class, period, subject, teacher, room) tuples, all in index space
+    entries: list = field(default_factory=list)
+    # class index -> lessons that could not be placed
+    unplaced: dict = field(default_factory=dict)
+    status: str = SOLVED
+    nodes: int = 0
+    backjumps: int = 0
+    elapsed: float = 0.0
+    seed: int = None
+    # (unplaced, soft penalty), filled in by multistart
+    quality: tuple = None
+    # (penalty before, penalty after, accepted moves), filled in by optimize
+    optimized: tuple = None
+    # seconds per solver phase: setup, search, repair (+ optimize)
+    phases: dict = field(default_factory=dict)
+    # per class index: seconds of search steps on its cells, placements
+    # tried, and failures (wiped-out cells / subjects) - bottleneck classes
+    class_seconds: list = field(default_factory=list)
+    class_nodes: list = field(default_factory=list)
+    class_failures: list = field(default_factory=list)
+
+    @property
+    def total_unplaced(self):
+        return sum(self.unplaced.values())
+
+
+def solve(problem, seed=None, time_limit=None, max_nodes=None, progress=None):
+    """
+    Solve ``problem``. ``time_limit`` (seconds) and ``max_nodes`` bound
+    the search; ``None`` means no limit. ``progress(placed, total, best)``
+    is called about every ``PROGRESS_EVERY`` seconds with the lessons
+    placed now, to place, and in the best partial timetable so far; an
+    exception it raises stops the search.
+    """
+    started = time.perf_counter()
+    search = _Search(problem, seed, time_limit, max_nodes, progress)
+    searching = time.perf_counter()
+    status = search.run()
+    repairing = time.perf_counter()
+    if status != SOLVED:
+        search.restore_best()
+        search.greedy_fill()
+
+    assigning = time.perf_counter()
+    solution = _solution_from_state(problem, search.state)
+    # Search "solved" sirf jo lessons usne liye - jinke liye koi qualified
+    # teacher hi nahi (ya room nahi mila) woh bhi failure hain
+    if solution.unplaced and status == SOLVED:
+        status = INFEASIBLE
+    solution.status = status
+    solution.nodes = search.nodes
+    solution.backjumps = search.backjumps
+    solution.elapsed = time.perf_counter() - started
+    solution.seed = seed
+    solution.phases = {
+        "setup": searching - started,
+        "search": repairing - searching,
+        "repair": assigning - repairing,
+        "rooms": started + solution.elapsed - assigning,
+    }
+    solution.class_seconds = search.class_seconds.tolist()
+    solution.class_nodes = search.class_nodes.tolist()
+    solution.class_failures = search.class_failures.tolist()
+    return solution
+
+
+def _solution_from_state(problem, state):
+    """Stage two: rooms for the lessons the search placed."""
+    # a lesson left without a room (only if the input was broken) counts as unplaced
+    entries, _ = assign_rooms(problem, state.entries())
+    solution = Solution(entries=entries)
+    placed = np.bincount([c for c, *_ in entries], minlength=problem.n_classes) if entries else np.zeros(problem.n_classes)
+    for c in range(problem.n_classes):
+        missing = problem.required_for_class(c) - int(placed[c])
+        if missing > 0:
+            solution.unplaced[c] = missing
+    return solution
+
+
+class _Search:
+
+    def __init__(self, problem, seed, time_limit, max_nodes, progress=None):
+        self.problem = problem
+        self.progress = progress
+        self.next_progress = 0.0
+        self.state = state = SolverState(problem)
+        self.rng = random.Random(seed)
+        self.deadline = (
+            time.perf_counter() + time_limit if time_limit is not None else None
+        )
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.backjumps = 0
+
+        C, P = problem.n_classes, problem.n_periods
+        self.class_seconds = np.zeros(C)
+        self.class_nodes = np.zeros(C, dtype=np.int64)
+        self.class_failures = np.zeros(C, dtype=np.int64)
+        # fixed lessons are already placed by SolverState, only the rest is searched
+        self.open_cells = np.tile(state.period_open, (C, 1)) & (state.class_subject == FREE)
+        self.depth_of = np.full((C, P), -1, dtype=np.int32)
+        self.is_free = np.zeros((C, P), dtype=bool)
+        self.qualified_f = state.qualified.astype(np.float32)
+        self.day_periods = [
+            np.flatnonzero(state.period_day == d) for d in range(len(problem.days))
+        ]
+        # MRV tie-breaking, different for every seed
+        self.noise = np.random.default_rng(seed).random((C, P)) * 0.5
+
+        # Lessons that can never be placed (no qualified teacher ever
+        # free, no room big enough) are dropped from the demand up front,
+        # otherwise they would only fail deep inside the search.
+        static_tp = (self.qualified_f.T @ (~state.teacher_blocked).astype(np.float32)) > 0
+        teachable = self.open_cells.astype(np.float32) @ static_tp.T.astype(np.float32)
+        teachable *= (state.class_tier >= 0)[:, None]
+        state.remaining = np.clip(state.remaining, 0, teachable).astype(np.int32)
+        self.demand = state.remaining.copy()
+        open_count = self.open_cells.sum(axis=1)
+        self.free_left = np.maximum(open_count - self.demand.sum(axis=1), 0)
+        # classes asking for fewer periods than the week has must get
+        # every one of them; the others just fill the week
+        self.exact = self.demand.sum(axis=1) <= open_count
+
+        self.stack = []   # [c, p, values, next value index]
+        self.conf = []    # conflict set (stack depths) for every stack entry
+        self.placed = 0
+        self.best_placed = -1
+        self.best_entries = []
+
+    # -------------------------------------------------
+    # Main loop
+    # -------------------------------------------------
+    def run(self):
+        step_started = time.perf_counter()
+        while True:
+            # the step just done is charged to the class of the cell it left on top
+            now = time.perf_counter()
+            if self.stack:
+                self.class_seconds[self.stack[-1][0]] += now - step_started
+            step_started = now
+
+            if self._out_of_budget():
+                self._remember_best()
+                return LIMIT
+            if self.progress is not None and now >= self.next_progress:
+                self.next_progress = now + PROGRESS_EVERY
+                self.progress(self.placed, int(self.demand.sum()), max(self.placed, self.best_placed))
+
+            self._refresh_domains()
+            failure = self._find_failure()
+            if failure is not None:
+                failed_class, explanation = failure
+                self.class_failures[failed_class] += 1
+                self._remember_best()
+                if not self._backjump(explanation):
+                    return INFEASIBLE
+                continue
+
+            if not self.unassigned.any():
+                return SOLVED
+
+            score = np.where(self.unassigned, self.options + self.noise, np.inf)
+            c, p = np.unravel_index(np.argmin(score), score.shape)
+            c, p = int(c), int(p)
+            self.conf.append(self._explain_cell(c, p))
+            self.stack.append([c, p, self._values(c, p), 0])
+            self._assign_next(len(self.stack) - 1)
+
+    def _out_of_budget(self):
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            return True
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+
+    # -------------------------------------------------
+    # Forward checking
+    # -------------------------------------------------
+    def _refresh_domains(self):
+        st = self.state
+        self.teacher_ok = st.teacher_available()
+        self.subject_tp = self.qualified_f.T @ self.teacher_ok.astype(np.float32)
+        self.room_ok = st.room_available()
+        self.unassigned = self.open_cells & (self.depth_of < 0)
+
+        subject_left = (st.remaining > 0).astype(np.float32)
+        lessons = np.where(self.room_ok, subject_left @ self.subject_tp, 0)
+        self.options = lessons + (self.free_left > 0)[:, None]
+
+        # cells still able to take each subject, per class
+        usable = (self.unassigned & self.room_ok).astype(np.float32)
+        self.slots_for = usable @ (self.subject_tp > 0).T.astype(np.float32)
+
+    def _find_failure(self):
+        """(class, explanation as a set of depths) of the first wipe-out, or None."""
+        dead = self.unassigned & (self.options == 0)
+        if dead.any():
+            c, p = np.argwhere(dead)[0]
+            return int(c), self._explain_cell(int(c), int(p))
+
+        short = (self.state.remaining > self.slots_for) & self.exact[:, None]
+        if short.any():
+            c, s = np.argwhere(short)[0]
+            return int(c), self._explain_subject(int(c), int(s))
+        return None
+
+    # -------------------------------------------------
+    # Values
+    # -------------------------------------------------
+    def _values(self, c, p):
+        st = self.state
+        values = []
+        if self.room_ok[c, p]:
+            remaining = st.remaining[c]
+            subjects = np.flatnonzero((remaining > 0) & (self.subject_tp[:, p] > 0))
+            # tightest subject first: most periods left per usable cell
+            urgency = remaining[subjects] / np.maximum(self.slots_for[c, subjects], 1)
+            jitter = [self.rng.random() for _ in subjects]
+            week_load = st.teacher_load.sum(axis=1)
+            for _, _, s in sorted(zip(-urgency, jitter, subjects)):
+                teachers = list(np.flatnonzero(self.teacher_ok[:, p] & st.qualified[:, s]))
+                self.rng.shuffle(teachers)
+                teachers.sort(key=lambda t: week_load[t])
+                values.extend((int(s), int(t)) for t in teachers)
+        if self.free_left[c] > 0:
+            values.append(FREE_VALUE)
+        return values
+
+    def _assign_next(self, k):
+        entry = self.stack[k]
+        c, p, values, index = entry
+        if index >= len(values):
+            return False
+        entry[3] = index + 1
+        s, t = values[index]
+        if (s, t) == FREE_VALUE:
+            self.is_free[c, p] = True
+            self.free_left[c] -= 1
+        else:
+            self.state.place(c, p, s, t)
+            self.placed += 1
+        self.depth_of[c, p] = k
+        self.nodes += 1
+        self.class_nodes[c] += 1
+        return True
+
+    def _unassign(self, k):
+        c, p = self.stack[k][:2]
+        if self.depth_of[c, p] < 0:
+            return
+        if self.is_free[c, p]:
+            self.is_free[c, p] = False
+            self.free_left[c] += 1
+        else:
+            self.state.remove(c, p)
+            self.placed -= 1
+        self.depth_of[c, p] = -1
+
+    # -------------------------------------------------
+    # Backjumping
+    # -------------------------------------------------
+    def _backjump(self, explanation):
+        """
+        Undo up to the most recent culprit and move it to its next value.
+        Returns False when the conflict set is empty (no solution) - also
+        when the failure shows up before anything was placed (root failure).
+        """
+        if not self.stack:
+            return False
+        k = len(self.stack) - 1
+        self.conf[k] |= explanation - {k}
+        while True:
+            self._unassign(k)
+            if self._assign_next(k):
+                return True
+
+            conflicts = self.conf[k]
+            if not conflicts:
+                return False
+            h = max(conflicts)
+            self.conf[h] |= conflicts - {h}
+            for j in range(k - 1, h, -1):
+                self._unassign(j)
+            del self.stack[h + 1:]
+            del self.conf[h + 1:]
+            self.backjumps += 1
+            k = h
+
+    # -------------------------------------------------
+    # Explanations: which placements removed these options
+    # -------------------------------------------------
+    def _depths(self, classes, periods):
+        return set(self.depth_of[classes, periods].tolist())
+
+    def _room_reason(self, c, p):
+        holders = self.state.room_blockers(c, p)
+        return self._depths(holders, np.full(len(holders), p))
+
+    def _teacher_reason(self, t, p):
+        st = self.state
+        holder = st.teacher_at[t, p]
+        if holder != FREE:
+            return {int(self.depth_of[holder, p])}
+        # at the daily cap: every lesson of the day is to blame
+        periods = self.day_periods[st.period_day[p]]
+        holders = st.teacher_at[t, periods]
+        used = holders != FREE
+        return self._depths(holders[used], periods[used])
+
+    def _lesson_reason(self, c, p, subjects):
+        """Why no (subject, teacher) pair out of ``subjects`` fits (c, p)."""
+        st = self.state
+        if not self.room_ok[c, p]:
+            return self._room_reason(c, p)
+
+        reasons = set()
+        remaining = st.remaining[c]
+        for s in subjects[(remaining[subjects] == 0) & (self.demand[c, subjects] > 0)]:
+            reasons |= self._depths(c, np.flatnonzero(st.class_subject[c] == s))
+
+        live = subjects[remaining[subjects] > 0]
+        busy = (
+            st.qualified[:, live].any(axis=1)
+            & ~st.teacher_blocked[:, p]
+            & ~self.teacher_ok[:, p]
+        )
+        for t in np.flatnonzero(busy):
+            reasons |= self._teacher_reason(t, p)
+        return reasons
+
+    def _explain_cell(self, c, p):
+        """Everything that removed options from cell (c, p)."""
+        reasons = set()
+        if self.free_left[c] <= 0:
+            reasons |= self._depths(c, np.flatnonzero(self.is_free[c]))
+        reasons |= self._lesson_reason(c, p, np.arange(self.problem.n_subjects))
+        reasons.discard(-1)
+        return reasons
+
+    def _explain_subject(self, c, s):
+        """Class ``c`` has more ``s`` periods left than cells that can take it."""
+        assigned = np.flatnonzero(self.depth_of[c] >= 0)
+        reasons = self._depths(c, assigned)
+        subjects = np.array([s])
+        for p in np.flatnonzero(self.unassigned[c]):
+            if not (self.room_ok[c, p] and self.subject_tp[s, p] > 0):
+                reasons |= self._lesson_reason(c, p, subjects)
+        reasons.discard(-1)
+        return reasons
+
+    # -------------------------------------------------
+    # Best partial timetable + greedy completion
+    # -------------------------------------------------
+    def _remember_best(self):
+        if self.placed > self.best_placed:
+            self.best_placed = self.placed
+            self.best_entries = self.state.entries()
+
+    def restore_best(self):
+        for k in range(len(self.stack) - 1, -1, -1):
+            self._unassign(k)
+        self.stack, self.conf = [], []
+        for c, p, s, t, r in self.best_entries:
+            if self.state.class_subject[c, p] == FREE:  # fixed ones are still there
+                self.state.place(c, p, s, t, r)
+
+    def greedy_fill(self):
+        st = self.state
+        for c in range(self.problem.n_classes):
+            for p in np.flatnonzero(st.period_open & (st.class_subject[c] == FREE)):
+                remaining = st.remaining[c]
+                if not remaining.any():
+                    break
+                for s in np.argsort(-remaining, kind="stable"):
+                    if remaining[s] <= 0:
+                        break
+                    teachers = np.flatnonzero(st.teacher_mask(p, s))
+                    if len(teachers) and st.room_free(c, p):
+                        st.place(c, p, s, self.rng.choice(teachers))
+                        break
@@ -0,0 +1,176 @@
+"""
+Dense NumPy occupancy arrays for the solver.
+
+Who is busy when is kept as plain integer matrices:
+
+* ``teacher_at[t, p]`` -> class taught by teacher ``t`` in period ``p``
+* ``class_subject[c, p]`` / ``class_teacher`` / ``class_room`` -> the cell
+* ``teacher_load[t, d]`` -> periods teacher ``t`` already has on day ``d``
+* ``tier_count[p, j]`` -> lessons in period ``p`` that need a room of tier ``j``
+
+``-1`` means free. ``place`` and ``remove`` touch a fixed number of
+cells, so undoing a placement during backtracking is O(1).
+
+Rooms are not picked during the search (see ``rooms.py``). A class fits
+every room at least as big as it, so the rooms a class can use are "the
+k biggest" for some k - its tier. Lessons of a period can all get a
+room exactly when, for every tier, no more lessons need that tier or a
+smaller set of rooms than the tier has rooms; ``tier_count`` keeps that
+check O(tiers). Lessons placed with a room (fixed ones) count at the
+tier of that room.
+"""
+
+import numpy as np
+
+FREE = -1
+
+
+class SolverState:
+
+    def __init__(self, problem):
+        self.problem = problem
+        C, S, T = problem.n_classes, problem.n_subjects, problem.n_teachers
+        P, R = problem.n_periods, problem.n_rooms
+
+        days = problem.days
+        day_index = {d: i for i, d in enumerate(days)}
+
+        # ---- static data (never changes during a solve) ----
+        self.period_day = np.array(
+            [day_index[d] for d in problem.period_day], dtype=np.intp
+        )
+        self.period_open = np.ones(P, dtype=bool)
+        self.period_open[list(problem.blocked_periods)] = False
+
+        self.qualified = np.zeros((T, S), dtype=bool)
+        for t, s in problem.qualified:
+            self.qualified[t, s] = True
+
+        self.teacher_blocked = np.zeros((T, P), dtype=bool)
+        for t, p in problem.teacher_blocked:
+            self.teacher_blocked[t, p] = True
+
+        self.max_per_day = np.array(problem.teacher_max_per_day, dtype=np.int32)
+
+        strength = np.array(problem.class_strength, dtype=np.int32)
+        capacity = np.array(problem.room_capacity, dtype=np.int32)
+        self.room_capacity = capacity
+        self.room_fits = capacity[None, :] >= strength[:, None]  # [C, R]
+
+        # tier = how many rooms the lesson may use (ascending); -1: none fits
+        class_fits = self.room_fits.sum(axis=1)
+        room_fits = (capacity[None, :] >= capacity[:, None]).sum(axis=1)
+        self.tier_rooms = np.unique(np.concatenate([class_fits[class_fits > 0], room_fits]))
+        self.class_tier = np.where(
+            class_fits > 0, np.searchsorted(self.tier_rooms, class_fits), FREE
+        )
+        self.room_tier = np.searchsorted(self.tier_rooms, room_fits)
+
+        # ---- dynamic data ----
+        self.teacher_at = np.full((T, P), FREE, dtype=np.int32)
+        self.tier_count = np.zeros((P, len(self.tier_rooms)), dtype=np.int32)
+        self.cell_tier = np.full((C, P), FREE, dtype=np.int32)
+        self.class_subject = np.full((C, P), FREE, dtype=np.int32)
+        self.class_teacher = np.full((C, P), FREE, dtype=np.int32)
+        self.class_room = np.full((C, P), FREE, dtype=np.int32)
+        self.teacher_load = np.zeros((T, len(days)), dtype=np.int32)
+        self.remaining = np.tile(
+            np.array(problem.subject_demand, dtype=np.int32), (C, 1)
+        )
+
+        for c, p, s, t, r in problem.fixed:
+            self.place(c, p, s, t, r)
+
+    # -------------------------------------------------
+    # Candidate masks
+    # -------------------------------------------------
+    def teacher_available(self):
+        """[T, P] mask: teacher free, not blocked and under the daily cap."""
+        under_cap = self.teacher_load[:, self.period_day] < self.max_per_day[:, None]
+        return (self.teacher_at == FREE) & ~self.teacher_blocked & under_cap
+
+    def _room_slack(self, periods=slice(None)):
+        """[P, tiers]: rooms of each tier (and smaller) still unclaimed."""
+        return self.tier_rooms - np.cumsum(self.tier_count[periods], axis=-1)
+
+    def room_available(self):
+        """[C, P] mask: one more lesson of the class still leaves a room for every lesson."""
+        if not len(self.tier_rooms):
+            return np.zeros(self.class_subject.shape, dtype=bool)
+        slack = self._room_slack()
+        # a lesson of tier k also takes a room from every bigger tier
+        room_left = np.minimum.accumulate(slack[:, ::-1], axis=1)[:, ::-1]
+        return (room_left[:, np.maximum(self.class_tier, 0)] > 0).T & (self.class_tier >= 0)[:, None]
+
+    def room_free(self, c, p):
+        """``room_available`` for one cell."""
+        k = self.class_tier[c]
+        return k >= 0 and self._room_slack(p)[k:].min() > 0
+
+    def room_blockers(self, c, p):
+        """
+        Classes in period ``p`` holding the rooms class ``c`` would need:
+        every lesson counted at the first full tier from ``c``'s up, or below.
+        """
+        k = self.class_tier[c]
+        if k < 0:
+            return np.array([], dtype=np.intp)
+        full = np.flatnonzero(self._room_slack(p)[k:] <= 0)
+        if not len(full):
+            return np.array([], dtype=np.intp)
+        tiers = self.cell_tier[:, p]
+        return np.flatnonzero((tiers != FREE) & (tiers <= k + full[0]))
+
+    def teacher_mask(self, p, s):
+        """
+        Teachers that can take subject ``s`` in period ``p``: free,
+        qualified, not blocked and still under their daily cap.
+        """
+        return (
+            (self.teacher_at[:, p] == FREE)
+            & self.qualified[:, s]
+            & ~self.teacher_blocked[:, p]
+            & (self.teacher_load[:, self.period_day[p]] < self.max_per_day)
+        )
+
+    # -------------------------------------------------
+    # Placement / undo
+    # -------------------------------------------------
+    def place(self, c, p, s, t, r=FREE):
+        """``r``: the lesson's room if it has one already (fixed), else FREE."""
+        tier = self.room_tier[r] if r != FREE else self.class_tier[c]
+        self.teacher_at[t, p] = c
+        self.tier_count[p, tier] += 1
+        self.cell_tier[c, p] = tier
+        self.class_subject[c, p] = s
+        self.class_teacher[c, p] = t
+        self.class_room[c, p] = r
+        self.teacher_load[t, self.period_day[p]] += 1
+        self.remaining[c, s] -= 1
+
+    def remove(self, c, p):
+        s = self.class_subject[c, p]
+        t = self.class_teacher[c, p]
+        r = self.class_room[c, p]
+        self.teacher_at[t, p] = FREE
+        self.tier_count[p, self.cell_tier[c, p]] -= 1
+        self.cell_tier[c, p] = FREE
+        self.class_subject[c, p] = FREE
+        self.class_teacher[c, p] = FREE
+        self.class_room[c, p] = FREE
+        self.teacher_load[t, self.period_day[p]] -= 1
+        self.remaining[c, s] += 1
+        return s, t, r
+
+    def entries(self):
+        """All placed cells as (class, period, subject, teacher, room or FREE)."""
+        cs, ps = np.nonzero(self.class_subject != FREE)
+        return [
+            (
+                int(c), int(p),
+                int(self.class_subject[c, p]),
+                int(self.class_teacher[c, p]),
+                int(self.class_room[c, p]),
+            )
+            for c, p in zip(cs, ps)
+        ]
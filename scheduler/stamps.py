@@ -0,0 +1,141 @@
+"""
+Version stamps for rendered timetables.
+
+Every class, teacher and room has a ``TimetableStamp`` (version + time) that
+signals bump whenever something shown on its timetable changes, plus one
+"all" stamp for changes that touch every page (periods, a full
+regeneration). Views use the pair for ETag / Last-Modified and as the
+cache key of the rendered grid, so an unchanged timetable is never
+rebuilt - timetables change about once a week, pages are hit all day.
+"""
+
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db.models import F, Max, Q, Sum
+from django.utils import timezone
+
+from .models import TimetableStamp
+
+Stamp = namedtuple("Stamp", "key last_modified")
+
+_pending = threading.local()
+
+
+def bump(classes=(), teachers=(), rooms=(), everything=False):
+    """Mark these class / teacher / room timetables (or all of them) as changed."""
+    batch = getattr(_pending, "batch", None)
+    if batch is not None:
+        batch[TimetableStamp.CLASS].update(classes)
+        batch[TimetableStamp.TEACHER].update(teachers)
+        batch[TimetableStamp.ROOM].update(rooms)
+        batch[TimetableStamp.ALL] |= everything
+        return
+
+    if everything:
+        _bump(TimetableStamp.ALL, {0})
+        return
+    _bump(TimetableStamp.CLASS, classes)
+    _bump(TimetableStamp.TEACHER, teachers)
+    _bump(TimetableStamp.ROOM, rooms)
+
+
+def _bump(scope, pks):
+    pks = {pk for pk in pks if pk is not None}
+    if not pks:
+        return
+    now = timezone.now()
+    TimetableStamp.objects.bulk_create(
+        [TimetableStamp(scope=scope, object_pk=pk, updated_at=now) for pk in pks],
+        ignore_conflicts=True,
+    )
+    TimetableStamp.objects.filter(scope=scope, object_pk__in=pks).update(
+        version=F("version") + 1, updated_at=now
+    )
+
+
+@contextmanager
+def deferred():
+    """
+    Collect bumps inside the block and write them once at the end - for
+    bulk writes, where per-row signals would otherwise cost 2 queries each.
+    """
+    if getattr(_pending, "batch", None) is not None:
+        yield
+        return
+    _pending.batch = batch = {
+        TimetableStamp.CLASS: set(),
+        TimetableStamp.TEACHER: set(),
+        TimetableStamp.ROOM: set(),
+        TimetableStamp.ALL: False,
+    }
+    try:
+        yield
+    finally:
+        _pending.batch = None
+    bump(
+        classes=batch[TimetableStamp.CLASS],
+        teachers=batch[TimetableStamp.TEACHER],
+        rooms=batch[TimetableStamp.ROOM],
+        everything=batch[TimetableStamp.ALL],
+    )
+
+
+def _stamp(scope, pk):
+    """Current stamp of one timetable, in one query."""
+    versions = {}
+    last_modified = None
+    rows = TimetableStamp.objects.filter(
+        Q(scope=scope, object_pk=pk) | Q(scope=TimetableStamp.ALL)
+    ).values_list("scope", "version", "updated_at")
+    for row_scope, version, updated_at in rows:
+        versions[row_scope] = version
+        last_modified = max(last_modified or updated_at, updated_at)
+    key = f"{scope}{pk}.{versions.get(scope, 0)}.{versions.get(TimetableStamp.ALL, 0)}"
+    return Stamp(key, last_modified)
+
+
+def class_stamp(class_id):
+    return _stamp(TimetableStamp.CLASS, class_id)
+
+
+def teacher_stamp(teacher_id):
+    return _stamp(TimetableStamp.TEACHER, teacher_id)
+
+
+def room_stamp(room_id):
+    return _stamp(TimetableStamp.ROOM, room_id)
+
+
+def class_stamps(class_ids):
+    """``class_stamp`` for many classes at once, in one query."""
+    rows = TimetableStamp.objects.filter(
+        Q(scope=TimetableStamp.CLASS, object_pk__in=class_ids) | Q(scope=TimetableStamp.ALL)
+    ).values_list("scope", "object_pk", "version", "updated_at")
+    own = {}
+    everything = (0, None)
+    for scope, pk, version, updated_at in rows:
+        if scope == TimetableStamp.ALL:
+            everything = (version, updated_at)
+        else:
+            own[pk] = (version, updated_at)
+
+    result = {}
+    for pk in class_ids:
+        version, updated_at = own.get(pk, (0, None))
+        times = [t for t in (updated_at, everything[1]) if t]
+        result[pk] = Stamp(
+            f"{TimetableStamp.CLASS}{pk}.{version}.{everything[0]}",
+            max(times) if times else None,
+        )
+    return result
+
+
+def school_stamp():
+    """
+    Stamp of the whole school: versions only ever grow, so their sum moves
+    on every bump anywhere.
+    """
+    agg = TimetableStamp.objects.aggregate(total=Sum("version"), last=Max("updated_at"))
+    return Stamp(f"school.{agg['total'] or 0}", agg["last"])
@@ -0,0 +1,101 @@
+"""
+Synthetic schools for benchmarks and experiments.
+
+``SchoolSize`` describes a school (how many classes, teachers, ...; how
+many subjects each teacher may teach; how many teacher periods are
+blocked) and ``build_school`` creates it through the bulk importer.
+The same seed always gives the same school.
+"""
+
+import random
+from dataclasses import dataclass
+
+from .importer import SchoolImport
+
+
+@dataclass(frozen=True)
+class SchoolSize:
+    classes: int = 10
+    teachers: int = 18
+    subjects: int = 8
+    rooms: int = 12
+    days: int = 6
+    periods_per_day: int = 6
+    # share of (teacher, period) pairs blocked by a teacher Constraint
+    constraint_density: float = 0.05
+    # subjects each teacher is qualified for (lower = sparser mapping)
+    subjects_per_teacher: int = 2
+    seed: int = 0
+
+    @property
+    def periods(self):
+        return self.days * self.periods_per_day
+
+
+PRESETS = {
+    "small": SchoolSize(),
+    "medium": SchoolSize(classes=40, teachers=60, subjects=10, rooms=45, periods_per_day=8),
+    "large": SchoolSize(classes=120, teachers=180, subjects=12, rooms=130, periods_per_day=8),
+}
+
+
+def synthetic_rows(size):
+    """Importer rows (see ``importer.read_source``) for a school of ``size``."""
+    rng = random.Random(size.seed)
+    rows = {}
+
+    def add(kind, items):
+        rows[kind] = [(f"synthetic:{kind}[{i}]", item) for i, item in enumerate(items)]
+
+    # Subjects share the week: har class ka har period bhara ho
+    base, extra = divmod(size.periods, size.subjects)
+    subjects = [f"Subject {i + 1}" for i in range(size.subjects)]
+    add("subjects", [
+        {"name": name, "code": f"S{i + 1}", "default_periods_per_week": base + (i < extra),
+         "color_code": f"#{rng.randrange(0x1000000):06X}"}
+        for i, name in enumerate(subjects)
+    ])
+    add("rooms", [
+        {"name": f"Room {i + 1}", "capacity": rng.choice([30, 35, 40, 45])}
+        for i in range(size.rooms)
+    ])
+    add("classes", [
+        {"name": f"Class {i + 1}", "strength": rng.choice([25, 30, 35, 40])}
+        for i in range(size.classes)
+    ])
+    add("periods", [
+        {"day": day, "order": order,
+         "start_time": f"{7 + order:02d}:00", "end_time": f"{7 + order:02d}:45"}
+        for day in range(1, size.days + 1)
+        for order in range(1, size.periods_per_day + 1)
+    ])
+
+    codes = [f"T{i + 1:04d}" for i in range(size.teachers)]
+    add("teachers", [
+        {"code": code, "username": f"bench_{code.lower()}", "first_name": "Teacher",
+         "last_name": code, "max_periods_per_day": max(1, size.periods_per_day - 2)}
+        for code in codes
+    ])
+
+    per_teacher = min(size.subjects_per_teacher, size.subjects)
+    pairs = set()
+    for code in codes:
+        pairs.update((code, s) for s in rng.sample(subjects, per_teacher))
+    # har subject ka kam se kam ek teacher
+    for i, subject in enumerate(subjects):
+        pairs.add((codes[i % len(codes)], subject))
+    add("teacher_subjects", [{"teacher": t, "subject": s} for t, s in sorted(pairs)])
+
+    add("constraints", [
+        {"teacher": code, "day": day, "order": order, "blocked": "yes"}
+        for code in codes
+        for day in range(1, size.days + 1)
+        for order in range(1, size.periods_per_day + 1)
+        if rng.random() < size.constraint_density
+    ])
+    return rows
+
+
+def build_school(size):
+    """Create the school in the current database; returns the import summary."""
+    return SchoolImport(synthetic_rows(size)).run()
@@ -1,3 +1,1431 @@
-from django.test import TestCase
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from collections import Counter
+from dataclasses import replace
+from datetime import timedelta
+from itertools import permutations
+from pathlib import Path
+from io import StringIO
+from unittest import mock
+from xml.etree import ElementTree
 
-# Create your tests here.
+import numpy as np
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import diffs, grids, jobs, pdf, pdf_cache, snapshots, versions
+from .admin import TimetableEntryAdmin, TimetableEntryInline
+from .exports import EXPORT_HEADER, csv_chunks, export_rows, pdf_documents, xlsx_chunks
+from .grids import DAY_LABELS
+from .importer import ImportFailed, SchoolImport, read_source
+from .models import (
+    Constraint,
+    GenerationJob,
+    Period,
+    Room,
+    ScheduleChange,
+    SchoolClass,
+    Subject,
+    Teacher,
+    TeacherSubject,
+    TimetableEntry,
+    TimetableVersion,
+    active_version,
+)
+from .snapshots import FREE, Snapshot
+from .stamps import class_stamp, school_stamp
+from .solver import Problem, solve
+from .solver.db import last_change_id, load_changes, load_problem
+from .solver.feasibility import DAY, PERIOD, ROOMS, TEACHERS, Bottleneck, check_feasibility, describe
+from .solver.optimize import _Optimizer, optimize
+from .solver.rooms import assign_rooms, home_rooms, min_cost_assignment
+from .solver.scoring import penalty
+from .solver.search import INFEASIBLE, SOLVED
+from .solver.state import FREE as FREE_CELL
+from .solver.incremental import ChangeSet, cells_to_free, invalid_cells, with_fixed
+from .validation import validate_entries
+from .week_editor import WeekEdit
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def make_school():
+    """Chhota school: 2 classes, 2 subjects, 2 teachers, 2 rooms, 2 days x 2 periods."""
+    school = {
+        "classes": [SchoolClass.objects.create(name=name) for name in ("10-A", "10-B")],
+        "subjects": [Subject.objects.create(name=name, code=name[:1]) for name in ("Maths", "Science")],
+        "rooms": [Room.objects.create(name=name) for name in ("R1", "R2")],
+        "periods": [Period.objects.create(day=day, order=order) for day in (1, 2) for order in (1, 2)],
+        "teachers": [],
+    }
+    for code, first in (("T1", "Asha"), ("T2", "Ravi")):
+        user = User.objects.create_user(code.lower(), first_name=first)
+        school["teachers"].append(Teacher.objects.create(user=user, code=code))
+    for teacher in school["teachers"]:
+        for subject in school["subjects"]:
+            TeacherSubject.objects.create(teacher=teacher, subject=subject)
+    return school
+
+
+def use_temp_snapshot_dir(test):
+    """Test ke snapshots ek temp dir me, test ke baad delete."""
+    snapshot_dir = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, snapshot_dir, ignore_errors=True)
+    settings_override = override_settings(TIMETABLE_SNAPSHOT_DIR=snapshot_dir)
+    settings_override.enable()
+    test.addCleanup(settings_override.disable)
+    return snapshot_dir
+
+
+# -------------------------------------------------
+# Solver: hard rules
+# -------------------------------------------------
+def make_problem(**overrides):
+    # 3 classes x 8 periods (2 days x 4); teacher t teaches subjects t and t+1
+    fields = dict(
+        class_ids=(1, 2, 3),
+        class_names=("A", "B", "C"),
+        class_strength=(30, 40, 30),
+        subject_ids=(1, 2, 3, 4),
+        subject_demand=(2, 2, 2, 2),
+        teacher_ids=(1, 2, 3, 4, 5, 6),
+        teacher_max_per_day=(3, 3, 3, 3, 3, 3),
+        period_ids=tuple(range(1, 9)),
+        period_day=(1, 1, 1, 1, 2, 2, 2, 2),
+        room_ids=(1, 2, 3),
+        room_capacity=(30, 45, 35),
+        qualified=frozenset((t, (t + k) % 4) for t in range(6) for k in (0, 1)),
+        blocked_periods=frozenset({3}),
+        teacher_blocked=frozenset({(0, 0), (1, 4)}),
+    )
+    fields.update(overrides)
+    return Problem(**fields)
+
+
+class SolverRulesTests(SimpleTestCase):
+
+    def assert_hard_rules(self, problem, solution):
+        entries = solution.entries
+        for what, key in (("class", lambda e: (e[0], e[1])),
+                          ("teacher", lambda e: (e[3], e[1])),
+                          ("room", lambda e: (e[4], e[1]))):
+            repeated = [k for k, n in Counter(map(key, entries)).items() if n > 1]
+            self.assertEqual(repeated, [], f"{what} double booked")
+
+        per_day = Counter((t, problem.period_day[p]) for _, p, _, t, _ in entries)
+        for (t, _), n in per_day.items():
+            self.assertLessEqual(n, problem.teacher_max_per_day[t])
+        for c, p, s, t, r in entries:
+            self.assertIn((t, s), problem.qualified)
+            self.assertNotIn(p, problem.blocked_periods)
+            self.assertNotIn((t, p), problem.teacher_blocked)
+            self.assertGreaterEqual(problem.room_capacity[r], problem.class_strength[c])
+
+    def test_solution_keeps_hard_rules(self):
+        problem = make_problem()
+        for seed in (1, 2, 3):
+            solution = solve(problem, seed=seed)
+            self.assertEqual(solution.status, SOLVED)
+            self.assertEqual(solution.unplaced, {})
+            self.assertEqual(len(solution.entries), 3 * problem.required_for_class(0))
+            self.assert_hard_rules(problem, solution)
+
+    def test_unqualified_subject_is_not_reported_as_solved(self):
+        # Subject 3 (index) ko koi nahi padha sakta
+        qualified = frozenset(pair for pair in make_problem().qualified if pair[1] != 3)
+        problem = make_problem(qualified=qualified)
+        solution = solve(problem, seed=1)
+        self.assertEqual(solution.status, INFEASIBLE)
+        self.assertTrue(solution.unplaced)
+        self.assert_hard_rules(problem, solution)
+
+    def test_failure_before_the_first_placement_is_infeasible(self):
+        # Dono teachers period 2 me blocked: pehle hi step pe subject short
+        problem = Problem(
+            class_ids=(1,), class_names=("A",), class_strength=(30,),
+            subject_ids=(1, 2), subject_demand=(1, 1),
+            teacher_ids=(1, 2), teacher_max_per_day=(6, 6),
+            period_ids=(1, 2), period_day=(1, 1),
+            room_ids=(1,), room_capacity=(40,),
+            qualified=frozenset({(0, 0), (1, 1)}),
+            teacher_blocked=frozenset({(0, 1), (1, 1)}),
+        )
+        solution = solve(problem, seed=1)
+        self.assertEqual(solution.status, INFEASIBLE)
+        self.assertEqual(solution.unplaced, {0: 1})
+        self.assertEqual(len(solution.entries), 1)
+        self.assert_hard_rules(problem, solution)
+
+    def test_optimizer_keeps_hard_rules_and_never_gets_worse(self):
+        problem = make_problem()
+        solution = solve(problem, seed=1)
+        better = optimize(problem, solution, time_limit=0.2, seed=1)
+        before, after, _ = better.optimized
+        self.assertEqual(before, penalty(problem, solution.entries))
+        self.assertEqual(after, penalty(problem, better.entries))
+        self.assertLessEqual(after, before)
+        self.assert_hard_rules(problem, better)
+        # Har class ko har subject utni hi baar
+        self.assertEqual(
+            Counter((c, s) for c, _, s, _, _ in better.entries),
+            Counter((c, s) for c, _, s, _, _ in solution.entries),
+        )
+
+    def test_optimizer_delta_score_matches_a_full_rescore(self):
+        problem = make_problem()
+        opt = _Optimizer(problem, solve(problem, seed=2), seed=3)
+        self.assertGreater(opt.run(0.1, 2.0, 0.05), 0)
+        st = opt.state
+        current = [
+            (int(c), int(p), int(st.class_subject[c, p]), int(st.class_teacher[c, p]), 0)
+            for c, p in zip(*np.nonzero(st.class_subject != FREE_CELL))
+        ]
+        self.assertEqual(opt.score, penalty(problem, current))
+
+    def test_optimizer_does_not_move_fixed_lessons(self):
+        problem = make_problem()
+        fixed = tuple(solve(problem, seed=4).entries[:5])
+        problem = replace(problem, fixed=fixed)
+        better = optimize(problem, solve(problem, seed=5), time_limit=0.2, seed=5)
+        lessons = {entry[:4] for entry in better.entries}
+        for entry in fixed:
+            self.assertIn(entry[:4], lessons)
+
+
+# -------------------------------------------------
+# Solver: rooms (stage two)
+# -------------------------------------------------
+class RoomAssignmentTests(SimpleTestCase):
+
+    def setUp(self):
+        # A 30, B 40, C 34 | R1 30, R2 45, R3 35, R4 50 -> homes R1, R2, R3
+        self.problem = make_problem(
+            class_strength=(30, 40, 34), room_ids=(1, 2, 3, 4), room_capacity=(30, 45, 35, 50)
+        )
+
+    def test_hungarian_matches_brute_force(self):
+        rng = np.random.default_rng(7)
+        for rows, columns in ((3, 3), (3, 5), (5, 6)):
+            cost = rng.integers(0, 20, size=(rows, columns)).astype(float)
+            picked = min_cost_assignment(cost)
+            self.assertEqual(len(set(picked.tolist())), rows)
+            best = min(
+                sum(cost[i, j] for i, j in enumerate(perm))
+                for perm in permutations(range(columns), rows)
+            )
+            self.assertEqual(cost[np.arange(rows), picked].sum(), best)
+
+    def test_home_rooms_are_the_tightest_fit_overall(self):
+        self.assertEqual(home_rooms(self.problem).tolist(), [0, 1, 2])
+        # 4 classes, 3 rooms: one class has no home
+        crowded = make_problem(
+            class_ids=(1, 2, 3, 4), class_names=tuple("ABCD"), class_strength=(30, 40, 30, 30)
+        )
+        homes = home_rooms(crowded).tolist()
+        self.assertEqual(homes.count(FREE_CELL), 1)
+        self.assertEqual(homes[1], 1)   # B (40) fits only R2
+
+    def test_classes_keep_home_rooms_else_tightest_free_room(self):
+        entries = [
+            (0, 0, 0, 0, FREE_CELL), (1, 0, 1, 1, FREE_CELL), (2, 0, 2, 2, FREE_CELL),
+            (0, 1, 0, 0, 2), (2, 1, 2, 2, FREE_CELL),   # A fixed in R3: C -> R2, not R4
+            (0, 2, 0, 0, 2), (1, 2, 1, 1, FREE_CELL), (2, 2, 2, 2, FREE_CELL),   # B keeps R2, C -> R4
+        ]
+        placed, dropped = assign_rooms(self.problem, entries)
+        self.assertEqual(dropped, [])
+        rooms = {(c, p): r for c, p, _, _, r in placed}
+        self.assertEqual(rooms, {
+            (0, 0): 0, (1, 0): 1, (2, 0): 2,
+            (0, 1): 2, (2, 1): 1,
+            (0, 2): 2, (1, 2): 1, (2, 2): 3,
+        })
+
+    def test_lesson_without_a_fitting_room_is_dropped(self):
+        # A in R2, C in R4 (fixed): only R1 / R3 left, both too small for B
+        entries = [(0, 0, 0, 0, 1), (2, 0, 2, 2, 3), (1, 0, 1, 1, FREE_CELL)]
+        placed, dropped = assign_rooms(self.problem, entries)
+        self.assertEqual(dropped, [(1, 0, 1, 1, FREE_CELL)])
+        self.assertEqual(sorted(placed), [(0, 0, 0, 0, 1), (2, 0, 2, 2, 3)])
+
+
+# -------------------------------------------------
+# Feasibility pre-check
+# -------------------------------------------------
+NAMES = {
+    "subject": {0: "Maths", 1: "Science", 2: "English", 3: "Hindi"},
+    "teacher": {i: f"T{i + 1}" for i in range(6)},
+    "room": {0: "R1", 1: "R2", 2: "R3"},
+    "period": {i: f"P{i + 1}" for i in range(8)},
+    "day": {1: "Monday", 2: "Tuesday"},
+}
+
+
+class FeasibilityTests(SimpleTestCase):
+
+    def test_default_school_passes(self):
+        self.assertEqual(check_feasibility(make_problem()), [])
+
+    def test_subject_without_enough_teacher_hours(self):
+        # Maths (4 a week per class) sirf T3 padhata hai: 2 days x 3 = 6 periods
+        qualified = frozenset({(2, 0)} | {(t, s) for t in (0, 1, 3, 4, 5) for s in (1, 2, 3)})
+        found = check_feasibility(make_problem(subject_demand=(4, 1, 1, 1), qualified=qualified))
+        self.assertEqual(found, [Bottleneck(TEACHERS, 21, 15, subjects=(0,), teachers=(2,))])
+
+    def test_class_without_a_big_enough_room(self):
+        found = check_feasibility(make_problem(room_capacity=(30, 35, 35)))
+        self.assertEqual(found, [Bottleneck(ROOMS, 7, 0, classes=(1,))])
+
+    def test_days_short_of_teachers_worst_first(self):
+        found = check_feasibility(make_problem(teacher_max_per_day=(1,) * 6))
+        self.assertEqual([(b.check, b.day, b.needed, b.available) for b in found], [
+            (TEACHERS, None, 21, 12),
+            (DAY, 2, 12, 6),
+            (DAY, 1, 9, 6),
+        ])
+        self.assertEqual(found[1].teachers, tuple(range(6)))
+
+    def test_period_with_too_few_free_teachers(self):
+        blocked = frozenset((t, 0) for t in range(4))   # P1 me sirf T5, T6
+        found = check_feasibility(make_problem(teacher_blocked=blocked))
+        self.assertEqual(found, [Bottleneck(PERIOD, 3, 2, classes=(0, 1, 2), periods=(0,))])
+
+    def test_describe_counts_read_naturally(self):
+        one = make_problem()   # 1 blocked period
+        text = describe(Bottleneck(TEACHERS, needed=5, available=3, subjects=(0,), teachers=(2,)), NAMES, one)
+        self.assertIn("the only teacher qualified for Maths (T3)", text)
+        self.assertIn("(1 period is blocked for everybody)", text)
+        self.assertIn("at most 3 of the school's 5 lessons", text)
+        self.assertIn(
+            "1 lesson a week",
+            describe(Bottleneck(TEACHERS, needed=1, available=0, subjects=(3,)), NAMES, one),
+        )
+        self.assertIn(
+            "A (strength 30+) needs 4 room-periods a week, the only room big enough (R2) has 3",
+            describe(Bottleneck(ROOMS, needed=4, available=3, classes=(0,), rooms=(1,)), NAMES, one),
+        )
+        self.assertIn(
+            "1 class has no free period to spare, only 1 teacher is available then.",
+            describe(Bottleneck(PERIOD, needed=1, available=1, periods=(0,)), NAMES, one),
+        )
+
+        many = make_problem(blocked_periods=frozenset({3, 7}))
+        text = describe(Bottleneck(DAY, needed=9, available=7, day=1, teachers=(0, 1)), NAMES, many)
+        self.assertIn("Monday: classes need at least 9 lessons", text)
+        self.assertIn("2 teachers cannot work the whole day", text)
+        self.assertIn("(2 periods are blocked for everybody)", text)
+        self.assertIn(
+            "2 classes have no free period to spare, only 0 teachers are available then.",
+            describe(Bottleneck(PERIOD, needed=2, available=0, periods=(0, 4)), NAMES, many),
+        )
+
+
+class FeasibilityCommandTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+        Subject.objects.update(default_periods_per_week=2)
+
+    def setUp(self):
+        use_temp_snapshot_dir(self)
+
+    def shorten_ravi(self):
+        # 8 lessons chahiye, T1 + T2 ab sirf 4 + 2 de sakte hain
+        Teacher.objects.filter(code="T2").update(max_periods_per_day=1)
+
+    def test_check_only_reports_and_writes_nothing(self):
+        out = StringIO()
+        call_command("generate_timetable", "--check", stdout=out)
+        self.assertIn("No bottleneck found", out.getvalue())
+
+        self.shorten_ravi()
+        out = StringIO()
+        with self.assertRaisesMessage(CommandError, "3 bottleneck(s) found"):   # hours + both days
+            call_command("generate_timetable", "--check", stdout=out)
+        self.assertIn("at most 6 of the school's 8 lessons", out.getvalue())
+        self.assertIn("Tuesday: classes need at least 4 lessons", out.getvalue())
+        self.assertFalse(TimetableVersion.objects.exists())
+        self.assertFalse(GenerationJob.objects.exists())
+
+    def test_strict_stops_before_the_search(self):
+        self.shorten_ravi()
+        out = StringIO()
+        call_command("generate_timetable", "--no-pdfs", "--strict", stdout=out)
+        self.assertIn("Stopped (--strict)", out.getvalue())
+        self.assertIsNone(versions.active_id())
+        self.assertFalse(TimetableEntry.all_versions.exists())
+
+        call_command("generate_timetable", "--no-pdfs", "--seed", "1", stdout=out)
+        self.assertIn("Pre-check:", out.getvalue())
+        self.assertEqual(TimetableEntry.objects.count(), 6)
+
+
+# -------------------------------------------------
+# Batch validation
+# -------------------------------------------------
+class ValidateEntriesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+
+    def entry(self, school_class, teacher, room, period=0, subject=0):
+        return TimetableEntry(
+            school_class=school_class,
+            period=self.school["periods"][period],
+            subject=self.school["subjects"][subject],
+            teacher=teacher,
+            room=room,
+        )
+
+    def test_clashes_inside_one_batch(self):
+        (a, b), (t1, t2), (r1, r2) = self.school["classes"], self.school["teachers"], self.school["rooms"]
+        errors = validate_entries([
+            self.entry(a, t1, r1),
+            self.entry(b, t1, r2),   # same teacher, same period
+            self.entry(b, t2, r1, period=1),
+            self.entry(a, t2, r1, period=1),  # same room (and teacher), same period
+        ])
+        self.assertIn("teacher", errors[0])
+        self.assertIn("teacher", errors[1])
+        self.assertNotIn("room", errors[0])
+        self.assertIn("room", errors[2])
+        self.assertIn("room", errors[3])
+
+    def test_clean_batch_and_unqualified_teacher(self):
+        (a, b), (t1, t2), (r1, r2) = self.school["classes"], self.school["teachers"], self.school["rooms"]
+        self.assertEqual(
+            [dict(e) for e in validate_entries([self.entry(a, t1, r1), self.entry(b, t2, r2)])],
+            [{}, {}],
+        )
+        TeacherSubject.objects.filter(teacher=t2).delete()
+        errors = validate_entries([self.entry(b, t2, r2)])
+        self.assertIn("teacher", errors[0])
+
+    def test_clean_reuses_the_loaded_teacher_subject_and_period(self):
+        (a, _), (t1, _), (r1, _) = self.school["classes"], self.school["teachers"], self.school["rooms"]
+        saved = self.entry(a, t1, r1)
+        saved.version = active_version()
+        saved.save()
+        entry = TimetableEntry.objects.select_related("teacher", "subject", "period").get(pk=saved.pk)
+        # mapping, constraints, day load - koi per-FK lookup nahi
+        with self.assertNumQueries(3):
+            entry.clean()
+
+    def test_admin_form_validates_in_one_batch(self):
+        (a, b), (t1, t2), (r1, r2) = self.school["classes"], self.school["teachers"], self.school["rooms"]
+        version = active_version()
+        TimetableEntry.all_versions.create(
+            version=version, school_class=b, period=self.school["periods"][0],
+            subject=self.school["subjects"][0], teacher=t1, room=r1,
+        )
+        request = RequestFactory().post("/")
+        request.user = User.objects.create_superuser("admin")
+        Form = TimetableEntryAdmin(TimetableEntry, admin.site).get_form(request)
+
+        def form(teacher, room):
+            return Form({
+                "version": version.pk,
+                "school_class": a.pk,
+                "period": self.school["periods"][0].pk,
+                "subject": self.school["subjects"][0].pk,
+                "teacher": teacher.pk,
+                "room": room.pk,
+            })
+
+        clash = form(t1, r2)
+        self.assertFalse(clash.is_valid())
+        self.assertIn("teacher", clash.errors)
+        # 6 fields + mapping, clashes, constraints, day load
+        ok = form(t2, r2)
+        with self.assertNumQueries(10):
+            self.assertTrue(ok.is_valid(), ok.errors)
+
+
+# -------------------------------------------------
+# Admin inline: one batch check per formset
+# -------------------------------------------------
+class EntryInlineFormSetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+        school = cls.school
+        cls.admin = User.objects.create_superuser("admin")
+        # 10-B ka lesson: T1 + R1 in period 0
+        TimetableEntry.all_versions.create(
+            version=active_version(),
+            school_class=school["classes"][1],
+            period=school["periods"][0],
+            subject=school["subjects"][0],
+            teacher=school["teachers"][0],
+            room=school["rooms"][0],
+        )
+
+    def formset(self, *rows):
+        request = RequestFactory().post("/")
+        request.user = self.admin
+        FormSet = TimetableEntryInline(SchoolClass, admin.site).get_formset(request, self.school["classes"][0])
+        data = {
+            "timetableentry_set-TOTAL_FORMS": len(rows),
+            "timetableentry_set-INITIAL_FORMS": 0,
+        }
+        for i, (period, teacher, room) in enumerate(rows):
+            data.update({
+                f"timetableentry_set-{i}-period": self.school["periods"][period].pk,
+                f"timetableentry_set-{i}-subject": self.school["subjects"][0].pk,
+                f"timetableentry_set-{i}-teacher": self.school["teachers"][teacher].pk,
+                f"timetableentry_set-{i}-room": self.school["rooms"][room].pk,
+            })
+        return FormSet(data, instance=self.school["classes"][0])
+
+    def test_clashes_are_found_in_one_batch(self):
+        formset = self.formset((0, 0, 1), (1, 1, 1), (1, 0, 0))
+        self.assertFalse(formset.is_valid())
+        self.assertIn("teacher", formset.forms[0].errors)   # T1 already in 10-B
+        self.assertNotIn("room", formset.forms[0].errors)
+        self.assertIn("period", formset.forms[1].errors)    # two lessons in period 1
+        self.assertIn("period", formset.forms[2].errors)
+
+    def test_no_per_row_unique_or_exists_queries(self):
+        formset = self.formset((1, 0, 0), (2, 1, 1), (3, 0, 1))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertTrue(formset.is_valid(), formset.errors)
+        self.assertFalse([q["sql"] for q in queries if 'SELECT 1 AS "a"' in q["sql"]])
+        formset.save()
+        self.assertEqual(TimetableEntry.objects.filter(school_class=self.school["classes"][0]).count(), 3)
+
+
+# -------------------------------------------------
+# Week editor: one diff, one transaction
+# -------------------------------------------------
+class WeekEditorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+        add_lessons(cls.school)
+        cls.admin = User.objects.create_user("office", is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        grids.clear_cache()
+        self.client.force_login(self.admin)
+        self.class_a = self.school["classes"][0]
+        self.url = f"/class/{self.class_a.pk}/edit/"
+
+    def week(self, **cells):
+        """
+        POST data for 10-A: the saved lessons, with ``p<n>=(subject, teacher,
+        room)`` overrides - ints index ``self.school``, strings are posted as is.
+        """
+        data = {"version": class_stamp(self.class_a.pk).key}
+        saved = {e.period_id: e for e in TimetableEntry.objects.filter(school_class=self.class_a)}
+        for n, period in enumerate(self.school["periods"]):
+            entry = saved.get(period.pk)
+            values = (entry.subject_id, entry.teacher_id, entry.room_id) if entry else ("", "", "")
+            if f"p{n}" in cells:
+                override = cells[f"p{n}"]
+                values = [
+                    self.school[kind][i].pk if isinstance(i, int) else i
+                    for kind, i in zip(("subjects", "teachers", "rooms"), override)
+                ] if override else ("", "", "")
+            for name, value in zip(("subject", "teacher", "room"), values):
+                data[f"cell-{period.pk}-{name}"] = str(value)
+        return data
+
+    def lessons(self):
+        return sorted(
+            TimetableEntry.objects.filter(school_class=self.class_a)
+            .values_list("period__day", "period__order", "subject__name", "teacher__code", "room__name")
+        )
+
+    def test_save_applies_add_change_and_remove(self):
+        data = self.week(p0=(1, 0, 0), p1=None, p2=(0, 1, 0))
+        response = self.client.post(self.url, data, follow=True)
+        self.assertRedirects(response, f"/class/{self.class_a.pk}/")
+        self.assertContains(response, "Saved: 1 added, 1 changed, 1 removed.")
+        self.assertEqual(self.lessons(), [
+            (1, 1, "Science", "T1", "R1"),
+            (2, 1, "Maths", "T2", "R1"),
+        ])
+
+    def test_query_count_does_not_grow_with_changed_cells(self):
+        def queries(**cells):
+            # Har edit ek hi week pe - baad me rollback
+            with transaction.atomic():
+                data = self.week(**cells)
+                with CaptureQueriesContext(connection) as ctx:
+                    edit = WeekEdit(self.class_a, data)
+                    self.assertTrue(edit.is_valid(), edit.errors)
+                    edit.save()
+                transaction.set_rollback(True)
+            return len(ctx)
+
+        # Ek ya do cells - har kind (insert / update / delete) ki ek hi query
+        self.assertEqual(queries(p2=(0, 0, 0)), queries(p2=(0, 0, 0), p3=(1, 1, 1)))
+        self.assertEqual(queries(p0=(1, 0, 0)), queries(p0=(1, 0, 0), p1=(0, 1, 0)))
+        # (p2 bhi - poora week khaali ho to id checks ki queries hi nahi hoti)
+        self.assertEqual(queries(p0=None, p2=(0, 0, 0)), queries(p0=None, p1=None, p2=(0, 0, 0)))
+
+    def test_stale_week_is_refused(self):
+        data = self.week(p2=(0, 0, 0))
+        TimetableEntry.objects.filter(school_class=self.class_a, period=self.school["periods"][1]).delete()
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "This timetable was changed after you opened it.")
+        self.assertEqual(self.lessons(), [(1, 1, "Maths", "T1", "R1")])
+
+    def test_unknown_and_missing_ids(self):
+        edit = WeekEdit(self.class_a, self.week(p2=("9999", "x", 0), p3=(0, 0, "")))
+        self.assertFalse(edit.is_valid())
+        p2, p3 = self.school["periods"][2].pk, self.school["periods"][3].pk
+        self.assertEqual(edit.errors, {p2: ["Unknown subject.", "Unknown teacher."], p3: ["Choose a room."]})
+
+    def test_clash_is_reported_on_the_cell_and_nothing_saved(self):
+        before = self.lessons()
+        data = self.week(p0=(0, 1, 0), p2=(0, 0, 0))   # T2 already teaches 10-B in P1
+        response = self.client.post(self.url, data)
+        self.assertEqual(response.status_code, 200)
+        edit = WeekEdit(self.class_a, data)
+        self.assertFalse(edit.is_valid())
+        self.assertEqual(list(edit.errors), [self.school["periods"][0].pk])
+        self.assertEqual(self.lessons(), before)
+
+    def test_non_admins_are_sent_to_the_read_only_page(self):
+        self.client.force_login(User.objects.create_user("parent"))
+        response = self.client.post(self.url, self.week(p1=None))
+        self.assertRedirects(response, f"/class/{self.class_a.pk}/", fetch_redirect_response=False)
+        self.assertEqual(len(self.lessons()), 2)
+
+
+# -------------------------------------------------
+# Timetable diff
+# -------------------------------------------------
+def snapshot(lessons, classes=(10, 11, 12), periods=(1, 2, 3)):
+    """Snapshot from {(class id, period id): (subject id, teacher id, room id)}."""
+    subjects, teachers, rooms = (
+        np.array(sorted({lesson[i] for lesson in lessons.values()}), dtype=np.int64) for i in range(3)
+    )
+    classes, periods = np.array(classes, dtype=np.int64), np.array(periods, dtype=np.int64)
+    cells = np.full((len(classes), len(periods), 3), FREE, dtype=np.int32)
+    for (c, p), (s, t, r) in lessons.items():
+        cells[np.searchsorted(classes, c), np.searchsorted(periods, p)] = (
+            np.searchsorted(subjects, s), np.searchsorted(teachers, t), np.searchsorted(rooms, r)
+        )
+    return Snapshot(None, "", cells, classes, periods, subjects, teachers, rooms)
+
+
+class DiffTests(SimpleTestCase):
+
+    def test_changes_are_classified(self):
+        old = snapshot({
+            (10, 1): (100, 200, 300),
+            (10, 2): (101, 201, 300),
+            (11, 1): (100, 201, 301),
+            (11, 2): (101, 200, 301),
+        })
+        new = snapshot({
+            (10, 3): (100, 200, 300),   # moved 1 -> 3, same teacher
+            (10, 2): (101, 200, 300),   # teacher swapped
+            (11, 1): (100, 201, 300),   # room swapped
+            (12, 2): (101, 201, 301),   # added; (11, 2) removed
+        })
+        result = diffs.diff(old, new)
+        self.assertEqual(result.counts(), {
+            diffs.MOVED: 1, diffs.ADDED: 1, diffs.REMOVED: 1,
+            diffs.TEACHER_SWAPPED: 1, diffs.ROOM_SWAPPED: 1,
+        })
+        changes = {change.kind: change for change in result.changes}
+        self.assertEqual(
+            changes[diffs.MOVED],
+            diffs.Change(diffs.MOVED, 10, 100, 1, 3, 200, 200, 300, 300),
+        )
+        self.assertEqual(
+            changes[diffs.TEACHER_SWAPPED],
+            diffs.Change(diffs.TEACHER_SWAPPED, 10, 101, 2, 2, 201, 200, 300, 300),
+        )
+        self.assertEqual(
+            changes[diffs.ROOM_SWAPPED],
+            diffs.Change(diffs.ROOM_SWAPPED, 11, 100, 1, 1, 201, 201, 301, 300),
+        )
+        self.assertEqual(
+            changes[diffs.REMOVED],
+            diffs.Change(diffs.REMOVED, 11, 101, 2, None, 200, None, 301, None),
+        )
+        self.assertEqual(
+            changes[diffs.ADDED],
+            diffs.Change(diffs.ADDED, 12, 101, None, 2, None, 201, None, 301),
+        )
+        # Teacher 200 ko move, swap (gain) aur removed lesson teeno ki khabar
+        self.assertEqual(
+            sorted(change.kind for change in result.by_teacher()[200]),
+            sorted([diffs.MOVED, diffs.TEACHER_SWAPPED, diffs.REMOVED]),
+        )
+
+    def test_move_prefers_the_same_teacher(self):
+        periods = (1, 2, 3, 4)
+        old = snapshot({(10, 1): (100, 200, 300), (10, 2): (100, 201, 300)}, periods=periods)
+        new = snapshot({(10, 3): (100, 201, 300), (10, 4): (100, 200, 300)}, periods=periods)
+        moved = [c for c in diffs.diff(old, new).changes if c.kind == diffs.MOVED]
+        self.assertEqual(
+            {(c.old_period, c.new_period, c.old_teacher, c.new_teacher) for c in moved},
+            {(1, 4, 200, 200), (2, 3, 201, 201)},
+        )
+
+    def test_same_timetable_has_no_changes(self):
+        lessons = {(10, 1): (100, 200, 300), (11, 2): (101, 201, 301)}
+        self.assertFalse(diffs.diff(snapshot(lessons), snapshot(lessons)))
+
+
+# -------------------------------------------------
+# Import: all or nothing
+# -------------------------------------------------
+class SchoolImportTests(TestCase):
+
+    def rows(self, **content):
+        return read_source("school.json", json.dumps(content).encode())
+
+    def test_invalid_import_writes_nothing(self):
+        rows = self.rows(
+            subjects=[{"name": "Maths"}],
+            rooms=[{"name": "R1", "capacity": 40}],
+            teacher_subjects=[{"teacher": "NOPE", "subject": "Maths"}],
+        )
+        with self.assertRaises(ImportFailed) as failed:
+            SchoolImport(rows).run()
+        self.assertIn("teacher_subjects: unknown teacher 'NOPE'", failed.exception.errors)
+        self.assertFalse(Subject.objects.exists())
+        self.assertFalse(Room.objects.exists())
+
+    def test_error_while_writing_rolls_back(self):
+        rows = self.rows(
+            subjects=[{"name": "Maths"}],
+            teachers=[{"code": "T1", "first_name": "Asha"}],
+            teacher_subjects=[{"teacher": "T1", "subject": "Maths"}],
+        )
+        with mock.patch.object(SchoolImport, "_write_constraints", side_effect=RuntimeError("disk")):
+            with self.assertRaises(RuntimeError):
+                SchoolImport(rows).run()
+        self.assertFalse(Subject.objects.exists())
+        self.assertFalse(Teacher.objects.exists())
+        self.assertFalse(User.objects.filter(username="T1").exists())
+
+    def test_valid_import_writes_everything(self):
+        rows = self.rows(
+            subjects=[{"name": "Maths"}],
+            teachers=[{"code": "T1"}],
+            teacher_subjects=[{"teacher": "T1", "subject": "Maths"}],
+        )
+        summary = SchoolImport(rows).run()
+        self.assertEqual(summary["teachers"], (1, 0))
+        self.assertTrue(TeacherSubject.objects.filter(teacher__code="T1", subject__name="Maths").exists())
+
+
+# -------------------------------------------------
+# Conditional GET: pages and JSON API
+# -------------------------------------------------
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+        cls.user = User.objects.create_user("viewer")
+        school = cls.school
+        cls.entry = TimetableEntry.all_versions.create(
+            version=active_version(),
+            school_class=school["classes"][0],
+            period=school["periods"][0],
+            subject=school["subjects"][0],
+            teacher=school["teachers"][0],
+            room=school["rooms"][0],
+        )
+
+    def setUp(self):
+        # Cache keys stamps se bante hain, aur har test ka DB stamps 0 se shuru
+        cache.clear()
+        grids.clear_cache()
+        use_temp_snapshot_dir(self)
+        self.client.force_login(self.user)
+
+    def fresh_etag(self, url, **headers):
+        # Pehli page load CSRF cookie set karti hai (woh per-user ETag ka hissa hai)
+        self.client.get(url, **headers)
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def test_class_page_304_until_the_timetable_changes(self):
+        url = f"/class/{self.school['classes'][0].pk}/"
+        etag = self.fresh_etag(url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.entry.room = self.school["rooms"][1]
+        self.entry.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_api_grid_etag_and_gzip(self):
+        url = f"/api/classes/{self.school['classes'][0].pk}/"
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", response["Vary"])
+        payload = json.loads(gzip.decompress(response.content))
+        cell = payload["days"][0]["cells"][0]
+        self.assertEqual((cell["subject"], cell["teacher"], cell["room"]), ("Maths", "T1", "R1"))
+        self.assertIsNone(payload["days"][0]["cells"][1])
+
+        etag = response["ETag"]
+        self.assertEqual(
+            self.client.get(url, HTTP_ACCEPT_ENCODING="gzip", HTTP_IF_NONE_MATCH=etag).status_code, 304
+        )
+        # Plain copy alag bytes hain - alag ETag
+        plain = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(plain.status_code, 200)
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertNotEqual(plain["ETag"], etag)
+
+    def test_api_etag_moves_when_a_teacher_is_renamed(self):
+        url = f"/api/teachers/{self.school['teachers'][0].pk}/"
+        etag = self.client.get(url)["ETag"]
+        user = self.school["teachers"][0].user
+        user.first_name = "Asha Devi"
+        user.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["teacher"]["name"], "Asha Devi")
+
+    def test_api_school_payload(self):
+        response = self.client.get("/api/school/", HTTP_ACCEPT_ENCODING="br, gzip")
+        self.assertEqual(response.status_code, 200)
+        if brotli is not None:
+            self.assertEqual(response["Content-Encoding"], "br")
+            payload = json.loads(brotli.decompress(response.content))
+        else:
+            payload = json.loads(gzip.decompress(response.content))
+        self.assertEqual([row[1] for row in payload["classes"]], ["10-A", "10-B"])
+        subject, teacher, room = payload["timetable"][0][0]
+        self.assertEqual(payload["subjects"][subject][1], "Maths")
+        self.assertEqual(payload["teachers"][teacher][1], "T1")
+        self.assertEqual(payload["rooms"][room][1], "R1")
+        self.assertIsNone(payload["timetable"][1][0])
+
+        etag = response["ETag"]
+        again = self.client.get("/api/school/", HTTP_ACCEPT_ENCODING="br, gzip", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(again.status_code, 304)
+
+    def test_api_needs_login_and_an_existing_object(self):
+        self.assertEqual(self.client.get("/api/rooms/9999/").status_code, 404)
+        self.client.logout()
+        self.assertEqual(self.client.get("/api/school/").status_code, 401)
+        with override_settings(TIMETABLE_API_PUBLIC=True):
+            self.assertEqual(self.client.get("/api/school/").status_code, 200)
+
+
+# -------------------------------------------------
+# Generation: incremental runs
+# -------------------------------------------------
+def lessons(version_id):
+    """Set of (class, period, subject, teacher, room) ids of one version."""
+    return set(TimetableEntry.all_versions.filter(version_id=version_id).values_list(*versions.LESSON_FIELDS))
+
+
+class IncrementalCellsTests(SimpleTestCase):
+
+    # (class, period, subject, teacher, room) on make_problem()
+    ENTRIES = [
+        (0, 1, 0, 0, 1),
+        (1, 2, 1, 1, 1),
+        (2, 1, 2, 2, 0),
+        (0, 4, 1, 0, 1),
+        (2, 0, 0, 0, 0),   # T1 blocked in period 0
+    ]
+
+    def test_changed_and_invalid_lessons_are_freed(self):
+        problem = make_problem()
+        self.assertEqual(invalid_cells(problem, self.ENTRIES), {(2, 0)})
+        free = cells_to_free(problem, self.ENTRIES, ChangeSet(teachers={1}))
+        # Teacher 1 ke lessons + invalid lesson ki class ka poora din
+        self.assertEqual(free, {(1, 2), (2, 0), (2, 1)})
+        self.assertEqual(
+            cells_to_free(problem, self.ENTRIES, ChangeSet(rooms={1})), {(0, 1), (1, 2), (0, 4), (2, 0), (2, 1)}
+        )
+        self.assertEqual(
+            cells_to_free(problem, self.ENTRIES, ChangeSet(teacher_periods={(0, 4)})), {(0, 4), (2, 0), (2, 1)}
+        )
+
+    def test_kept_lessons_stay_in_place(self):
+        problem = make_problem()
+        free = cells_to_free(problem, self.ENTRIES, ChangeSet(teachers={1}))
+        solution = solve(with_fixed(problem, self.ENTRIES, free), seed=1)
+        self.assertIn((0, 1, 0, 0, 1), solution.entries)
+        self.assertIn((0, 4, 1, 0, 1), solution.entries)
+        self.assertNotIn((2, 0, 0, 0, 0), solution.entries)
+
+
+class IncrementalGenerationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+        # 2 + 2 lessons per class = har period bhara; teesra teacher taaki block ke baad bhi jagah ho
+        Subject.objects.update(default_periods_per_week=2)
+        user = User.objects.create_user("t3", first_name="Meena")
+        teacher = Teacher.objects.create(user=user, code="T3")
+        for subject in cls.school["subjects"]:
+            TeacherSubject.objects.create(teacher=teacher, subject=subject)
+        cls.school["teachers"].append(teacher)
+
+    def setUp(self):
+        use_temp_snapshot_dir(self)
+
+    def generate(self, *args):
+        call_command("generate_timetable", "--no-pdfs", "--seed", "1", *args, stdout=StringIO())
+        return versions.active_id()
+
+    def test_edits_are_tracked_and_only_affected_lessons_move(self):
+        first = self.generate()
+        before = lessons(first)
+        self.assertEqual(len(before), 8)
+        ScheduleChange.objects.all().delete()
+
+        # T1 ka ek lesson wale period ko T1 ke liye block karo
+        blocked = next(lesson for lesson in sorted(before) if lesson[3] == self.school["teachers"][0].pk)
+        Constraint.objects.create(teacher_id=blocked[3], period_id=blocked[1])
+        self.assertTrue(
+            ScheduleChange.objects.filter(teacher_pk=blocked[3], period_pk=blocked[1], source="constraint").exists()
+        )
+
+        second = self.generate("--incremental")
+        self.assertNotEqual(second, first)
+        after = lessons(second)
+        self.assertEqual(len(after), 8)
+        self.assertNotIn(blocked, after)
+        self.assertFalse(any(t == blocked[3] and p == blocked[1] for _, p, _, t, _ in after))
+        # Sirf us class ka woh din dobara solve hua, baaki lessons wahi
+        day = dict(Period.objects.values_list("pk", "day"))
+        untouched = {
+            lesson for lesson in before
+            if (lesson[0], day[lesson[1]]) != (blocked[0], day[blocked[1]])
+        }
+        self.assertLessEqual(untouched, after)
+        self.assertFalse(ScheduleChange.objects.exists())
+        self.assertEqual(TimetableVersion.objects.get(pk=first).status, TimetableVersion.ARCHIVED)
+
+    def test_master_data_edits_are_recorded(self):
+        first = self.generate()
+        ScheduleChange.objects.all().delete()
+        t1, t2 = self.school["teachers"][:2]
+        room, period = self.school["rooms"][1], self.school["periods"][2]
+        room.capacity = 40
+        room.save()
+        period.save()
+        TeacherSubject.objects.filter(teacher=t2).first().delete()
+        up_to = last_change_id()
+        Constraint.objects.create(teacher=t1, period=period)   # up_to ke baad - is baar nahi
+
+        problem = load_problem()
+        changes = load_changes(problem, up_to=up_to)
+        self.assertEqual(changes.rooms, {problem.room_ids.index(room.pk)})
+        self.assertEqual(changes.periods, {problem.period_ids.index(period.pk)})
+        self.assertEqual(changes.teachers, {problem.teacher_ids.index(t2.pk)})
+        self.assertEqual(changes.teacher_periods, set())
+
+        self.generate("--incremental")
+        self.assertNotEqual(versions.active_id(), first)
+        self.assertFalse(ScheduleChange.objects.exists())
+
+    def test_incremental_run_without_changes_keeps_the_version(self):
+        first = self.generate()
+        ScheduleChange.objects.all().delete()
+        self.assertEqual(self.generate("--incremental"), first)
+
+    def test_write_draft_copies_unchanged_lessons_in_the_database(self):
+        first = self.generate()
+        entries = list(TimetableEntry.all_versions.filter(version_id=first).order_by("period_id", "pk"))
+        for entry in entries:
+            entry.pk = None
+        # Pehle period ki dono classes ke rooms aapas me badlo
+        a, b = entries[0], entries[1]
+        self.assertEqual(a.period_id, b.period_id)
+        a.room_id, b.room_id = b.room_id, a.room_id
+
+        draft = versions.create_draft()
+        with mock.patch.object(
+            TimetableEntry.all_versions, "bulk_create", wraps=TimetableEntry.all_versions.bulk_create
+        ) as bulk_create:
+            versions.write_draft(draft, entries, base=first)
+        written = [entry for call in bulk_create.call_args_list for entry in call.args[0]]
+        self.assertEqual(written, [a, b])
+        self.assertEqual(TimetableVersion.objects.with_lessons().get(pk=draft.pk).lessons, 8)
+        self.assertEqual(
+            lessons(draft.pk),
+            {tuple(getattr(entry, name) for name in versions.LESSON_FIELDS) for entry in entries},
+        )
+
+
+# -------------------------------------------------
+# Generation jobs: lock, heartbeat, cancel
+# -------------------------------------------------
+class GenerationJobLockTests(TestCase):
+
+    def test_one_generation_at_a_time(self):
+        job = jobs.start_direct({})
+        with self.assertRaisesMessage(jobs.GenerationLocked, f"#{job.pk} is running"):
+            jobs.start_direct({})
+        with self.assertRaises(jobs.GenerationLocked):
+            jobs.enqueue({})
+        jobs.JobReporter(job.pk).finish(GenerationJob.DONE)
+
+        queued = jobs.enqueue({})
+        with self.assertRaisesMessage(jobs.GenerationLocked, f"#{queued.pk} is already queued"):
+            jobs.enqueue({})
+
+    def test_enqueue_race_is_refused_by_the_database(self):
+        jobs.enqueue({})
+        # Dusre request ka check bhi "koi job nahi" dekh chuka hai
+        with mock.patch.object(jobs, "active_job", return_value=None):
+            with self.assertRaisesMessage(jobs.GenerationLocked, "queued just now"):
+                jobs.enqueue({})
+        self.assertEqual(GenerationJob.objects.count(), 1)
+
+    def test_start_direct_retries_when_the_lock_was_just_freed(self):
+        create = GenerationJob.objects.create
+        calls = []
+
+        def racing_create(**kwargs):
+            calls.append(kwargs)
+            if len(calls) == 1:
+                # Lock wala job insert aur humare lookup ke beech khatam ho gaya
+                raise IntegrityError("UNIQUE constraint failed")
+            return create(**kwargs)
+
+        with mock.patch.object(GenerationJob.objects, "create", side_effect=racing_create):
+            job = jobs.start_direct({})
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(job.status, GenerationJob.RUNNING)
+
+    def test_dead_worker_frees_the_lock(self):
+        job = jobs.start_direct({})
+        GenerationJob.objects.filter(pk=job.pk).update(
+            heartbeat_at=timezone.now() - jobs.STALE_AFTER - timedelta(seconds=1)
+        )
+        second = jobs.start_direct({})
+        job.refresh_from_db()
+        self.assertEqual(job.status, GenerationJob.FAILED)
+        self.assertEqual(second.status, GenerationJob.RUNNING)
+
+    def test_cancel(self):
+        queued = jobs.enqueue({})
+        jobs.cancel(queued)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, GenerationJob.CANCELLED)
+        self.assertFalse(jobs.claim(queued.pk))
+
+        running = jobs.start_direct({})
+        reporter = jobs.JobReporter(running.pk)
+        reporter.phase("solving")
+        jobs.cancel(running)
+        with self.assertRaises(jobs.Cancelled):
+            reporter.phase("writing")
+        # finish() cancel ke baad bhi lock chhodta hai
+        reporter.finish(GenerationJob.CANCELLED)
+        self.assertIsNone(jobs.active_job())
+
+
+class GenerationJobHeartbeatTests(TransactionTestCase):
+
+    def test_heartbeat_thread_touches_the_running_job(self):
+        job = jobs.start_direct({})
+        old = timezone.now() - timedelta(minutes=1)
+        GenerationJob.objects.filter(pk=job.pk).update(heartbeat_at=old)
+        with mock.patch.object(jobs, "HEARTBEAT_EVERY", 0.01):
+            with jobs.JobReporter(job.pk):
+                deadline = time.monotonic() + 5
+                while time.monotonic() < deadline:
+                    if GenerationJob.objects.get(pk=job.pk).heartbeat_at > old:
+                        break
+                    time.sleep(0.01)
+        self.assertGreater(GenerationJob.objects.get(pk=job.pk).heartbeat_at, old)
+
+
+# -------------------------------------------------
+# Timetable versions: activate, rollback, prune
+# -------------------------------------------------
+class TimetableVersionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+
+    def setUp(self):
+        use_temp_snapshot_dir(self)
+
+    def draft(self, *cells):
+        """Draft version with one lesson per (class, period) index pair."""
+        version = versions.create_draft()
+        versions.write_draft(version, [
+            TimetableEntry(
+                school_class=self.school["classes"][c],
+                period=self.school["periods"][p],
+                subject=self.school["subjects"][0],
+                teacher=self.school["teachers"][c],
+                room=self.school["rooms"][c],
+            )
+            for c, p in cells
+        ])
+        return version
+
+    def lesson_count(self, version):
+        return TimetableVersion.objects.with_lessons().get(pk=version.pk).lessons
+
+    def test_activate_archives_the_old_version_and_rollback_restores_it(self):
+        first = self.draft((0, 0), (1, 0))
+        versions.activate(first.pk)
+        self.assertEqual(TimetableEntry.objects.count(), 2)
+
+        second = self.draft((0, 1))
+        # Draft pages pe nahi dikhta
+        self.assertEqual(TimetableEntry.objects.count(), 2)
+        versions.activate(second.pk)
+        self.assertEqual(list(TimetableEntry.objects.values_list("period", flat=True)),
+                         [self.school["periods"][1].pk])
+        first.refresh_from_db()
+        self.assertEqual(first.status, TimetableVersion.ARCHIVED)
+
+        versions.restore(first.pk)
+        self.assertEqual(versions.active_id(), first.pk)
+        self.assertEqual(TimetableEntry.objects.count(), 2)
+        with self.assertRaises(versions.VersionError):
+            versions.restore(self.draft((0, 2)).pk)
+
+    def test_prune_keeps_the_newest_archived_versions(self):
+        made = []
+        for period in range(4):
+            made.append(self.draft((0, period)))
+            versions.activate(made[-1].pk)
+        orphan = self.draft((1, 0))
+        self.assertEqual(versions.prune(keep=1), 3)   # 2 old archived + abandoned draft
+        self.assertEqual(
+            set(TimetableVersion.objects.values_list("pk", flat=True)), {made[2].pk, made[3].pk}
+        )
+        self.assertFalse(TimetableEntry.all_versions.filter(version_id=orphan.pk).exists())
+
+    def test_lesson_count_follows_edits(self):
+        version = self.draft((0, 0), (1, 0))
+        versions.activate(version.pk)
+        self.assertEqual(self.lesson_count(version), 2)
+        # Admin jaisa hand edit - version ka count saath chalta hai
+        TimetableEntry.objects.create(
+            version=version,
+            school_class=self.school["classes"][0],
+            period=self.school["periods"][1],
+            subject=self.school["subjects"][0],
+            teacher=self.school["teachers"][0],
+            room=self.school["rooms"][0],
+        )
+        self.assertEqual(self.lesson_count(version), 3)
+        TimetableEntry.objects.filter(school_class=self.school["classes"][1]).delete()
+        self.assertEqual(self.lesson_count(version), 2)
+
+
+# -------------------------------------------------
+# Array snapshots: build, fallback after an edit, rollback
+# -------------------------------------------------
+class SnapshotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+        add_lessons(cls.school)
+
+    def setUp(self):
+        cache.clear()
+        grids.clear_cache()
+        self.snapshot_dir = use_temp_snapshot_dir(self)
+        self.version_id = versions.active_id()
+
+    def db_rows(self, version_id):
+        return set(TimetableEntry.all_versions.filter(version_id=version_id).values_list(
+            "school_class_id", "period_id", "subject_id", "teacher_id", "room_id"
+        ))
+
+    def edit_one_lesson(self):
+        entry = TimetableEntry.objects.get(school_class=self.school["classes"][0], period=self.school["periods"][0])
+        entry.subject = self.school["subjects"][1]
+        entry.save()
+
+    def test_saved_snapshot_is_memory_mapped_and_matches_the_db(self):
+        path = snapshots.save(snapshots.build(self.version_id))
+        self.assertEqual(path, Path(self.snapshot_dir) / f"v{self.version_id}")
+        loaded = snapshots.load(self.version_id)
+        self.assertIsInstance(loaded.cells, np.memmap)
+        self.assertFalse(loaded.cells.flags.writeable)
+        self.assertEqual(loaded.lessons, 3)
+        self.assertEqual({tuple(row) for row in loaded.rows().tolist()}, self.db_rows(self.version_id))
+        self.assertEqual(snapshots.verify(loaded), [])
+
+    def test_grids_read_the_snapshot_until_an_edit(self):
+        snapshots.save(snapshots.build(self.version_id))
+        stamp = school_stamp().key
+        self.assertIsNotNone(snapshots.current(stamp))
+        with CaptureQueriesContext(connection) as ctx:
+            grids.build_grids(stamp)
+        self.assertFalse(any("scheduler_timetableentry" in q["sql"] for q in ctx.captured_queries))
+
+        self.edit_one_lesson()
+        stamp = school_stamp().key
+        self.assertIsNone(snapshots.current(stamp))
+        with CaptureQueriesContext(connection) as ctx:
+            rows = grids.build_grids(stamp).class_rows(self.school["classes"][0].pk)
+        self.assertTrue(any("scheduler_timetableentry" in q["sql"] for q in ctx.captured_queries))
+        self.assertEqual(rows[0]["cells"][0].subject.name, "Science")
+
+    def test_ensure_rebuilds_a_stale_active_snapshot(self):
+        old = snapshots.build(self.version_id)
+        snapshots.save(old)
+        self.edit_one_lesson()
+        self.assertEqual(snapshots.verify(old), [
+            "1 lesson is in the snapshot but not in the DB.",
+            "1 lesson is in the DB but missing from the snapshot.",
+        ])
+        fresh = snapshots.ensure(self.version_id)
+        self.assertEqual(fresh.stamp, school_stamp().key)
+        self.assertEqual(snapshots.verify(snapshots.load(self.version_id)), [])
+
+    def test_rollback_restamps_the_old_snapshot(self):
+        snapshots.save(snapshots.build(self.version_id))
+        draft = versions.create_draft()
+        versions.write_draft(draft, [])
+        versions.activate(draft.pk)
+        self.assertIsNone(snapshots.load(draft.pk))
+        self.assertIsNone(snapshots.current())
+
+        versions.activate(self.version_id)
+        back = snapshots.current()
+        self.assertIsNotNone(back)
+        self.assertEqual({tuple(row) for row in back.rows().tolist()}, self.db_rows(self.version_id))
+
+    def test_command_builds_and_verifies(self):
+        out = StringIO()
+        call_command("timetable_snapshot", "build", stdout=out)
+        self.assertIn(f"Version #{self.version_id}: 3 lessons", out.getvalue())
+        self.edit_one_lesson()
+        with self.assertRaisesMessage(CommandError, "1 snapshot(s) differ from the DB"):
+            call_command("timetable_snapshot", "verify", stdout=StringIO())
+
+
+# -------------------------------------------------
+# Exports: PDF ZIP, PDF cache, CSV / XLSX
+# -------------------------------------------------
+def add_lessons(school):
+    """10-A: Maths (T1, R1) in P1, Science (T2, R2) in P2; 10-B: Science (T1, R2) in P1."""
+    version = active_version()
+    for c, p, s, t, r in ((0, 0, 0, 0, 0), (0, 1, 1, 1, 1), (1, 0, 1, 1, 1)):
+        TimetableEntry.all_versions.create(
+            version=version,
+            school_class=school["classes"][c],
+            period=school["periods"][p],
+            subject=school["subjects"][s],
+            teacher=school["teachers"][t],
+            room=school["rooms"][r],
+        )
+
+
+def fake_pdf(html):
+    # WeasyPrint (Pango) ke bina: HTML ka hash hi "PDF"
+    return b"%PDF-test " + hashlib.sha256(html.encode()).hexdigest().encode()
+
+
+class ExportTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.school = make_school()
+        add_lessons(cls.school)
+        cls.admin = User.objects.create_user("office", is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        grids.clear_cache()
+        self.client.force_login(self.admin)
+
+
+class PdfZipTests(ExportTestCase):
+
+    def test_zip_has_one_pdf_per_class_and_teacher(self):
+        with mock.patch.object(pdf, "check_available"), mock.patch.object(pdf, "html_to_pdf", fake_pdf), \
+                mock.patch.object(pdf, "DEFAULT_JOBS", 1):
+            response = self.client.get("/timetables/pdf.zip?teachers=1")
+            self.assertTrue(response.streaming)
+            body = b"".join(response.streaming_content)
+        self.assertEqual(response["Content-Type"], "application/zip")
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            self.assertEqual(
+                sorted(archive.namelist()),
+                ["classes/10-A.pdf", "classes/10-B.pdf", "teachers/T1.pdf", "teachers/T2.pdf"],
+            )
+            self.assertTrue(archive.read("classes/10-A.pdf").startswith(b"%PDF-test"))
+            self.assertNotEqual(archive.read("classes/10-A.pdf"), archive.read("classes/10-B.pdf"))
+
+    def test_documents_are_rendered_lazily_and_names_stay_unique(self):
+        SchoolClass.objects.create(name="10/A")   # get_valid_filename -> 10A
+        SchoolClass.objects.create(name="10A")
+        documents = pdf_documents()
+        self.assertEqual(next(documents)[0], "classes/10-A.pdf")
+        self.assertEqual([name for name, _ in documents], ["classes/10-B.pdf", "classes/10A.pdf", "classes/10A-2.pdf"])
+
+    def test_render_many_on_a_process_pool(self):
+        documents = [(f"doc{i}", f"<p>{i}</p>") for i in range(5)]
+        with mock.patch.object(pdf, "html_to_pdf", fake_pdf):
+            rendered = dict(pdf.render_many(iter(documents), jobs=2))
+        self.assertEqual(rendered, {name: fake_pdf(html) for name, html in documents})
+
+    def test_without_weasyprint_the_zip_is_refused(self):
+        with mock.patch.object(pdf, "check_available", side_effect=pdf.PDFUnavailable("no pango")):
+            response = self.client.get("/timetables/pdf.zip")
+        self.assertEqual(response.status_code, 503)
+
+
+class PdfCacheTests(ExportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.pdf_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.pdf_dir, ignore_errors=True)
+        settings_override = override_settings(TIMETABLE_PDF_DIR=self.pdf_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.renders = mock.patch.object(pdf, "html_to_pdf", side_effect=fake_pdf).start()
+        self.addCleanup(mock.patch.stopall)
+        self.class_a = self.school["classes"][0]
+
+    def test_class_pdf_is_rendered_once_per_timetable_version(self):
+        stamp = class_stamp(self.class_a.pk)
+        path = pdf_cache.class_pdf(self.class_a, stamp)
+        self.assertEqual(pdf_cache.class_pdf(self.class_a, class_stamp(self.class_a.pk)), path)
+        self.assertEqual(self.renders.call_count, 1)
+        self.assertTrue(path.read_bytes().startswith(b"%PDF-test"))
+
+        entry = TimetableEntry.objects.get(school_class=self.class_a, period=self.school["periods"][0])
+        entry.subject = self.school["subjects"][1]
+        entry.save()
+        new_path = pdf_cache.class_pdf(self.class_a, class_stamp(self.class_a.pk))
+        self.assertNotEqual(new_path, path)
+        self.assertEqual(self.renders.call_count, 2)
+
+    def test_prerender_renders_only_missing_classes(self):
+        pdf_cache.class_pdf(self.class_a, class_stamp(self.class_a.pk))
+        self.assertEqual(pdf_cache.prerender(jobs=1), 1)
+        self.assertEqual(pdf_cache.prerender(jobs=1), 0)
+        self.assertEqual(self.renders.call_count, 2)
+
+    def test_evict_removes_least_recently_used_first(self):
+        paths = []
+        for age, name in ((300, "aa"), (200, "bb"), (100, "cc")):
+            path = Path(self.pdf_dir) / name[:2] / f"{name}.pdf"
+            path.parent.mkdir()
+            path.write_bytes(b"x" * 10)
+            stamp = time.time() - age
+            os.utime(path, (stamp, stamp))
+            paths.append(path)
+        self.assertEqual(pdf_cache.evict(limit_bytes=20), 1)
+        self.assertEqual([p.exists() for p in paths], [False, True, True])
+
+    def test_pdf_view_sends_artifact_etag_and_304(self):
+        url = f"/class/{self.class_a.pk}/pdf/"
+        with mock.patch.object(pdf, "check_available"):
+            response = self.client.get(url)
+            self.assertEqual(response["Content-Type"], "application/pdf")
+            self.assertTrue(b"".join(response.streaming_content).startswith(b"%PDF-test"))
+            response.close()
+            etag = response["ETag"]
+            self.assertIn(pdf_cache.artifact_key(class_stamp(self.class_a.pk)), etag)
+
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.renders.call_count, 1)
+
+
+XLSX_NS = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+class TimetableExportTests(ExportTestCase):
+
+    def setUp(self):
+        super().setUp()
+        Period.objects.filter(pk=self.school["periods"][0].pk).update(
+            start_time="09:00", end_time="09:45"
+        )
+        monday = DAY_LABELS[1]
+        self.expected = [
+            EXPORT_HEADER,
+            ["10-A", monday, "1", "09:00", "09:45", "Maths", "T1", "R1"],
+            ["10-A", monday, "2", "", "", "Science", "T2", "R2"],
+            ["10-B", monday, "1", "09:00", "09:45", "Science", "T2", "R2"],
+        ]
+
+    def sheet_rows(self, body):
+        with zipfile.ZipFile(io.BytesIO(body)) as archive:
+            root = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        return [["".join(cell.itertext()) for cell in row.findall("x:c", XLSX_NS)]
+                for row in root.iterfind(".//x:row", XLSX_NS)]
+
+    def test_csv_is_streamed_in_class_and_week_order(self):
+        response = self.client.get("/timetables/export.csv")
+        self.assertTrue(response.streaming)
+        self.assertIn('filename="timetable.csv"', response["Content-Disposition"])
+        body = b"".join(response.streaming_content).decode()
+        self.assertEqual(list(csv.reader(StringIO(body))), self.expected)
+
+    def test_xlsx_has_the_same_rows(self):
+        response = self.client.get("/timetables/export.xlsx")
+        self.assertTrue(response.streaming)
+        self.assertEqual(self.sheet_rows(b"".join(response.streaming_content)), self.expected)
+
+    def test_only_the_active_version_is_exported(self):
+        draft = versions.create_draft()
+        school = self.school
+        versions.write_draft(draft, [TimetableEntry(
+            school_class=school["classes"][1], period=school["periods"][3],
+            subject=school["subjects"][0], teacher=school["teachers"][0], room=school["rooms"][0],
+        )])
+        self.assertEqual(len(list(export_rows())), 3)
+
+    def test_chunks_follow_chunk_rows(self):
+        rows = list(export_rows())
+        chunks = list(csv_chunks(iter(rows), chunk_rows=1))
+        self.assertEqual(len(chunks), len(rows) + 1)
+        self.assertEqual(list(csv.reader(StringIO("".join(chunks)))), self.expected)
+        self.assertEqual(self.sheet_rows(b"".join(xlsx_chunks(iter(rows), chunk_rows=1))), self.expected)
+
+    def test_non_admins_and_unknown_formats(self):
+        self.assertEqual(self.client.get("/timetables/export.pdf").status_code, 404)
+        self.client.force_login(User.objects.create_user("parent"))
+        response = self.client.get("/timetables/export.csv")
+        self.assertEqual(response.status_code, 302)
+
+    def test_command_writes_xlsx_to_a_file_only(self):
+        with self.assertRaises(CommandError):
+            call_command("export_timetable", "--format", "xlsx", stdout=StringIO())
+        out = StringIO()
+        call_command("export_timetable", stdout=out)
+        self.assertEqual(list(csv.reader(StringIO(out.getvalue()))), self.expected)
@@ -6,12 +6,22 @@ app_name = "scheduler"
 urlpatterns = [
     # Home Dashboard Page
     path("", views.home, name="home"),
+    path("dashboard/", views.admin_dashboard, name="admin_dashboard"),
 
     # Teacher personal timetable
     path("my-timetable/", views.my_timetable, name="my_timetable"),
 
     # Timetable List & Detail Views
     path("timetables/", views.timetable_list, name="timetable_list"),
+    path("timetables/pdf.zip", views.timetables_pdf_zip, name="timetables_pdf_zip"),
+    path("timetables/export.<str:fmt>", views.timetable_export, name="timetable_export"),
     path("class/<int:class_id>/", views.timetable_detail, name="timetable_detail"),
+    path("class/<int:class_id>/edit/", views.timetable_edit, name="timetable_edit"),
     path("class/<int:class_id>/pdf/", views.timetable_pdf, name="timetable_pdf"),
+
+    # Room timetable (utilisation)
+    path("room/<int:room_id>/", views.room_timetable, name="room_timetable"),
+    path("generation/", views.generation, name="generation"),
+    path("generation/<int:job_id>/", views.generation_status, name="generation_status"),
+    path("generation/<int:job_id>/cancel/", views.generation_cancel, name="generation_cancel"),
 ]
@@ -0,0 +1,165 @@
+"""
+Batch validation for TimetableEntry.
+
+``validate_entries`` checks a whole batch of proposed entries (e.g. all
+rows of an admin inline formset) with the same rules as the old
+per-entry ``TimetableEntry.clean``, but in a fixed number of set-based
+queries, and it also catches clashes *between* rows of the batch.
+"""
+
+from collections import Counter, defaultdict
+
+from django.db.models import Count, Q
+
+from .models import (
+    Teacher,
+    Subject,
+    TeacherSubject,
+    Period,
+    Constraint,
+    TimetableEntry,
+)
+
+
+def _carried(entries, name):
+    """Related ``name`` objects the entries already hold (e.g. set by a model form), by pk."""
+    field = TimetableEntry._meta.get_field(name)
+    found = {}
+    for e in entries:
+        if field.is_cached(e) and getattr(e, name) is not None:
+            found[getattr(e, name).pk] = getattr(e, name)
+    return found
+
+
+def validate_entries(entries, deleted=(), check_clashes=True):
+    """
+    ``entries``: unsaved or edited TimetableEntry instances.
+    ``deleted``: pks of rows that are about to be deleted, so they do
+    not count as clashes.
+    ``check_clashes``: teacher / room / class double booking, against the
+    active timetable and inside the batch. ``TimetableEntry.clean()``
+    turns it off - full_clean() checks that per row through
+    Meta.constraints / unique_together, and the database enforces it anyway.
+
+    Returns one ``{field: [messages]}`` dict per entry (empty if valid).
+    """
+    errors = [defaultdict(list) for _ in entries]
+    if not entries:
+        return errors
+
+    teacher_ids = {e.teacher_id for e in entries if e.teacher_id}
+    subject_ids = {e.subject_id for e in entries if e.subject_id}
+    period_ids = {e.period_id for e in entries if e.period_id}
+    room_ids = {e.room_id for e in entries if e.room_id}
+    class_ids = {e.school_class_id for e in entries if e.school_class_id}
+    ignore = {e.pk for e in entries if e.pk} | set(deleted)
+
+    # ---- at most 7 queries, whatever the batch size; teacher / subject /
+    # period rows the entries already hold are not fetched again ----
+    teachers = _carried(entries, "teacher")
+    if teacher_ids - teachers.keys():
+        teachers.update(Teacher.objects.select_related("user").in_bulk(teacher_ids - teachers.keys()))
+    subjects = _carried(entries, "subject")
+    if subject_ids - subjects.keys():
+        subjects.update(Subject.objects.in_bulk(subject_ids - subjects.keys()))
+    period_day = {pk: period.day for pk, period in _carried(entries, "period").items()}
+    if period_ids - period_day.keys():
+        period_day.update(
+            Period.objects.filter(id__in=period_ids - period_day.keys()).values_list("id", "day")
+        )
+
+    mapped = set(
+        TeacherSubject.objects.filter(
+            teacher_id__in=teacher_ids, subject_id__in=subject_ids
+        ).values_list("teacher_id", "subject_id")
+    )
+
+    teacher_taken = set()
+    room_taken = set()
+    class_taken = set()
+    if check_clashes:
+        taken = TimetableEntry.objects.filter(period_id__in=period_ids).filter(
+            Q(teacher_id__in=teacher_ids) | Q(room_id__in=room_ids) | Q(school_class_id__in=class_ids)
+        ).exclude(pk__in=ignore)
+        for teacher_id, room_id, class_id, period_id in taken.values_list(
+            "teacher_id", "room_id", "school_class_id", "period_id"
+        ):
+            teacher_taken.add((teacher_id, period_id))
+            room_taken.add((room_id, period_id))
+            class_taken.add((class_id, period_id))
+
+    blocked_global = set()
+    blocked_teacher = set()
+    for teacher_id, period_id in Constraint.objects.filter(
+        period_id__in=period_ids, blocked=True
+    ).filter(
+        Q(teacher__isnull=True) | Q(teacher_id__in=teacher_ids)
+    ).values_list("teacher_id", "period_id"):
+        if teacher_id is None:
+            blocked_global.add(period_id)
+        else:
+            blocked_teacher.add((teacher_id, period_id))
+
+    day_load = Counter({
+        (row["teacher_id"], row["period__day"]): row["n"]
+        for row in TimetableEntry.objects.filter(
+            teacher_id__in=teacher_ids,
+            period__day__in=set(period_day.values()),
+        ).exclude(pk__in=ignore).values("teacher_id", "period__day").annotate(n=Count("id"))
+    })
+
+    # ---- clashes inside the batch ----
+    batch_teacher = Counter((e.teacher_id, e.period_id) for e in entries if e.teacher_id and e.period_id)
+    batch_room = Counter((e.room_id, e.period_id) for e in entries if e.room_id and e.period_id)
+    batch_class = Counter(
+        (e.school_class_id, e.period_id) for e in entries if e.school_class_id and e.period_id
+    )
+    for e in entries:
+        if e.teacher_id and e.period_id in period_day:
+            day_load[(e.teacher_id, period_day[e.period_id])] += 1
+
+    for e, err in zip(entries, errors):
+        # 1) TeacherSubject mapping check
+        if e.teacher_id and e.subject_id and (e.teacher_id, e.subject_id) not in mapped:
+            err["teacher"].append(
+                f"{teachers[e.teacher_id]} is not assigned to teach {subjects[e.subject_id]}."
+            )
+
+        # 2) Teacher double booking
+        if check_clashes and e.teacher_id and e.period_id:
+            key = (e.teacher_id, e.period_id)
+            if key in teacher_taken or batch_teacher[key] > 1:
+                err["teacher"].append(
+                    "This teacher is already assigned to another class in this period."
+                )
+
+        # 3) Room double booking
+        if check_clashes and e.room_id and e.period_id:
+            key = (e.room_id, e.period_id)
+            if key in room_taken or batch_room[key] > 1:
+                err["room"].append(
+                    "This room is already assigned to another class in this period."
+                )
+
+        # 3b) Class ke ek period me do lessons
+        if check_clashes and e.school_class_id and e.period_id:
+            key = (e.school_class_id, e.period_id)
+            if key in class_taken or batch_class[key] > 1:
+                err["period"].append("This class already has a lesson in this period.")
+
+        # 4) Constraints (global or teacher-specific block)
+        if e.period_id and (
+            e.period_id in blocked_global or (e.teacher_id, e.period_id) in blocked_teacher
+        ):
+            err["period"].append("This period is blocked by a timetable constraint.")
+
+        # 5) Teacher max_periods_per_day limit
+        if e.teacher_id and e.period_id in period_day:
+            teacher = teachers[e.teacher_id]
+            if day_load[(e.teacher_id, period_day[e.period_id])] > teacher.max_periods_per_day:
+                err["teacher"].append(
+                    f"This will exceed {teacher}'s max periods per day "
+                    f"({teacher.max_periods_per_day})."
+                )
+
+    return [dict(err) for err in errors]
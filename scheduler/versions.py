@@ -0,0 +1,206 @@
+"""
+Timetable versions: write a new timetable aside, switch to it at once.
+
+A generation run used to delete the timetable and bulk-create the new
+one inside one long transaction: the SQLite writer lock was held for the
+whole write and every page load behind it waited. Now:
+
+1. ``create_draft`` + ``write_draft``: the lessons go into a DRAFT
+   version, in batches of ``WRITE_BATCH`` (each its own short write).
+   Pages read only the ACTIVE version (``TimetableEntry.objects``), so
+   they never see the draft, and they are never blocked for long.
+2. ``activate``: ACTIVE -> ARCHIVED, DRAFT -> ACTIVE and one "all" stamp
+   bump, in one small transaction. Readers get the old timetable or the
+   new one, never a mix.
+3. ``prune``: archived versions beyond ``settings.TIMETABLE_VERSIONS_KEEP``
+   and drafts of runs that died are deleted, with their snapshots
+   (snapshots.py).
+
+Rollback is ``restore`` of an archived version (admin action or
+``manage.py timetable_versions activate <id>``).
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import snapshots, stamps
+from .models import GenerationJob, TimetableEntry, TimetableVersion
+
+# Rows per INSERT / per write transaction while filling a draft
+WRITE_BATCH = 500
+
+
+class VersionError(Exception):
+    """The version cannot be activated (missing, or an unfinished draft)."""
+
+
+def active_id():
+    """Id of the ACTIVE version, None before the first timetable."""
+    return (
+        TimetableVersion.objects.filter(status=TimetableVersion.ACTIVE)
+        .values_list("pk", flat=True).first()
+    )
+
+
+def create_draft(job_id=None, note=""):
+    return TimetableVersion.objects.create(job_id=job_id, note=note)
+
+
+def write_draft(version, entries, batch_size=WRITE_BATCH, on_batch=None, base=None):
+    """
+    Bulk-create ``entries`` (unsaved TimetableEntry objects) into the
+    draft ``version``, one short write per batch. ``on_batch`` (if given)
+    is called after each one, e.g. to report progress / check for a cancel.
+
+    ``base``: the version the new timetable was derived from (an
+    incremental run). Its lessons that are also in ``entries`` are copied
+    inside the database (``INSERT ... SELECT``) and only the rest is
+    sent row by row - a run that changed a few lessons writes a few rows.
+    """
+    for entry in entries:
+        entry.version_id = version.pk
+    copied = 0
+    if base is not None:
+        entries, copied = _copy_unchanged(version, base, entries, batch_size, on_batch)
+    for start in range(0, len(entries), batch_size):
+        TimetableEntry.all_versions.bulk_create(entries[start:start + batch_size])
+        if on_batch is not None:
+            on_batch(copied + min(start + batch_size, len(entries)), copied + len(entries))
+
+
+# What makes two lessons the same (FK attnames)
+LESSON_FIELDS = ("school_class_id", "period_id", "subject_id", "teacher_id", "room_id")
+
+
+def _copy_unchanged(version, base, entries, batch_size, on_batch):
+    """
+    Copy the lessons of version ``base`` that ``entries`` keep as they are
+    into ``version``. Returns (entries still to write, lessons copied).
+    """
+    def lesson(entry):
+        return tuple(getattr(entry, name) for name in LESSON_FIELDS)
+
+    wanted = {lesson(entry) for entry in entries}
+    keep, kept = [], set()
+    for pk, *row in TimetableEntry.all_versions.filter(version_id=base).values_list("pk", *LESSON_FIELDS):
+        if tuple(row) in wanted:
+            keep.append(pk)
+            kept.add(tuple(row))
+
+    meta, quote = TimetableEntry._meta, connection.ops.quote_name
+    copied = ", ".join(quote(meta.get_field(name).column) for name in LESSON_FIELDS + ("created_at",))
+    sql = (
+        f"INSERT INTO {quote(meta.db_table)} ({quote(meta.get_field('version').column)}, {copied}) "
+        f"SELECT %s, {copied} FROM {quote(meta.db_table)} WHERE {quote(meta.pk.column)} IN ({{}})"
+    )
+    for start in range(0, len(keep), batch_size):
+        chunk = keep[start:start + batch_size]
+        # Rows DB ke andar hi copy hoti hain - sirf ids jaati hain, data nahi
+        with connection.cursor() as cursor:
+            cursor.execute(sql.format(", ".join(["%s"] * len(chunk))), [version.pk, *chunk])
+        if on_batch is not None:
+            on_batch(start + len(chunk), len(entries))
+    return [entry for entry in entries if lesson(entry) not in kept], len(keep)
+
+
+def activate(version_id, before_switch=None):
+    """
+    Make ``version_id`` the timetable everybody sees; the current one is
+    archived. ``before_switch`` runs inside the same transaction (e.g.
+    clearing the handled ScheduleChange rows). Returns the new active
+    version.
+    """
+    _snapshot_outgoing()
+    with transaction.atomic(), stamps.deferred():
+        version = TimetableVersion.objects.select_for_update().filter(pk=version_id).first()
+        if version is None:
+            raise VersionError(f"Timetable version #{version_id} does not exist.")
+        if version.status == TimetableVersion.ACTIVE:
+            return version
+        TimetableVersion.objects.filter(status=TimetableVersion.ACTIVE).update(
+            status=TimetableVersion.ARCHIVED
+        )
+        version.status = TimetableVersion.ACTIVE
+        version.activated_at = timezone.now()
+        version.save(update_fields=["status", "activated_at"])
+        if before_switch is not None:
+            before_switch()
+        # Har page ka timetable badal gaya
+        stamps.bump(everything=True)
+    # Rollback: lessons wahi hain, sirf stamp aage badha
+    snapshots.restamp(version.pk)
+    return version
+
+
+def _snapshot_outgoing():
+    """
+    The active version is about to be archived: bring its snapshot up to
+    date first (it may have been edited), so archived snapshots are exact.
+    """
+    current = active_id()
+    if current is None:
+        return
+    try:
+        snapshots.ensure(current)
+    except OSError:
+        # Snapshot sirf shortcut hai; na likh paaye to stale wala bhi na rahe
+        snapshots.delete(current)
+
+
+def restore(version_id):
+    """Rollback: make an archived version active again."""
+    version = TimetableVersion.objects.filter(pk=version_id).first()
+    if version is None:
+        raise VersionError(f"Timetable version #{version_id} does not exist.")
+    if version.status == TimetableVersion.DRAFT:
+        raise VersionError(f"Timetable version #{version_id} is a draft, not a finished timetable.")
+    return activate(version.pk)
+
+
+def discard(version):
+    """Drop a draft that will not be activated (failed / cancelled run)."""
+    _delete_versions([version.pk])
+
+
+def prune(keep=None):
+    """
+    Delete archived versions beyond the newest ``keep`` (default
+    ``settings.TIMETABLE_VERSIONS_KEEP``) and drafts whose run is over.
+    Returns the number of versions deleted.
+    """
+    if keep is None:
+        keep = settings.TIMETABLE_VERSIONS_KEEP
+    archived = list(
+        TimetableVersion.objects.filter(status=TimetableVersion.ARCHIVED)
+        .order_by("-id").values_list("pk", flat=True)
+    )
+    # Draft of a queued / running job is still being written - leave it
+    orphans = list(
+        TimetableVersion.objects.filter(status=TimetableVersion.DRAFT)
+        .exclude(job__status__in=[GenerationJob.QUEUED, GenerationJob.RUNNING])
+        .values_list("pk", flat=True)
+    )
+    doomed = archived[max(keep, 0):] + orphans
+    _delete_versions(doomed)
+    return len(doomed)
+
+
+def _delete_versions(pks):
+    if not pks:
+        return
+    table = connection.ops.quote_name(TimetableEntry._meta.db_table)
+    column = connection.ops.quote_name(TimetableEntry._meta.get_field("version").column)
+    with transaction.atomic():
+        # Plain SQL DELETE on purpose, without TimetableEntry delete signals:
+        # archived / draft lessons are on no page, so their stamp bumps would
+        # only throw away every cached grid and the fresh snapshot of the
+        # active version (and entries never create ScheduleChange rows).
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {table} WHERE {column} IN ({', '.join(['%s'] * len(pks))})",
+                list(pks),
+            )
+        TimetableVersion.objects.filter(pk__in=pks).delete()
+    for pk in pks:
+        snapshots.delete(pk)
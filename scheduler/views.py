@@ -1,15 +1,77 @@
 # timetable_project/scheduler/views.py
 
+import hashlib
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.safestring import mark_safe
+from django.utils.text import get_valid_filename
+from django.views.decorators.http import require_POST
 
 from .models import (
-    TimetableEntry,
     SchoolClass,
-    Period,
     Teacher,
+    Room,
+    GenerationJob,
 )
+from . import api, jobs, pdf, versions
+from .forms import GenerationForm
+from .exports import pdf_documents, export_rows, csv_chunks, xlsx_chunks
+from .dashboard import school_stats
+from .grids import school_grids
+from .pdf_cache import artifact_key, class_pdf
+from .stamps import class_stamp, teacher_stamp, room_stamp, school_stamp
+from .week_editor import StaleWeek, WeekEdit, week_choices
+from .zipstream import stream_zip
+
+# Cache keys carry the stamp version, so old entries are never served -
+# they just age out.
+RENDER_CACHE_SECONDS = 7 * 24 * 60 * 60
+
+
+# -----------------------------
+# CONDITIONAL GET + RENDER CACHE
+# -----------------------------
+def _conditional(request, stamp, build, per_user=True):
+    """
+    ETag / Last-Modified from the timetable ``stamp``; 304 if the browser
+    already has this version, otherwise ``build()`` the response.
+
+    ``per_user``: navbar wale pages me username + CSRF token bhi hai, so
+    their ETag also changes when a different user / session logs in.
+    """
+    etag = stamp.key
+    if per_user:
+        who = f"{request.user.pk}:{request.META.get('CSRF_COOKIE', '')}"
+        etag += "." + hashlib.md5(who.encode()).hexdigest()[:12]
+    etag = quote_etag(etag)
+    last_modified = stamp.last_modified and int(stamp.last_modified.timestamp())
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = build()
+    response.headers["ETag"] = etag
+    if last_modified:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    # Browser copy rakh sakta hai, but must ask (cheap 304) before reuse
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _cached_render(key, template, build_context):
+    """Rendered ``template`` from the cache, built only on a miss."""
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string(template, build_context())
+        cache.set(key, html, RENDER_CACHE_SECONDS)
+    return mark_safe(html)
 
 
 # -----------------------------
@@ -17,34 +79,38 @@ from .models import (
 # -----------------------------
 @login_required
 def home(request):
-    total_classes = SchoolClass.objects.count()
-    total_teachers = Teacher.objects.count()
-    total_timetables = (
-        TimetableEntry.objects.values("school_class").distinct().count()
-    )
-
-    recent = (
-        TimetableEntry.objects
-        .select_related("school_class", "subject", "period")
-        .order_by("-created_at")[:6]
-    )
-
+    # Counts aur recent list precomputed stats se (dashboard.py) - no aggregates per hit
+    stats = school_stats()
     return render(request, "scheduler/dashboard.html", {
-        "total_classes": total_classes,
-        "total_teachers": total_teachers,
-        "total_timetables": total_timetables,
-        "recent_timetables": recent,
+        "total_classes": stats.classes,
+        "total_teachers": stats.teachers,
+        "total_timetables": stats.timetabled_classes,
+        "recent_timetables": stats.recent,
+        "is_school_admin": _is_school_admin(request.user),
     })
 
 
+@login_required
+def admin_dashboard(request):
+    """Teacher load, room utilisation aur unfilled periods - admins only."""
+    if not _is_school_admin(request.user):
+        return redirect("scheduler:home")
+    return render(request, "scheduler/admin_dashboard.html", {"stats": school_stats()})
+
+
 # -----------------------------
 # TIMETABLE LIST
 # -----------------------------
 @login_required
 def timetable_list(request):
     classes = SchoolClass.objects.all().order_by("name")
+    grids = school_grids()
+    rooms = list(Room.objects.all())
+    for room in rooms:
+        room.used, room.total = grids.room_usage(room.pk)
     return render(request, "scheduler/timetable_list.html", {
         "classes": classes,
+        "rooms": rooms,
     })
 
 
@@ -56,55 +122,89 @@ def _build_timetable_context_for_class(school_class):
     Helper: class timetable ka shared context banata hai
     (detail view + printable view dono use kar sakte hain).
     """
-    periods = Period.objects.all().order_by("day", "order")
+    grids = school_grids()
+    return {
+        "school_class": school_class,
+        "period_orders": grids.period_orders,
+        "rows": grids.class_rows(school_class.pk),
+    }
 
-    if not periods.exists():
-        return {
-            "school_class": school_class,
-            "period_orders": [],
-            "rows": [],
-            "periods": periods,
-        }
-
-    period_orders = sorted({p.order for p in periods})
-    days = sorted({p.day for p in periods})
-    day_label_map = {code: label for code, label in periods.model.DAY_CHOICES}
-
-    entries = (
-        TimetableEntry.objects
-        .filter(school_class=school_class)
-        .select_related("period", "subject", "teacher__user", "room")
-    )
 
-    entries_map = {(e.period.day, e.period.order): e for e in entries}
+@login_required
+def timetable_detail(request, class_id):
+    school_class = get_object_or_404(SchoolClass, pk=class_id)
+    stamp = class_stamp(school_class.pk)
 
-    rows = []
-    for day in days:
-        cells = [entries_map.get((day, order)) for order in period_orders]
-        rows.append({
-            "day": day,
-            "label": day_label_map.get(day, f"Day {day}"),
-            "cells": cells,
+    def build():
+        grid = _cached_render(
+            f"class-grid:{stamp.key}",
+            "scheduler/_class_grid.html",
+            lambda: _build_timetable_context_for_class(school_class),
+        )
+        return render(request, "scheduler/timetable_detail.html", {
+            "school_class": school_class,
+            "grid": grid,
         })
 
-    return {
-        "school_class": school_class,
-        "periods": periods,
-        "period_orders": period_orders,
-        "rows": rows,
-    }
+    return _conditional(request, stamp, build)
 
 
 @login_required
-def timetable_detail(request, class_id):
+def timetable_edit(request, class_id):
+    """
+    Poore hafte ka grid ek form me; submit pe sirf badle hue cells
+    validate + save hote hain, ek transaction me (see week_editor.py).
+    """
+    if not _is_school_admin(request.user):
+        return redirect("scheduler:timetable_detail", class_id=class_id)
     school_class = get_object_or_404(SchoolClass, pk=class_id)
-    context = _build_timetable_context_for_class(school_class)
-    return render(request, "scheduler/timetable_detail.html", context)
+
+    if request.method == "POST":
+        edit = WeekEdit(school_class, request.POST)
+        if edit.is_valid():
+            if not edit.has_changes:
+                messages.info(request, "Nothing changed.")
+                return redirect("scheduler:timetable_edit", class_id=class_id)
+            try:
+                done = edit.save()
+            except StaleWeek as exc:
+                edit.form_errors.append(str(exc))
+            else:
+                messages.success(
+                    request,
+                    f"Saved: {done['added']} added, {done['changed']} changed, {done['removed']} removed.",
+                )
+                return redirect("scheduler:timetable_detail", class_id=class_id)
+        version = request.POST.get("version", "")
+    else:
+        edit = WeekEdit(school_class)
+        version = class_stamp(school_class.pk).key
+
+    period_orders, rows = edit.rows()
+    return render(request, "scheduler/timetable_edit.html", {
+        "school_class": school_class,
+        "period_orders": period_orders,
+        "rows": rows,
+        "version": version,
+        "form_errors": edit.form_errors,
+        "has_errors": bool(edit.errors),
+        "choices": week_choices(),
+    })
 
 
 # -----------------------------
 # TEACHER "MY TIMETABLE"
 # -----------------------------
+def _build_timetable_context_for_teacher(teacher):
+    """Teacher ke grid ka context (my_timetable)."""
+    grids = school_grids()
+    return {
+        "teacher": teacher,
+        "period_orders": grids.period_orders,
+        "rows": grids.teacher_rows(teacher.pk),
+    }
+
+
 @login_required
 def my_timetable(request):
     """
@@ -116,60 +216,270 @@ def my_timetable(request):
         return redirect("scheduler:home")
 
     teacher = get_object_or_404(Teacher, user=request.user)
+    stamp = teacher_stamp(teacher.pk)
 
-    periods = Period.objects.all().order_by("day", "order")
-    if not periods.exists():
+    def build():
+        grid = _cached_render(
+            f"teacher-grid:{stamp.key}",
+            "scheduler/_teacher_grid.html",
+            lambda: _build_timetable_context_for_teacher(teacher),
+        )
         return render(request, "scheduler/teacher_timetable.html", {
             "teacher": teacher,
-            "period_orders": [],
-            "rows": [],
-            "periods": periods,
+            "grid": grid,
         })
 
-    period_orders = sorted({p.order for p in periods})
-    days = sorted({p.day for p in periods})
-    day_label_map = {code: label for code, label in periods.model.DAY_CHOICES}
+    return _conditional(request, stamp, build)
 
-    entries = (
-        TimetableEntry.objects
-        .filter(teacher=teacher)
-        .select_related("period", "subject", "school_class", "room")
-    )
 
-    entries_map = {(e.period.day, e.period.order): e for e in entries}
+# -----------------------------
+# ROOM TIMETABLE
+# -----------------------------
+@login_required
+def room_timetable(request, room_id):
+    """Ek room kab kab use ho raha hai - room utilisation check ke liye."""
+    room = get_object_or_404(Room, pk=room_id)
+    stamp = room_stamp(room.pk)
 
-    rows = []
-    for day in days:
-        cells = [entries_map.get((day, order)) for order in period_orders]
-        rows.append({
-            "day": day,
-            "label": day_label_map.get(day, f"Day {day}"),
-            "cells": cells,
+    def build():
+        grids = school_grids()
+        used, total = grids.room_usage(room.pk)
+        grid = _cached_render(
+            f"room-grid:{stamp.key}",
+            "scheduler/_room_grid.html",
+            lambda: {"period_orders": grids.period_orders, "rows": grids.room_rows(room.pk)},
+        )
+        return render(request, "scheduler/room_timetable.html", {
+            "room": room,
+            "grid": grid,
+            "used": used,
+            "total": total,
+            "usage_percent": round(100 * used / total) if total else 0,
         })
 
-    return render(request, "scheduler/teacher_timetable.html", {
-        "teacher": teacher,
-        "periods": periods,
-        "period_orders": period_orders,
-        "rows": rows,
-    })
+    return _conditional(request, stamp, build)
 
 
 # -----------------------------
-# "PDF" EXPORT VIEW (PRINTABLE HTML)
+# "PDF" EXPORT VIEW
 # -----------------------------
 @login_required
 def timetable_pdf(request, class_id):
     """
-    FAST + RELIABLE VERSION:
-    - Ab WeasyPrint use nahi kar rahe
-    - Sirf print-friendly HTML return karte hain
-    - Browser se Ctrl+P → Save as PDF
+    Server-side PDF (WeasyPrint), disk cache se - timetable version same
+    hai to dobara render nahi hota (see pdf_cache.py).
+
+    WeasyPrint / Pango server pe nahi hai to pehle wala print-friendly
+    HTML milta hai (browser se Ctrl+P → Save as PDF).
     """
     school_class = get_object_or_404(SchoolClass, pk=class_id)
-    context = _build_timetable_context_for_class(school_class)
+    stamp = class_stamp(school_class.pk)
+
+    try:
+        pdf.check_available()
+    except pdf.PDFUnavailable:
+        # Printable page me navbar / user data nahi hai - poora page cache
+        def build():
+            html = _cached_render(
+                f"class-print:{stamp.key}",
+                "scheduler/printable_timetable.html",
+                lambda: _build_timetable_context_for_class(school_class),
+            )
+            return HttpResponse(html)
+
+        return _conditional(request, stamp, build, per_user=False)
+
+    def build_pdf():
+        path = class_pdf(school_class, stamp)
+        return FileResponse(
+            open(path, "rb"),
+            content_type="application/pdf",
+            filename=f"{get_valid_filename(school_class.name)}.pdf",
+        )
+
+    # ETag = artifact hash, so a template change also invalidates browser copies
+    return _conditional(request, stamp._replace(key=artifact_key(stamp)), build_pdf, per_user=False)
+
+
+# -----------------------------
+# BULK PDF EXPORT (ZIP)
+# -----------------------------
+def _is_school_admin(user):
+    profile = getattr(user, "profile", None)
+    return user.is_staff or (profile is not None and profile.role == "ADMIN")
+
+
+@login_required
+def timetables_pdf_zip(request):
+    """
+    Saari classes (``?teachers=1`` ho to teachers bhi) ke PDFs ek ZIP me.
+    PDFs process pool me bante hain aur har file ready hote hi client ko
+    stream hoti hai - memory classes ki count ke saath nahi badhti.
+    """
+    if not _is_school_admin(request.user):
+        return redirect("scheduler:home")
+    try:
+        pdf.check_available()
+    except pdf.PDFUnavailable as exc:
+        return HttpResponse(str(exc), status=503, content_type="text/plain")
+
+    documents = pdf_documents(teachers=request.GET.get("teachers") == "1")
+    response = StreamingHttpResponse(
+        stream_zip(pdf.render_many(documents)),
+        content_type="application/zip",
+    )
+    response["Content-Disposition"] = 'attachment; filename="timetables.zip"'
+    return response
+
+
+# -----------------------------
+# FLAT EXPORT (CSV / XLSX) - SIS / payroll ke liye
+# -----------------------------
+EXPORT_FORMATS = {
+    "csv": (csv_chunks, "text/csv; charset=utf-8"),
+    "xlsx": (xlsx_chunks, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+@login_required
+def timetable_export(request, fmt):
+    """
+    Poore school ka timetable ek table me (class, day, period, time,
+    subject, teacher code, room) - rows DB se stream hoti hain, file
+    pehle poori nahi banti.
+    """
+    if not _is_school_admin(request.user):
+        return redirect("scheduler:home")
+    if fmt not in EXPORT_FORMATS:
+        raise Http404("Unknown export format.")
+    chunks, content_type = EXPORT_FORMATS[fmt]
+    response = StreamingHttpResponse(chunks(export_rows()), content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="timetable.{fmt}"'
+    return response
+
+
+# -----------------------------
+# BACKGROUND GENERATION (admins)
+# -----------------------------
+def _job_json(job):
+    return {
+        "id": job.pk,
+        "status": job.status,
+        "active": job.is_active,
+        "phase": job.phase,
+        "placed": job.placed,
+        "total": job.total,
+        "percent": job.percent,
+        "best_unplaced": job.best_unplaced,
+        "best_penalty": job.best_penalty,
+        "attempts_done": job.attempts_done,
+        "attempts": job.options.get("restarts", 1),
+        "cancel_requested": job.cancel_requested,
+        "message": job.message,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+@login_required
+def generation(request):
+    """
+    Timetable generation web se: job queue me jaata hai aur
+    ``manage.py generation_worker`` use request ke bahar chalata hai.
+    Page progress poll karta hai (generation_status).
+    """
+    if not _is_school_admin(request.user):
+        return redirect("scheduler:home")
+
+    form = GenerationForm(request.POST or None)
+    error = None
+    if request.method == "POST" and form.is_valid():
+        try:
+            jobs.enqueue(form.cleaned_data, user=request.user)
+        except jobs.GenerationLocked as exc:
+            error = str(exc)
+        else:
+            return redirect("scheduler:generation")
+
+    return render(request, "scheduler/generation.html", {
+        "form": form,
+        "error": error,
+        "active": jobs.active_job(),
+        "jobs": GenerationJob.objects.select_related("requested_by")[:20],
+    })
+
+
+@login_required
+def generation_status(request, job_id):
+    """Ek job ki progress JSON me (page har kuch second me poll karta hai)."""
+    if not _is_school_admin(request.user):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    job = get_object_or_404(GenerationJob, pk=job_id)
+    return JsonResponse(_job_json(job))
+
+
+@login_required
+@require_POST
+def generation_cancel(request, job_id):
+    """Queued job turant cancel; running job agle progress report pe ruk jaata hai."""
+    if not _is_school_admin(request.user):
+        return JsonResponse({"error": "forbidden"}, status=403)
+    job = get_object_or_404(GenerationJob, pk=job_id)
+    jobs.cancel(job)
+    job.refresh_from_db()
+    if request.headers.get("Accept") == "application/json":
+        return JsonResponse(_job_json(job))
+    return redirect("scheduler:generation")
+
+
+# -----------------------------
+# JSON API (display screens / mobile app) - see api.py
+# -----------------------------
+API_STAMPS = {"class": class_stamp, "teacher": teacher_stamp, "room": room_stamp}
+
+
+def _api_allowed(request):
+    return settings.TIMETABLE_API_PUBLIC or request.user.is_authenticated
+
+
+def _api_response(request, name, stamp, build_payload):
+    """
+    Cached, compressed JSON with an ETag from the timetable version +
+    stamp (per encoding - a gzip and a brotli copy are different bytes).
+    """
+    encoding = api.negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+    key = f"api{api.FORMAT}.v{versions.active_id()}.{stamp.key}"
+
+    def build():
+        response = HttpResponse(
+            api.body(f"api:{name}:{key}", build_payload, encoding),
+            content_type="application/json",
+        )
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+        return response
+
+    response = _conditional(
+        request, stamp._replace(key=f"{key}.{encoding or 'identity'}"), build, per_user=False
+    )
+    patch_vary_headers(response, ["Accept-Encoding", "Cookie"])
+    return response
+
+
+def api_grid(request, kind, pk):
+    """Ek class / teacher / room ka hafte ka grid, JSON me."""
+    if not _api_allowed(request):
+        return JsonResponse({"error": "login required"}, status=401)
+    who = api.owner(kind, pk)
+    if who is None:
+        return JsonResponse({"error": f"no such {kind}"}, status=404)
+    return _api_response(request, f"{kind}{pk}", API_STAMPS[kind](pk), lambda: api.grid_payload(kind, who))
+
 
-    # Tu already ye template use kar raha hai, agar nahi hai
-    # to timetable_detail.html ka ek copy bana ke
-    # "scheduler/printable_timetable.html" naam se rakh sakta hai.
-    return render(request, "scheduler/printable_timetable.html", context)
+def api_school(request):
+    """Poore school ke grids ek compact JSON me (bulk, display screens ke liye)."""
+    if not _api_allowed(request):
+        return JsonResponse({"error": "login required"}, status=401)
+    stamp = school_stamp()
+    return _api_response(request, "school", stamp, lambda: api.school_payload(stamp.key))
@@ -0,0 +1,207 @@
+"""
+Whole-week editor for one class.
+
+The page posts every cell of the class's week at once (``cell-<period
+id>-subject / -teacher / -room``; no subject = free period).
+``WeekEdit`` compares that with the saved lessons, validates only the
+changed cells - all of them together, through ``validate_entries`` - and
+applies the diff in one transaction: one delete, one ``bulk_update``,
+one ``bulk_create``. The query count does not depend on how many cells
+changed.
+
+The form carries the class stamp it was opened at; if the class was
+changed in between (another admin, a generation run) the save is
+refused instead of silently overwriting it.
+"""
+
+from django.db import IntegrityError, transaction
+
+from . import stamps
+from .grids import DAY_LABELS
+from .models import (
+    Period,
+    Room,
+    Subject,
+    Teacher,
+    TeacherSubject,
+    TimetableEntry,
+    active_version_id,
+)
+from .validation import validate_entries
+
+FIELDS = ("subject", "teacher", "room")
+
+
+class StaleWeek(Exception):
+    """The class timetable changed after the editor was opened."""
+
+
+def week_choices():
+    """Dropdown data for the editor page (4 queries), JSON-ready."""
+    teachers = Teacher.objects.select_related("user").order_by("code")
+    mapped = {}
+    for teacher_id, subject_id in TeacherSubject.objects.values_list("teacher_id", "subject_id"):
+        mapped.setdefault(subject_id, []).append(teacher_id)
+    return {
+        "subjects": [[s.pk, s.name] for s in Subject.objects.order_by("name")],
+        "teachers": [
+            [t.pk, f"{t.code} · {t.user.get_full_name() or t.user.username}"] for t in teachers
+        ],
+        "rooms": [[r.pk, r.name] for r in Room.objects.order_by("name")],
+        # subject id -> teachers mapped to it; the page lists these first
+        "mapped": mapped,
+    }
+
+
+class WeekEdit:
+    """
+    A posted week for ``school_class``. ``is_valid()`` works out the diff
+    and the errors per cell; ``save()`` writes the diff.
+    """
+
+    def __init__(self, school_class, data=None):
+        self.school_class = school_class
+        self.data = data
+        self.periods = list(Period.objects.order_by("day", "order"))
+        self.current = {
+            e.period_id: e for e in TimetableEntry.objects.filter(school_class=school_class)
+        }
+        self.errors = {}       # period id -> [messages]
+        self.form_errors = []  # not tied to a cell
+        self.cells = {}        # period id -> (subject, teacher, room) ids, as posted
+        self.to_create, self.to_update, self.to_delete = [], [], []
+
+    # ---- reading the post ----
+    def _posted(self, period_id):
+        values = []
+        for name in FIELDS:
+            raw = (self.data.get(f"cell-{period_id}-{name}") or "").strip()
+            if not raw:
+                values.append(None)
+                continue
+            try:
+                values.append(int(raw))
+            except ValueError:
+                values.append(False)
+        return tuple(values)
+
+    def _check_ids(self):
+        """Posted ids must exist - 3 queries for the whole week."""
+        wanted = [{cell[i] for cell in self.cells.values() if cell[i]} for i in range(len(FIELDS))]
+        known = [
+            set(Subject.objects.filter(pk__in=wanted[0]).values_list("pk", flat=True)),
+            set(Teacher.objects.filter(pk__in=wanted[1]).values_list("pk", flat=True)),
+            set(Room.objects.filter(pk__in=wanted[2]).values_list("pk", flat=True)),
+        ]
+        for period_id, cell in self.cells.items():
+            if all(value is None for value in cell):
+                continue
+            for name, value, ok in zip(FIELDS, cell, known):
+                if value is None:
+                    self.errors.setdefault(period_id, []).append(f"Choose a {name}.")
+                elif value is False or value not in ok:
+                    self.errors.setdefault(period_id, []).append(f"Unknown {name}.")
+
+    # ---- diff + validation ----
+    def is_valid(self):
+        posted_stamp = self.data.get("version", "")
+        if posted_stamp != stamps.class_stamp(self.school_class.pk).key:
+            self.form_errors.append(
+                "This timetable was changed after you opened it. Reload the page and edit again."
+            )
+            return False
+
+        self.cells = {p.pk: self._posted(p.pk) for p in self.periods}
+        self._check_ids()
+        if self.errors:
+            return False
+
+        # Naye lessons active version me (ek query, har row pe nahi)
+        version_id = active_version_id()
+        for period_id, (subject_id, teacher_id, room_id) in self.cells.items():
+            entry = self.current.get(period_id)
+            if subject_id is None:
+                if entry is not None:
+                    self.to_delete.append(entry)
+                continue
+            if entry is None:
+                self.to_create.append(TimetableEntry(
+                    version_id=version_id, school_class=self.school_class, period_id=period_id,
+                    subject_id=subject_id, teacher_id=teacher_id, room_id=room_id,
+                ))
+            elif (entry.subject_id, entry.teacher_id, entry.room_id) != (subject_id, teacher_id, room_id):
+                entry._before = (entry.teacher_id, entry.room_id)
+                entry.subject_id, entry.teacher_id, entry.room_id = subject_id, teacher_id, room_id
+                self.to_update.append(entry)
+
+        changed = self.to_update + self.to_create
+        results = validate_entries(changed, deleted=[e.pk for e in self.to_delete], check_clashes=True)
+        for entry, errors in zip(changed, results):
+            for messages in errors.values():
+                self.errors.setdefault(entry.period_id, []).extend(messages)
+        return not self.errors
+
+    @property
+    def has_changes(self):
+        return bool(self.to_create or self.to_update or self.to_delete)
+
+    def summary(self):
+        return {
+            "added": len(self.to_create),
+            "changed": len(self.to_update),
+            "removed": len(self.to_delete),
+        }
+
+    # ---- writing ----
+    def save(self):
+        """Apply the diff (call after ``is_valid()``); returns ``summary()``."""
+        teachers, rooms = set(), set()
+        for entry in self.to_create + self.to_update + self.to_delete:
+            teachers.add(entry.teacher_id)
+            rooms.add(entry.room_id)
+        for entry in self.to_update:
+            teachers.add(entry._before[0])
+            rooms.add(entry._before[1])
+
+        try:
+            # Row signals ke bajaye ek bump, sab writes ke baad
+            with transaction.atomic(), stamps.deferred():
+                if self.to_delete:
+                    TimetableEntry.objects.filter(pk__in=[e.pk for e in self.to_delete]).delete()
+                if self.to_update:
+                    TimetableEntry.objects.bulk_update(self.to_update, ["subject", "teacher", "room"])
+                if self.to_create:
+                    TimetableEntry.objects.bulk_create(self.to_create)
+                stamps.bump(classes={self.school_class.pk}, teachers=teachers, rooms=rooms)
+        except IntegrityError:
+            # Another class took the teacher / room between validation and the write
+            raise StaleWeek("A teacher or room was booked elsewhere meanwhile. Reload and try again.")
+        return self.summary()
+
+    # ---- page data ----
+    def rows(self):
+        """Day x period rows of cells for the template (posted values win)."""
+        by_slot = {(p.day, p.order): p for p in self.periods}
+        orders = sorted({p.order for p in self.periods})
+        rows = []
+        for day in sorted({p.day for p in self.periods}):
+            cells = []
+            for order in orders:
+                period = by_slot.get((day, order))
+                if period is None:
+                    cells.append(None)
+                    continue
+                if period.pk in self.cells:
+                    values = [v or "" for v in self.cells[period.pk]]
+                else:
+                    entry = self.current.get(period.pk)
+                    values = [entry.subject_id, entry.teacher_id, entry.room_id] if entry else ["", "", ""]
+                cells.append({
+                    "period": period,
+                    "subject": values[0],
+                    "teacher": values[1],
+                    "room": values[2],
+                    "errors": self.errors.get(period.pk, []),
+                })
+            rows.append({"label": DAY_LABELS.get(day, f"Day {day}"), "cells": cells})
+        return orders, rows
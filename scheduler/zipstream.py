@@ -0,0 +1,44 @@
+"""
+ZIP archives written as a stream.
+
+``ZipSink`` is a write-only, non-seekable file for ``zipfile.ZipFile``:
+ZipFile then writes data descriptors after each member instead of
+seeking back to patch headers, so the archive can be handed out chunk by
+chunk (StreamingHttpResponse, a file) while it is being written and
+nothing but the current member is held in memory.
+"""
+
+import zipfile
+
+
+class ZipSink:
+    """Write-only buffer for ZipFile; ``drain`` hands out what was written."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_zip(files, compression=zipfile.ZIP_STORED):
+    """
+    Yield a ZIP archive of ``(name, bytes)`` pairs, one chunk per file as
+    soon as it arrives. Default is no compression: meant for PDFs, which
+    are already compressed.
+    """
+    sink = ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=compression) as archive:
+        for name, data in files:
+            archive.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
@@ -91,6 +91,20 @@ LOGOUT_REDIRECT_URL = "scheduler:home"
 MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
+# Server-side class PDFs (scheduler/pdf_cache.py): where, and how much disk
+TIMETABLE_PDF_DIR = BASE_DIR / "pdf_cache"
+TIMETABLE_PDF_CACHE_MB = 200
+
+# Old timetables kept for rollback after a generation (scheduler/versions.py)
+TIMETABLE_VERSIONS_KEEP = 5
+
+# Array snapshots (.npy) of timetable versions (scheduler/snapshots.py)
+TIMETABLE_SNAPSHOT_DIR = BASE_DIR / "snapshots"
+
+# JSON API (scheduler/api.py): False = only logged-in users; True = also
+# anonymous clients, e.g. hallway screens on the school network
+TIMETABLE_API_PUBLIC = False
+
 CSRF_TRUSTED_ORIGINS = [
     "https://school-timetable-generator.onrender.com",
-]
\ No newline at end of file
+]
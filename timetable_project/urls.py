@@ -10,6 +10,9 @@ urlpatterns = [
     path('accounts/login/', auth_views.LoginView.as_view(), name='login'),
     path('accounts/logout/', auth_views.LogoutView.as_view(), name='logout'),
 
+    # Read-only JSON API for display screens / apps
+    path('api/', include('scheduler.api_urls')),
+
     # Your app urls
     path('', include('scheduler.urls')),
 ]